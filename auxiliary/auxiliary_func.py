@@ -4,15 +4,187 @@ Created on Mon Jun  8 01:01:34 2020
 
 @author: Viktor Cheng
 """
+import os
+import re
+import sys
+import time
+import atexit
+import pickle
+import shutil
+import tempfile
+import sqlite3
+import functools
+import hashlib
+import json
+import inspect
+import threading
+import tracemalloc
+import warnings
+import multiprocessing as mp
+from contextlib import contextmanager
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
 import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
-import patsy
-from arch.unitroot import ZivotAndrews
-
-
+from auxiliary.lazy import lazy
+
+# the heavy dependencies are imported on first use, see auxiliary/lazy.py
+lazy(globals(), plt='matplotlib.pyplot', sm='statsmodels.api', smf='statsmodels.formula.api', patsy='patsy',
+     scipy='scipy', stats='scipy.stats', linalg='scipy.linalg', sparse='scipy.sparse', unitroot='arch.unitroot')
+
+# what `from auxiliary.auxiliary_func import *` brings in: the builders, estimators and
+# loaders and the switches of the caches. the lazy stand-ins above are left out, they
+# only replace themselves in this module and would shadow the importer's own modules
+__all__ = ['areg', 'iindexer', 'r2d', 'aregdf', 'statadf', 'dftable', 'fastdf',
+           'aregmulti', 'aregmany', 'aregladder', 'aregjackknife', 'Spec', 'aregspec', 'probitspec',
+           'balance', 'crosstab', 'eventstudy', 'event_results', 'zivot_andrews', 'za_panel',
+           'load_stata', 'load_partitioned', 'load_samples', 'aggregate_cube', 'cube_means',
+           'profile', 'profile_frame', 'profile_summary', 'results_store', 'results_frame',
+           'design_cache', 'eventstudy_cache', 'cube_cache', 'render',
+           'table_7', 'table_10', 'table_10_fin', 'table_a11', 'table_a11_fin', 'table_a12_fin', 'table_a7_fin',
+           'table_a9_fin', 'table_a8_final', 'table_house_fin', 'table_a4_fin', 'table_a6_fin', 'table_7_fin',
+           'table_6_fin', 'table_5_fin', 'table_3_fin', 'table_1_fin', 'table_2_fin', 'table_4_fin', 'table_9_fin',
+           'table_a5_fin', 'fig_3and4_results', 'fig_3and4_fin', 'fig_5and5e_results', 'fig_5and5e_fin',
+           'fig_6and7_results', 'fig_6and7_fin', 'fig_allsum_results', 'fig_allsum_fin', 'fig_1_fin',
+           'fig_a4andall_results', 'fig_a4andall_fin', 'extend_fig2_results', 'extend_fig2_fin', 'extend_fig1_fin',
+           'extend_za']
+
+
+
+
+###opt in instrumentation: inside `with profile() as records:`, or in a process started
+###with the environment variable AUX_PROFILE set, every stage of the loaders and
+###estimators below is recorded with its wall time, allocations and shapes
+PROFILE = {'on': False, 'memory': False, 'records': [], 'start': 0., 'builder': None}
+PROFILE_STACK = threading.local()
+
+
+@contextmanager
+def profile(memory=True):
+    '''records the stages run inside the block into the list it yields, with memory
+    allocations are traced as well (tracemalloc, which slows the block down)
+    profile_frame, profile_summary and profile_json export the records'''
+
+    previous = dict(PROFILE)
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    records = []
+    PROFILE.update(on=True, memory=memory, records=records, start=time.perf_counter())
+    try:
+        yield records
+    finally:
+        PROFILE.update(previous)
+        if tracing:
+            tracemalloc.stop()
+
+
+def builder_name():
+    '''the table or figure function the current stage runs in; fits on worker
+    threads are attributed to the last one seen'''
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_code.co_name
+        if name.endswith(('_fin', '_final')) or name == 'extend_za':
+            PROFILE['builder'] = name
+            return name
+        frame = frame.f_back
+
+    return PROFILE['builder']
+
+
+@contextmanager
+def stage(name, **info):
+    '''records the block as stage name when profiling, info (shapes, the file or
+    formula) is yielded so the block can complete it. tracemalloc counts the whole
+    process, so memory is recorded for stages on the main thread only: a stage on
+    a worker thread would be charged with what the other fits allocate (and its
+    peak resets would spoil the peaks of the main thread), its alloc and peak stay
+    empty. a main thread stage that waits on workers counts their memory'''
+
+    if not PROFILE['on']:
+        yield info
+        return
+
+    # peaks are tracked per block, a nested stage hands its peak up to the enclosing one
+    stack = PROFILE_STACK.__dict__.setdefault('frames', [])
+    frame = {'peak': 0, 'current': 0}
+    memory = PROFILE['memory'] and tracemalloc.is_tracing() and threading.current_thread() is threading.main_thread()
+    if memory:
+        frame['current'], peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        record = {'builder': builder_name(), 'stage': name, 'depth': len(stack),
+                  'thread': threading.get_ident(), 'start': start - PROFILE['start'], 'seconds': seconds}
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(frame['peak'], peak)
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            record.update(alloc=current - frame['current'], peak=peak - frame['current'])
+        record.update(info)
+        PROFILE['records'].append(record)
+
+
+def profile_frame(records=None):
+    '''the records (of the AUX_PROFILE session by default) as a tidy DataFrame,
+    one row per stage call. alloc is the memory the stage kept, peak the most it
+    held above what was allocated when it started, both in bytes and only for
+    stages on the main thread (see stage)'''
+
+    records = PROFILE['records'] if records is None else records
+    columns = ['builder', 'stage', 'depth', 'thread', 'start', 'seconds', 'alloc', 'peak', 'rows', 'cols']
+    df = pd.DataFrame(list(records))
+
+    return df.reindex(columns=columns + [c for c in df.columns if c not in columns])
+
+
+def profile_summary(records=None):
+    '''calls, total and mean wall time, allocations and the largest shapes of
+    every stage, per table or figure function'''
+
+    df = profile_frame(records)
+    df['builder'] = df['builder'].fillna('')
+    agg = {'calls': ('seconds', 'size'), 'seconds': ('seconds', 'sum'), 'mean': ('seconds', 'mean'),
+           'alloc': ('alloc', lambda x: x.sum(min_count=1)), 'peak': ('peak', 'max'), 'rows': ('rows', 'max'), 'cols': ('cols', 'max')}
+    agg = {key: value for key, value in agg.items() if df[value[0]].notna().any()}
+
+    return df.groupby(['builder', 'stage'], sort=False).agg(**agg)
+
+
+def profile_json(path, records=None):
+    '''writes the records as a chrome trace (chrome://tracing, perfetto), the
+    builders are the categories and the shapes the arguments of every event'''
+
+    events = []
+    for record in (PROFILE['records'] if records is None else records):
+        args = {key: value if isinstance(value, (int, float, str, bool)) else str(value)
+                for key, value in record.items() if key not in ('stage', 'builder', 'thread', 'start', 'seconds')}
+        events.append({'name': record['stage'], 'cat': record['builder'] or '', 'ph': 'X',
+                       'ts': 1e6 * record['start'], 'dur': 1e6 * record['seconds'],
+                       'pid': os.getpid(), 'tid': record['thread'], 'args': args})
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events}, f)
+
+
+# AUX_PROFILE=1 profiles the whole process, AUX_PROFILE=trace.json also writes the trace at exit
+if os.environ.get('AUX_PROFILE'):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    PROFILE.update(on=True, memory=True, start=time.perf_counter())
+    if os.environ['AUX_PROFILE'].endswith('.json'):
+        atexit.register(profile_json, os.environ['AUX_PROFILE'])
 
 
 def areg(formula, data=None, absorb=None, cluster=None):
@@ -32,14 +204,32 @@ def areg(formula, data=None, absorb=None, cluster=None):
     reg = sm.OLS(y, X)
     # Account for df loss from FE transform
     reg.df_resid -= (data[absorb].nunique() - 1)
-    return reg.fit(cov_type='cluster', cov_kwds={'groups': data[cluster].values}, missing='drop')
+    with stage('OLS.fit', rows=X.shape[0], cols=X.shape[1]):
+        return reg.fit(cov_type='cluster', cov_kwds={'groups': data[cluster].values}, missing='drop')
 
 
-def iindexer(data=None, key=None, custom=None, a=None, b=None, between=1):
+def iindexer(data=None, key=None, custom=None, a=None, b=None, between=1, codes=False):
     '''This is the i. equilivent for Stata, will return two values
-    one is a dataframe while other is a list of C(i) strings'''
-
-    temp = pd.get_dummies(data[key])
+    one is a dataframe while other is a list of C(i) strings
+    with codes=True the dummies are never built: the first value is a categorical
+    series named custom holding int16 codes over the levels a..b (values outside
+    are missing) and the second the names of the levels. estimators take the
+    series as a control or fixed effect, e.g. C(custom) or Spec(controls=[custom]),
+    and count it in the clustered K as the dummies it replaces, one per level'''
+
+    if codes:
+        with stage('iindexer', rows=len(data), cols=1, key=key):
+            values = data[key].values.astype(float)
+            pos = (values - a) / between
+            inside = (values >= a) & (values <= b) & (pos == np.round(pos))
+            codes = np.where(inside, pos, -1).astype(np.int16)
+            levels = list(range(a, b + 1, between))
+            temp = pd.Series(pd.Categorical.from_codes(codes, categories=levels), index=data.index, name=custom)
+        return temp, [custom + str(element) for element in levels]
+
+    with stage('iindexer', key=key) as info:
+        temp = pd.get_dummies(data[key])
+        info.update(rows=temp.shape[0], cols=temp.shape[1])
 
     c = list(range(a, b + 1, between))
 
@@ -69,63 +259,1413 @@ def r2d(results):
                                'rsquaredadj': rsa,
                                'conf_lower': conf_lower,
                                'conf_higher': conf_higher,
-                               'pvals': pvals
+                               'pvals': pvals,
+                               'nobs': int(results.nobs)
                                })
 
-    results_df = results_df[['coeff', 'stderror', 'rsquared', 'rsquaredadj', 'pvals', 'conf_lower', 'conf_higher']]
+    results_df = results_df[['coeff', 'stderror', 'rsquared', 'rsquaredadj', 'pvals', 'conf_lower', 'conf_higher', 'nobs']]
     return results_df
 
 
 def aregdf(formula, data=None, absorb=None, cluster=None):
-    '''a modified version of aref plus r2d'''
+    '''a modified version of aref plus r2d
+    absorb can also be a list such as ['fips', ('year', 'month')], then every
+    entry is swept out of y and X instead of entering the formula as dummies
+    cluster can be a list of two columns for two-way clustered standard errors'''
+
+    if not isinstance(absorb, list):
+        absorb = [absorb]
+
+    return aregmulti(formula, data=data, absorb=absorb, cluster=cluster)
+
+
+def fe_codes(data, absorb):
+    '''turns the absorb list into integer codes, a tuple of columns
+    is absorbed as the interaction of these columns (i.year#i.month)'''
+
+    codes = []
+    with stage('fe_codes', rows=len(data), cols=len(absorb)):
+        for key in absorb:
+            cols = list(key) if isinstance(key, tuple) else [key]
+            codes.append(data.groupby(cols, sort=False, dropna=False, observed=True).ngroup().values)
+
+    return codes
+
+
+def demean(values, codes, tol=1e-8, maxiter=10000):
+    '''sweeps the group means of every factor in codes out of the columns
+    of values by alternating projections, one factor is a single exact pass.
+    the sweeps stop once no group mean is above tol relative to the root mean
+    square of its column, and warn if maxiter sweeps do not get there'''
+
+    values = np.array(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    counts = [np.bincount(c) for c in codes]
+    scale = np.sqrt((values ** 2).mean(axis=0))
+    scale[scale == 0] = 1.
+
+    with stage('demean', rows=values.shape[0], cols=values.shape[1], effects=len(codes)) as info:
+        for i in range(maxiter):
+            change = 0
+            for c, n in zip(codes, counts):
+                means = np.column_stack([np.bincount(c, weights=col, minlength=len(n)) for col in values.T]) / n[:, None]
+                values -= means[c]
+                change = max(change, (np.abs(means).max(axis=0) / scale).max())
+            if len(codes) == 1 or change < tol:
+                break
+        else:
+            warnings.warn('demean did not converge in {} sweeps, the largest group mean left is {:.3g} '
+                          'of its column'.format(maxiter, change), RuntimeWarning)
+        info['iterations'] = i + 1
+
+    return values
+
+
+###designs are cached by the parsed formula and the content of the columns it uses,
+###so the same fit on a rebuilt frame (another figure, the next table) skips patsy
+DESIGN_CACHE = {'entries': OrderedDict(), 'bytes': 0, 'limit': 2 ** 30, 'path': None,
+                'hits': 0, 'misses': 0, 'disk': 0}
+FORMULAS = {}
+DESIGN_LOCK = threading.RLock()
+
+
+def design_cache(limit=None, path=None, clear=False):
+    '''sets the memory bound (in bytes) of the design cache and the folder it is
+    persisted to, a fresh kernel pointed at the same folder starts warm
+    returns the hit, miss and disk counters and the current size'''
+
+    if clear:
+        DESIGN_CACHE['entries'].clear()
+        DESIGN_CACHE.update(bytes=0, hits=0, misses=0, disk=0)
+    if limit is not None:
+        DESIGN_CACHE['limit'] = limit
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+        DESIGN_CACHE['path'] = path
+
+    info = {key: DESIGN_CACHE[key] for key in ['hits', 'misses', 'disk', 'bytes', 'limit', 'path']}
+    info['entries'] = len(DESIGN_CACHE['entries'])
+    return info
+
+
+def design_key(formula, data, absorb=None):
+    '''key of a design: the parsed formula, the data columns it uses (and the
+    absorbed ones) and a hash of their content and index'''
+
+    if formula not in FORMULAS:
+        FORMULAS[formula] = patsy.ModelDesc.from_formula(formula).describe()
+    names = set(re.findall(r'[A-Za-z_]\w*', formula))
+    for key in absorb or []:
+        names.update(key if isinstance(key, tuple) else [key])
+    cols = [c for c in data.columns if c in names]
+
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((FORMULAS[formula], cols, absorb, [str(t) for t in data[cols].dtypes])).encode())
+    h.update(pd.util.hash_pandas_object(data[cols], index=True).values.tobytes())
+
+    return h.hexdigest()
+
+
+def design_lookup(key):
+    '''the cached value of key, from memory or from the cache folder, or None'''
+
+    with DESIGN_LOCK:
+        entries = DESIGN_CACHE['entries']
+        if key in entries:
+            entries.move_to_end(key)
+            DESIGN_CACHE['hits'] += 1
+            return entries[key]
+
+        path = DESIGN_CACHE['path']
+        if path is not None and os.path.exists(os.path.join(path, key + '.pkl')):
+            with open(os.path.join(path, key + '.pkl'), 'rb') as f:
+                value = pickle.load(f)
+            DESIGN_CACHE['disk'] += 1
+            design_store(key, value, persist=False)
+            return value
+
+        DESIGN_CACHE['misses'] += 1
+        return None
+
+
+def design_store(key, value, persist=True):
+    '''keeps value (a tuple of frames or arrays) under key, dropping the least
+    recently used entries beyond the memory bound. fits running in threads
+    share the cache, a key stored twice is only counted once'''
+
+    with DESIGN_LOCK:
+        entries = DESIGN_CACHE['entries']
+        size = sum(getattr(v, 'values', v).nbytes for v in value)
+        if size <= DESIGN_CACHE['limit'] and key not in entries:
+            entries[key] = value
+            DESIGN_CACHE['bytes'] += size
+            while DESIGN_CACHE['bytes'] > DESIGN_CACHE['limit']:
+                old = entries.popitem(last=False)[1]
+                DESIGN_CACHE['bytes'] -= sum(getattr(v, 'values', v).nbytes for v in old)
+
+        path = DESIGN_CACHE['path']
+        if persist and path is not None:
+            with open(os.path.join(path, key + '.pkl'), 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def term_sizes(X, data):
+    '''columns every term of the patsy design X takes in the dummy design, by term
+    name: a term on iindexer codes (categorical columns) stands for the i. dummies
+    of all their levels and cells where patsy leaves out the first level, any
+    other term keeps its columns'''
+
+    sizes = {}
+    for term, cols in X.design_info.term_slices.items():
+        names = [f.name() for f in term.factors]
+        names = [n[2:-1].strip() if n.startswith('C(') and n.endswith(')') else n for n in names]
+        if names and all(n in data and isinstance(data[n].dtype, pd.CategoricalDtype) for n in names):
+            sizes[term.name()] = dummy_count(data, names)
+        else:
+            sizes[term.name()] = cols.stop - cols.start
+
+    return sizes
+
+
+def design(formula, data):
+    '''patsy.dmatrices behind the design cache, returns (y, X); a formula without
+    left hand side returns X alone like patsy.dmatrix. the frames are shared
+    between callers and must not be modified'''
+
+    with stage('patsy', formula=formula) as info:
+        key = design_key(formula, data)
+        value = design_lookup(key)
+        info['cached'] = value is not None
+        if value is None:
+            if formula.split('~')[0].strip():
+                value = tuple(patsy.dmatrices(formula, data, return_type='dataframe'))
+            else:
+                value = (patsy.dmatrix(formula.split('~')[-1], data, return_type='dataframe'),)
+            design_store(key, value)
+        info.update(rows=value[-1].shape[0], cols=value[-1].shape[1])
+
+    return value if len(value) == 2 else value[0]
+
+
+def coefdf(coeff, vcov, names, rs, rsa, nobs):
+    '''builds the r2d frame from a coefficient vector and its covariance,
+    inference is normal based like the cluster fits of statsmodels'''
+
+    stde = np.sqrt(np.diag(vcov))
+    z = stats.norm.ppf(0.975)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pvals = 2 * stats.norm.sf(np.abs(coeff / stde))
+
+    results_df = pd.DataFrame({'coeff': coeff,
+                               'stderror': stde,
+                               'rsquared': rs,
+                               'rsquaredadj': rsa,
+                               'pvals': pvals,
+                               'conf_lower': coeff - z * stde,
+                               'conf_higher': coeff + z * stde,
+                               'nobs': nobs
+                               }, index=names)
+
+    # inside a stored fit the covariance of the reported terms (not the dummies) is kept
+    kept = getattr(RESULTS_LOCAL, 'vcov', None)
+    if kept is not None:
+        reported = np.flatnonzero(['[' not in str(name) for name in names])
+        kept[id(results_df)] = (results_df.index[reported], np.asarray(vcov)[np.ix_(reported, reported)])
 
-    y, X = patsy.dmatrices(formula, data, return_type='dataframe')
+    return results_df
 
-    ybar = y.mean()
 
-    y = y - y.groupby(data[absorb]).transform('mean') + ybar
+def cluster_index(data, cluster):
+    '''the cluster structure of a sample, built once and shared by every fit on it
+    cluster is a column, or a list of two columns for two-way clustering which adds
+    their intersection with a negative sign (Cameron, Gelbach and Miller)
+    returns a list of (codes, aggregation matrix, number of clusters, sign)'''
 
-    Xbar = X.mean()
+    keys = cluster if isinstance(cluster, list) else [cluster]
+    dims = [([key], 1.) for key in keys]
+    if len(keys) == 2:
+        dims.append((keys, -1.))
 
-    X = X - X.groupby(data[absorb]).transform('mean') + Xbar
+    index = []
+    with stage('cluster_index', rows=len(data), cols=len(dims)) as info:
+        for cols, sign in dims:
+            codes = data.groupby(cols, sort=False, observed=True).ngroup().values
+            G = codes.max() + 1
+            # row i adds to cluster codes[i], so the score sums are one sparse product
+            D = sparse.csr_matrix((np.ones(len(codes)), (codes, np.arange(len(codes)))), shape=(G, len(codes)))
+            index.append((codes, D, G, sign))
+        info['clusters'] = index[0][2]
 
-    reg = sm.OLS(y, X)
-    # Account for df loss from FE transform
-    reg.df_resid -= (data[absorb].nunique() - 1)
-    results = reg.fit(cov_type='cluster', cov_kwds={'groups': data[cluster].values}, missing='drop')
+    return index
 
-    stde = results.bse
-    pvals = results.pvalues
-    coeff = results.params
-    conf_lower = results.conf_int()[0]
-    conf_higher = results.conf_int()[1]
-    rs = results.rsquared
-    rsa = results.rsquared_adj
 
-    results_df = pd.DataFrame({'stderror': stde,
-                               'coeff': coeff,
-                               'rsquared': rs,
-                               'rsquaredadj': rsa,
-                               'conf_lower': conf_lower,
-                               'conf_higher': conf_higher,
-                               'pvals': pvals
-                               })
+def clustervcov(bread, scores, index, nobs, k):
+    '''cluster robust covariance bread @ meat @ bread.T, scores is the n by k
+    matrix of x_i * e_i and the meat sums it within the clusters of every dimension
+    of index, each with the small sample correction statsmodels uses'''
 
-    results_df = results_df[['coeff', 'stderror', 'rsquared', 'rsquaredadj', 'pvals', 'conf_lower', 'conf_higher']]
-    return results_df
+    vcov = 0
+    with stage('clustervcov', rows=scores.shape[0], cols=scores.shape[1], clusters=index[0][2]):
+        for codes, D, G, sign in index:
+            S = D @ scores
+            correction = G / (G - 1.) * (nobs - 1.) / (nobs - k)
+            vcov = vcov + sign * correction * (bread @ (S.T @ S) @ bread.T)
+
+    return vcov
+
+
+###K of the small sample correction (G/(G-1))(N-1)/(N-K) of the clustered standard errors:
+###'dense' (the default) counts every column of the dummy design the tables were written for,
+###as patsy built it and statsmodels counted it: the columns of X and, for every absorbed
+###effect not nested in the cluster, a dummy per level of each of its columns and per cell
+###of their interactions, empty cells included. 'stata' counts the columns of X and the
+###observed absorbed levels, less the first. set KRULE['k'] = 'stata' to opt in
+KRULE = {'k': 'dense'}
+
+
+def fenested(codes, index):
+    '''for every absorbed effect whether its levels are nested in a cluster (fips within fips)'''
+
+    return [any(pd.Series(g).groupby(c).nunique().max() == 1 for g, D, G, sign in index if sign > 0) for c in codes]
+
+
+def fedof(codes, index):
+    '''degrees of freedom taken by the absorbed levels, and the part of it that
+    enters the cluster correction (levels nested in a cluster, fips within fips, do not)'''
+
+    dof = [c.max() for c in codes]
+    nested = fenested(codes, index)
+
+    return sum(dof), sum(d for d, n in zip(dof, nested) if not n)
+
+
+def dummy_count(data, cols):
+    '''number of i. dummies of the interaction of cols: one per level of every
+    column (every category of a categorical) and so one per cell, empty ones included'''
+
+    n = 1
+    for c in cols:
+        n *= len(data[c].cat.categories) if isinstance(data[c].dtype, pd.CategoricalDtype) else data[c].nunique()
+
+    return n
+
+
+def fedummies(data, absorb, codes, index):
+    '''columns the absorbed effects not nested in the cluster take in the dummy design,
+    an effect is written out as i.a##i.b: its columns and their interactions, each term once'''
+
+    terms = set()
+    for key, nested in zip(absorb, fenested(codes, index)):
+        cols = sorted(key) if isinstance(key, tuple) else [key]
+        if not nested:
+            terms.update(t for size in range(1, len(cols) + 1) for t in combinations(cols, size))
+
+    return sum(dummy_count(data, t) for t in terms)
+
+
+def fesolve(Y, X, codes, index, key=None, dense=None):
+    '''absorbs codes from every column of Y and X, factorizes X once and
+    returns (coeff, vcov, rsquared, rsquaredadj) for each column of Y,
+    index is the cluster_index of the sample. with a key the demeaned
+    [Y, X] is kept in the design cache. dense is the column count of the
+    dummy design, the K of the clustered correction unless KRULE is 'stata'
+    (or dense is not given), then K is the columns of X and the observed
+    absorbed levels not nested in the cluster'''
+
+    Y = np.asarray(Y, dtype=float).reshape(len(X), -1)
+    m = Y.shape[1]
+    Z = design_lookup(key) if key is not None else None
+    if Z is None:
+        Z = np.column_stack([Y, X])
+        Z = (demean(Z, codes) + Z.mean(axis=0),)
+        if key is not None:
+            design_store(key, Z)
+    Z = Z[0]
+    Yd, Xd = Z[:, :m], Z[:, m:]
+
+    with stage('solve', rows=Xd.shape[0], cols=Xd.shape[1], outcomes=m):
+        pinv = np.linalg.pinv(Xd)
+        B = pinv @ Yd
+        R = Yd - Xd @ B
+
+        nobs, k = Xd.shape
+        dof, extra = fedof(codes, index)
+        df_resid = nobs - np.linalg.matrix_rank(Xd) - dof
+        k = k + extra if KRULE['k'] == 'stata' or dense is None else dense
+        bread = pinv @ pinv.T
+
+    # r-squared within the first absorbed effect, as with dummies for the others
+    Y1 = demean(Y, codes[:1])
+    tss = ((Y1 - Y1.mean(axis=0)) ** 2).sum(axis=0)
+
+    results = []
+    for j in range(m):
+        vcov = clustervcov(bread, Xd * R[:, [j]], index, nobs, k)
+        rs = 1 - R[:, j] @ R[:, j] / tss[j]
+        rsa = 1 - (nobs - 1.) / df_resid * (1 - rs)
+        results.append((B[:, j], vcov, rs, rsa))
+
+    return results
+
+
+###fitted results are kept in a sqlite file keyed by the specification, the content of
+###the data columns it names and the code of the estimators: a builder rerun on
+###unchanged data reads its fits back and only changed specifications are estimated
+# the default file is in the Data folder of the repository, wherever python runs from
+RESULTS = {'path': os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data', '.results.sqlite')),
+           'on': True, 'code': None, 'hits': 0, 'misses': 0}
+RESULTS_LOCK = threading.RLock()
+RESULTS_LOCAL = threading.local()
+RESULTS_COLUMNS = ['coeff', 'stderror', 'rsquared', 'rsquaredadj', 'pvals', 'conf_lower', 'conf_higher', 'nobs']
+# the functions behind the stored estimators, editing any of them invalidates the store
+RESULTS_CODE = ['term_sizes', 'design', 'coefdf', 'cluster_index', 'clustervcov', 'fenested', 'fedof', 'dummy_count',
+                'fedummies', 'demean', 'fe_codes', 'fesolve', 'aregmulti', 'aregmany', 'ladder_terms', 'feladder', 'aregladder',
+                'ladderfit', 'aregjackknife', 'spec_terms', 'term_name', 'spec_size', 'compile_spec', 'aregspec',
+                'probitsolve', 'probitspec', 'results_key', 'used_columns', 'stored']
+
+
+def results_db():
+    '''a connection to the store, the tables (and the folder) are created on first use'''
+
+    os.makedirs(os.path.dirname(RESULTS['path']) or '.', exist_ok=True)
+    db = sqlite3.connect(RESULTS['path'], timeout=60)
+    db.executescript('''
+        CREATE TABLE IF NOT EXISTS fits (spec TEXT, data TEXT, code TEXT, estimator TEXT, arguments TEXT,
+                                         layout BLOB, created REAL, PRIMARY KEY (spec, data, code));
+        CREATE TABLE IF NOT EXISTS terms (spec TEXT, data TEXT, code TEXT, frame INTEGER, position INTEGER,
+                                          term TEXT, coeff REAL, stderror REAL, rsquared REAL, rsquaredadj REAL,
+                                          pvals REAL, conf_lower REAL, conf_higher REAL, nobs INTEGER);
+        CREATE TABLE IF NOT EXISTS vcov (spec TEXT, data TEXT, code TEXT, frame INTEGER,
+                                         row TEXT, col TEXT, value REAL);
+        CREATE INDEX IF NOT EXISTS terms_key ON terms (spec, data, code);
+        CREATE INDEX IF NOT EXISTS vcov_key ON vcov (spec, data, code);
+    ''')
+
+    return db
+
+
+def results_store(path=None, on=None, clear=False):
+    '''sets the file of the results store and switches it on or off, clear empties it
+    returns the file, the state, the hit and miss counters and the number of fits stored'''
+
+    if path is not None:
+        RESULTS['path'] = path
+    if on is not None:
+        RESULTS['on'] = on
+
+    with RESULTS_LOCK:
+        fits = 0
+        if os.path.exists(RESULTS['path']):
+            db = results_db()
+            try:
+                with db:
+                    if clear:
+                        for table in ['fits', 'terms', 'vcov']:
+                            db.execute('DELETE FROM ' + table)
+                        RESULTS.update(hits=0, misses=0)
+                    fits = db.execute('SELECT COUNT(*) FROM fits').fetchone()[0]
+            finally:
+                db.close()
+
+    return {'path': RESULTS['path'], 'on': RESULTS['on'], 'hits': RESULTS['hits'],
+            'misses': RESULTS['misses'], 'fits': fits}
+
+
+def code_version():
+    '''hash of the source of the estimators and the versions of the libraries they use'''
+
+    if RESULTS['code'] is None:
+        h = hashlib.blake2b(digest_size=20)
+        for name in RESULTS_CODE:
+            h.update(inspect.getsource(globals()[name]).encode())
+        h.update(repr([np.__version__, pd.__version__, patsy.__version__, scipy.__version__]).encode())
+        RESULTS['code'] = h.hexdigest()
+
+    return RESULTS['code']
+
+
+def results_key(estimator, arguments, data):
+    '''(spec hash, data hash, code version) of a fit, the data hash covers the
+    content and index of the columns of data named in the arguments'''
+
+    names = set(used_columns(arguments))
+    cols = [c for c in data.columns if c in names]
+
+    spec = hashlib.blake2b(digest_size=20)
+    spec.update((estimator + arguments + KRULE['k']).encode())
+    content = hashlib.blake2b(digest_size=20)
+    content.update(repr((cols, [str(t) for t in data[cols].dtypes])).encode())
+    content.update(pd.util.hash_pandas_object(data[cols], index=True).values.tobytes())
+
+    return spec.hexdigest(), content.hexdigest(), code_version()
+
+
+def results_lookup(key):
+    '''the stored result of key rebuilt as the estimator returned it, or None (also
+    when the store cannot be read, with a warning)'''
+
+    with RESULTS_LOCK:
+        try:
+            db = results_db()
+            try:
+                row = db.execute('SELECT layout FROM fits WHERE spec=? AND data=? AND code=?', key).fetchone()
+                if row is None:
+                    return None
+                terms = pd.read_sql_query('SELECT * FROM terms WHERE spec=? AND data=? AND code=? ORDER BY frame, position',
+                                          db, params=key)
+            finally:
+                db.close()
+        except (sqlite3.Error, OSError) as e:
+            warnings.warn('results store {} unavailable, fitting without it: {}'.format(RESULTS['path'], e), RuntimeWarning)
+            return None
+
+    layout, frames = pickle.loads(row[0])
+    built = []
+    for i, (index, dtypes) in enumerate(frames):
+        part = terms[terms['frame'] == i]
+        built.append(pd.DataFrame({col: part[col].values.astype(dtypes[col]) for col in RESULTS_COLUMNS}, index=index))
+
+    def unflatten(node):
+        if isinstance(node, int):
+            return built[node]
+        if isinstance(node, dict):
+            return {k: unflatten(v) for k, v in node.items()}
+        return type(node)(unflatten(v) for v in node)
+
+    return unflatten(layout)
+
+
+def results_save(key, estimator, arguments, value, vcovs):
+    '''writes the frames in value (a frame, or lists and dicts of frames) under key,
+    with the covariance of their reported terms from vcovs'''
+
+    frames = []
+
+    def flatten(node):
+        if isinstance(node, pd.DataFrame):
+            frames.append(node)
+            return len(frames) - 1
+        if isinstance(node, dict):
+            return {k: flatten(v) for k, v in node.items()}
+        return type(node)(flatten(v) for v in node)
+
+    layout = flatten(value)
+    terms, cells = [], []
+    for i, df in enumerate(frames):
+        values = df[RESULTS_COLUMNS].astype(object).values.tolist()
+        terms += [key + (i, position, str(term)) + tuple(row) for position, (term, row) in enumerate(zip(df.index, values))]
+        if id(df) in vcovs:
+            names, vcov = vcovs[id(df)]
+            cells += [key + (i, str(a), str(b), float(vcov[r, c]))
+                      for r, a in enumerate(names) for c, b in enumerate(names)]
+    blob = pickle.dumps((layout, [(df.index, df.dtypes.astype(str).to_dict()) for df in frames]),
+                        protocol=pickle.HIGHEST_PROTOCOL)
+
+    # the store is a cache, a fit it cannot keep is still returned
+    with RESULTS_LOCK:
+        try:
+            db = results_db()
+            try:
+                with db:
+                    db.execute('DELETE FROM terms WHERE spec=? AND data=? AND code=?', key)
+                    db.execute('DELETE FROM vcov WHERE spec=? AND data=? AND code=?', key)
+                    db.execute('INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               key + (estimator, arguments, blob, time.time()))
+                    db.executemany('INSERT INTO terms VALUES (' + ', '.join(['?'] * 14) + ')', terms)
+                    db.executemany('INSERT INTO vcov VALUES (?, ?, ?, ?, ?, ?, ?)', cells)
+            finally:
+                db.close()
+        except (sqlite3.Error, OSError) as e:
+            warnings.warn('results store {} unavailable, the fit is not kept: {}'.format(RESULTS['path'], e),
+                          RuntimeWarning)
+
+
+def stored(estimator):
+    '''estimator behind the results store: a call with the same arguments on data with
+    the same content in the columns they name, fitted by the same code, is read back
+    from the store instead of estimated'''
+
+    signature = inspect.signature(estimator)
+
+    @functools.wraps(estimator)
+    def fit(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        data = bound.arguments['data']
+        if not RESULTS['on'] or data is None:
+            return estimator(*args, **kwargs)
+
+        arguments = repr([(k, v) for k, v in bound.arguments.items() if k != 'data'])
+        with stage('results_store', estimator=estimator.__name__) as info:
+            key = results_key(estimator.__name__, arguments, data)
+            value = results_lookup(key)
+            info['cached'] = value is not None
+        if value is not None:
+            RESULTS['hits'] += 1
+            return value
+
+        RESULTS['misses'] += 1
+        previous = getattr(RESULTS_LOCAL, 'vcov', None)
+        RESULTS_LOCAL.vcov = vcovs = {}
+        try:
+            value = estimator(*args, **kwargs)
+        finally:
+            RESULTS_LOCAL.vcov = previous
+        results_save(key, estimator.__name__, arguments, value, vcovs)
+
+        return value
+
+    return fit
+
+
+def results_frame(vcov=False):
+    '''everything in the store as a tidy frame, one row per term of every stored fit
+    with its estimator and arguments, or with vcov one row per covariance cell'''
+
+    if not os.path.exists(RESULTS['path']):
+        return pd.DataFrame()
+    table = 'vcov' if vcov else 'terms'
+    with RESULTS_LOCK:
+        db = results_db()
+        try:
+            return pd.read_sql_query('SELECT f.estimator, f.arguments, f.created, t.* FROM {} t JOIN fits f '
+                                     'USING (spec, data, code)'.format(table), db)
+        finally:
+            db.close()
+
+
+@stored
+def aregmulti(formula, data=None, absorb=None, cluster=None):
+    '''aregdf with several absorbed fixed effects, e.g. absorb=['fips', ('year', 'month')]
+    the first entry plays the role of the usual areg absorb: r-squared is measured
+    within it, as it is when the other effects enter as dummies. Absorbed levels count
+    towards the degrees of freedom and, unless nested in the cluster, towards the
+    small sample correction of the clustered standard errors like dummies would'''
+
+    y, X = design(formula, data)
+    sub = data.loc[y.index]
+    codes = fe_codes(sub, absorb)
+    index = cluster_index(sub, cluster)
+
+    key = design_key(formula, data, absorb)
+    dense = sum(term_sizes(X, sub).values()) + fedummies(sub, absorb, codes, index)
+    coeff, vcov, rs, rsa = fesolve(y.values, X.values, codes, index, key=key, dense=dense)[0]
+
+    return coefdf(coeff, vcov, X.columns, rs, rsa, len(X))
+
+
+@stored
+def aregmany(outcomes, formula, data=None, absorb=None, cluster=None):
+    '''aregdf for several outcomes on the same right hand side, X is built,
+    demeaned and factorized once for every set of outcomes that share their
+    missing rows. formula is the right hand side (anything left of ~ is ignored)
+    and one results frame is returned per outcome, in order'''
+
+    if not isinstance(absorb, list):
+        absorb = [absorb]
+
+    X = design('~' + formula.split('~')[-1], data)
+    sub = data.loc[X.index]
+    masks = sub[outcomes].notna()
+    size = sum(term_sizes(X, sub).values())
+
+    # outcomes with the same missing rows are solved together
+    patterns = {}
+    for key in outcomes:
+        patterns.setdefault(masks[key].values.tobytes(), []).append(key)
+
+    results = {}
+    for keys in patterns.values():
+        rows = masks[keys[0]].values
+        part = sub[rows]
+        codes = fe_codes(part, absorb)
+        index = cluster_index(part, cluster)
+        dense = size + fedummies(part, absorb, codes, index)
+        fits = fesolve(part[keys].values, X.values[rows], codes, index, dense=dense)
+        for key, (coeff, vcov, rs, rsa) in zip(keys, fits):
+            results[key] = coefdf(coeff, vcov, X.columns, rs, rsa, len(part))
+
+    return [results[key] for key in outcomes]
+
+
+def ladder_terms(formula, blocks):
+    '''names of the patsy terms every rung adds, a term counts at the first
+    rung it appears in (e.g. C(year1) of C(month1)*C(year1) after i.year)'''
+
+    seen = set()
+    rungs = []
+    for part in [formula.split('~')[-1]] + list(blocks):
+        names = [t.name() for t in patsy.ModelDesc.from_formula(part).rhs_termlist]
+        rungs.append([n for n in names if n not in seen])
+        seen.update(names)
+
+    return rungs
+
+
+def feladder(Y, X, rungs, codes, index, tol=1e-7, dense=None):
+    '''fesolve for nested designs, rungs holds the columns of X every rung adds.
+    the data is demeaned once and the orthonormal basis of X grows block by
+    block (Frisch-Waugh), so a rung only factorizes its own new columns.
+    collinear columns are omitted like stata does, with coefficient 0.
+    dense holds the column count of the dummy design of every rung (see fesolve)
+    returns for each rung a list of (coeff, vcov, rsquared, rsquaredadj) per column of Y'''
+
+    Y = np.asarray(Y, dtype=float).reshape(len(X), -1)
+    m = Y.shape[1]
+    Z = np.column_stack([Y, X])
+    Z = demean(Z, codes) + Z.mean(axis=0)
+    Yd, Xd = Z[:, :m], Z[:, m:]
+    # collinearity is judged against the size of the column before absorbing,
+    # what the absorbed effects leave of a dummy they span is only rounding
+    norms = np.sqrt((np.asarray(X, dtype=float) ** 2).sum(axis=0))
+
+    nobs = len(Xd)
+    dof, extra = fedof(codes, index)
+    Y1 = demean(Y, codes[:1])
+    tss = ((Y1 - Y1.mean(axis=0)) ** 2).sum(axis=0)
+
+    Q = np.zeros((nobs, 0))
+    R = np.zeros((0, 0))
+    QY = np.zeros((0, m))
+    kept = []
+    used = []
+    results = []
+    for step, cols in enumerate(rungs):
+        cols = list(cols)
+        with stage('solve', rows=nobs, cols=len(cols), outcomes=m):
+            W = Xd[:, cols]
+
+            # project the new block off the current basis, twice to stay orthogonal
+            C = Q.T @ W
+            W = W - Q @ C
+            C2 = Q.T @ W
+            W -= Q @ C2
+            C += C2
+
+            # the leading pivots with a non negligible residual are the new independent columns
+            rank = 0
+            if len(cols):
+                r, piv = linalg.qr(W, mode='r', pivoting=True)
+                d = np.abs(np.diag(r))
+                rank = int(np.argmin(np.append(d > tol * norms[cols][piv[:len(d)]], False)))
+                new = np.sort(piv[:rank])
+            else:
+                new = np.zeros(0, dtype=int)
+
+            q, r = np.linalg.qr(W[:, new])
+            R = np.block([[R, C[:, new]], [np.zeros((rank, len(R))), r]])
+            Q = np.column_stack([Q, q])
+            QY = np.vstack([QY, q.T @ Yd])
+            kept += [cols[i] for i in new]
+            used += cols
+
+            # X = QR, so the cluster scores of X are the ones of Q times R
+            Rinv = linalg.solve_triangular(R, np.eye(len(R)))
+            B = Rinv @ QY
+            E = Yd - Q @ QY
+        k = len(used) + extra if KRULE['k'] == 'stata' or dense is None else dense[step]
+        df_resid = nobs - len(kept) - dof
+
+        order = np.sort(used)
+        where = np.searchsorted(order, kept)
+        rung = []
+        for j in range(m):
+            vcov = np.zeros((len(order), len(order)))
+            vcov[np.ix_(where, where)] = clustervcov(Rinv, Q * E[:, [j]], index, nobs, k)
+            coeff = np.zeros(len(order))
+            coeff[where] = B[:, j]
+            rs = 1 - E[:, j] @ E[:, j] / tss[j]
+            rsa = 1 - (nobs - 1.) / df_resid * (1 - rs)
+            rung.append((coeff, vcov, rs, rsa))
+        results.append(rung)
+
+    return results
+
+
+@stored
+def aregladder(formula, blocks, data=None, absorb=None, cluster=None, outcomes=None):
+    '''fits the nested columns of a table: formula, then formula plus each
+    block of controls in turn, e.g. blocks=['C(non_us_t) + C(int_l)', 'C(aa_assass)']
+    the rungs share one demeaned design and each rung only adds its block to the
+    factorization of the previous one. rows are the complete ones of the last rung
+    returns one r2d style frame per rung, or such a list per outcome if outcomes
+    (several left hand sides, as in aregmany) is given'''
+
+    if not isinstance(absorb, list):
+        absorb = [absorb]
+    single = outcomes is None
+    if single:
+        outcomes = [formula.split('~')[0].strip()]
+
+    X = design('~' + ' + '.join([formula.split('~')[-1]] + list(blocks)), data)
+    slices = X.design_info.term_name_slices
+    terms = ladder_terms(formula, blocks)
+    rungs = [np.concatenate([np.arange(slices[n].start, slices[n].stop) for n in names] + [np.zeros(0, dtype=int)])
+             for names in terms]
+    sub = data.loc[X.index]
+    sizes = term_sizes(X, sub)
+    sizes = [sum(sizes[n] for n in names) for names in terms]
+    results = ladderfit(sub, outcomes, X.values, X.columns, rungs, absorb, cluster, sizes)
+
+    if single:
+        return results[outcomes[0]]
+    return [results[key] for key in outcomes]
+
+
+def ladderfit(sub, outcomes, X, names, rungs, absorb, cluster, sizes=None):
+    '''runs feladder for every set of outcomes sharing their missing rows in sub
+    (the rows of X) and returns a dict of the frames per rung of every outcome.
+    sizes are the columns every rung adds to the dummy design, by default its
+    columns of X'''
+
+    if sizes is None:
+        sizes = [len(cols) for cols in rungs]
+    sizes = np.cumsum(sizes)
+
+    masks = sub[outcomes].notna()
+    patterns = {}
+    for key in outcomes:
+        patterns.setdefault(masks[key].values.tobytes(), []).append(key)
+
+    results = {}
+    for keys in patterns.values():
+        rows = masks[keys[0]].values
+        part = sub[rows]
+        codes = fe_codes(part, absorb)
+        index = cluster_index(part, cluster)
+        dense = sizes + fedummies(part, absorb, codes, index)
+        fits = feladder(part[keys].values, X[rows], rungs, codes, index, dense=dense)
+        used = np.zeros(0, dtype=int)
+        for cols, rung in zip(rungs, fits):
+            used = np.sort(np.concatenate([used, cols]))
+            for key, (coeff, vcov, rs, rsa) in zip(keys, rung):
+                results.setdefault(key, []).append(coefdf(coeff, vcov, names[used], rs, rsa, len(part)))
+
+    return results
+
+
+@stored
+def aregjackknife(formula, data=None, absorb=None, cluster=None, leaveout=None, rcond=1e-10):
+    '''aregdf dropping one level of leaveout (year, state, division) at a time
+    the cross products of [y, X] and their sums within every absorb group are built
+    once, each fit downdates them by the rows of its dropped level instead of
+    rebuilding and refactorizing the design. absorb is a single column here
+    returns a dict of r2d style frames keyed by the dropped level'''
+
+    y, X = design(formula, data)
+    sub = data.loc[y.index]
+    Z = np.column_stack([y.values, X.values]).astype(float)
+    f = fe_codes(sub, [absorb])[0]
+    F = f.max() + 1
+    agg = lambda rows: sparse.csr_matrix((np.ones(rows.sum()), (f[rows], np.flatnonzero(rows))), shape=(F, len(Z))) @ Z
+
+    everything = np.ones(len(Z), dtype=bool)
+    ZZ = Z.T @ Z
+    Sf = agg(everything)
+    nf = np.bincount(f, minlength=F)
+    lcodes, levels = pd.factorize(sub[leaveout], sort=True)
+
+    results = {}
+    for t, level in enumerate(levels):
+        drop = lcodes == t
+        rows = ~drop
+        Zt = Z[drop]
+
+        # within-absorb cross products of what is left, with the grand mean added back
+        S = Sf - agg(drop)
+        n = nf - np.bincount(f[drop], minlength=F)
+        left = n > 0
+        N = n.sum()
+        total = S.sum(axis=0)
+        W = ZZ - Zt.T @ Zt - S[left].T @ (S[left] / n[left, None]) + np.outer(total, total) / N
+
+        # pseudo inverse of X'X from its eigenvalues, collinear dummies get no weight
+        w, V = np.linalg.eigh(W[1:, 1:])
+        keep = w > rcond * w.max()
+        bread = (V[:, keep] / w[keep]) @ V[:, keep].T
+        b = bread @ W[1:, 0]
+
+        fr = f[rows]
+        Xs = X.values[rows] - S[fr, 1:] / n[fr, None] + total[1:] / N
+        e = y.values[rows, 0] - X.values[rows] @ b
+        e -= (np.bincount(fr, weights=e, minlength=F) / np.maximum(n, 1))[fr]
+
+        part = sub[rows]
+        codes = fe_codes(part, [absorb])
+        index = cluster_index(part, cluster)
+        dof, extra = fedof(codes, index)
+        # the dummy design of the rows left has no columns for the dummies of the dropped level
+        k = X.shape[1] + extra
+        if KRULE['k'] == 'dense':
+            k = (X.values[rows] != 0).any(axis=0).sum() + fedummies(part, [absorb], codes, index)
+        vcov = clustervcov(bread, Xs * e[:, None], index, N, k)
+
+        df_resid = N - keep.sum() - dof
+        rs = 1 - e @ e / (W[0, 0] - total[0] ** 2 / N)
+        rsa = 1 - (N - 1.) / df_resid * (1 - rs)
+        results[level] = coefdf(b, vcov, X.columns, rs, rsa, N)
+
+    return results
+
+
+###a specification declares its columns instead of writing a formula,
+###controls and interactions are categorical and coded straight from level codes
+Spec = namedtuple('Spec', ['outcome', 'regressors', 'controls', 'interactions', 'absorb', 'cluster'],
+                  defaults=[[], [], [], 'fips', 'fips'])
+
+
+def spec_terms(spec):
+    '''the terms of a spec in order: the intercept, the regressors, the controls and
+    for every interaction its lower order terms and itself (stata's a##b)
+    a term is a column name for a regressor and a tuple of columns otherwise'''
+
+    terms = ['Intercept'] + list(spec.regressors) + [(c,) for c in spec.controls]
+    for inter in spec.interactions:
+        for size in range(1, len(inter) + 1):
+            terms += [t for t in combinations(inter, size) if t not in terms]
+
+    return terms
+
+
+def term_name(term):
+    '''the name of a term in the results, month#year for an interaction'''
+
+    return term if isinstance(term, str) else '#'.join(term)
+
+
+def spec_size(spec, term, data):
+    '''columns term takes in the dummy design of spec: a control counts its levels but
+    the first, like C(), while iindexer codes and the columns of an interaction are
+    i. dummies written out, a dummy for each of their levels and for every cell,
+    empty cells included'''
+
+    if not isinstance(term, tuple):
+        return 1
+    inter = {c for t in spec.interactions for c in t}
+    if len(term) == 1 and term[0] not in inter and not isinstance(data[term[0]].dtype, pd.CategoricalDtype):
+        return data[term[0]].nunique() - 1
+
+    return dummy_count(data, term)
+
+
+def compile_spec(spec, data):
+    '''turns a Spec into the arrays the estimators take without writing or parsing
+    a formula. categorical terms are coded from integer level codes against the
+    first level, like C() and i., the cells of an interaction only for the other
+    levels of all its columns, like #. only observed cells get a column, the K of
+    the clustered correction still counts the dummy design (see spec_size)
+    returns (X, names, slices, sub): slices maps every term name to its columns
+    of X and sub are the rows complete in every declared column but the outcome'''
+
+    terms = spec_terms(spec)
+    absorb = spec.absorb if isinstance(spec.absorb, list) else [spec.absorb]
+    cluster = spec.cluster if isinstance(spec.cluster, list) else [spec.cluster]
+    cols = list(spec.regressors) + [c for t in terms if isinstance(t, tuple) for c in t]
+    cols += [c for a in absorb for c in (a if isinstance(a, tuple) else [a])] + cluster
+    sub = data.dropna(subset=list(dict.fromkeys(cols)))
+    n = len(sub)
+    levels = {c: pd.factorize(sub[c], sort=True) for t in terms if isinstance(t, tuple) for c in t}
+
+    blocks, names, slices = [], [], {}
+    for term in terms:
+        if term == 'Intercept':
+            block, labels = np.ones((n, 1)), ['Intercept']
+        elif isinstance(term, str):
+            block, labels = sub[[term]].values.astype(float), [term]
+        else:
+            # mixed radix cell code, kept where no column is at its base level
+            cell = np.zeros(n, dtype=np.int64)
+            ok = np.ones(n, dtype=bool)
+            for c in term:
+                codes, uniques = levels[c]
+                cell = cell * len(uniques) + codes
+                ok &= codes > 0
+            cells, first, pos = np.unique(cell[ok], return_index=True, return_inverse=True)
+            block = np.zeros((n, len(cells)))
+            block[np.flatnonzero(ok), pos] = 1
+            rows = np.flatnonzero(ok)[first]
+            labels = [term_name(term) + '[' + ','.join(str(levels[c][1][levels[c][0][r]]) for c in term) + ']' for r in rows]
+        slices[term_name(term)] = np.arange(len(names), len(names) + len(labels))
+        blocks.append(block)
+        names += labels
+
+    return np.column_stack(blocks), pd.Index(names), slices, sub
+
+
+@stored
+def aregspec(spec, data=None):
+    '''aregdf for a Spec, e.g. Spec('ln_emp_pop', ['successful', 'post'], ['non_us_t'],
+    [('month', 'year')]). a list of nested specs (the columns of a table, each one
+    adding to the one before) is fitted as a ladder on the rows of the last one
+    returns a frame, or a frame per spec for a list, and such a result per outcome
+    when the outcome of the spec is a list'''
+
+    specs = spec if isinstance(spec, list) else [spec]
+    last = specs[-1]
+    with stage('compile_spec') as info:
+        X, names, slices, sub = compile_spec(last, data)
+        info.update(rows=X.shape[0], cols=X.shape[1])
+
+    seen = set()
+    rungs, sizes = [], []
+    for s in specs:
+        new = [t for t in spec_terms(s) if term_name(t) not in seen]
+        rungs.append(np.concatenate([slices[term_name(t)] for t in new] + [np.zeros(0, dtype=int)]))
+        sizes.append(sum(spec_size(last, t, sub) for t in new))
+        seen.update(term_name(t) for t in new)
+
+    outcomes = last.outcome if isinstance(last.outcome, list) else [last.outcome]
+    absorb = last.absorb if isinstance(last.absorb, list) else [last.absorb]
+    results = ladderfit(sub, outcomes, X, names, rungs, absorb, last.cluster, sizes)
+
+    results = [r if isinstance(spec, list) else r[0] for r in (results[key] for key in outcomes)]
+    if isinstance(last.outcome, list):
+        return results
+    return results[0]
+
+
+###probit by Newton steps on a prebuilt design: the gradient and hessian are analytic,
+###the standard errors clustered and the average marginal effects get their
+###covariance by the delta method, as smf.probit(...).fit(cov_type='cluster').get_margeff()
+def probitsolve(y, X, index, start=None, tol=1e-8, maxiter=100):
+    '''maximizes the probit likelihood of y on X by Newton steps from start (zeros by
+    default), index is the cluster_index of the sample. returns (coeff, vcov, llf,
+    margeff, margeffvcov) with the average dPr(y=1)/dx of every column of X'''
+
+    y = np.asarray(y, dtype=float)
+    n, k = X.shape
+    q = 2 * y - 1
+    b = np.zeros(k) if start is None else np.asarray(start, dtype=float)
+
+    def loglike(b):
+        return stats.norm.logcdf(q * (X @ b)).sum()
+
+    with stage('probit', rows=n, cols=k) as info:
+        llf = loglike(b)
+        for iteration in range(1, maxiter + 1):
+            xb = X @ b
+            # d log Phi(q xb) / d xb, in logs so that it holds far in the tails
+            lam = q * np.exp(stats.norm.logpdf(q * xb) - stats.norm.logcdf(q * xb))
+            H = (X * (lam * (lam + xb))[:, None]).T @ X
+            step = np.linalg.solve(H, X.T @ lam)
+            # the likelihood is concave, halving only guards a far off start
+            t = 1.
+            while loglike(b + t * step) < llf - 1e-10 and t > 1e-6:
+                t /= 2
+            b = b + t * step
+            llf = loglike(b)
+            if np.abs(t * step).max() < tol:
+                break
+        info['iterations'] = iteration
+
+    xb = X @ b
+    lam = q * np.exp(stats.norm.logpdf(q * xb) - stats.norm.logcdf(q * xb))
+    bread = np.linalg.inv((X * (lam * (lam + xb))[:, None]).T @ X)
+    vcov = clustervcov(bread, X * lam[:, None], index, n, k)
+
+    # the effects are mean(phi(xb)) * b, their jacobian in b adds the change of the mean
+    pdf = stats.norm.pdf(xb)
+    margeff = pdf.mean() * b
+    J = pdf.mean() * np.eye(k) + np.outer(b, X.T @ (-xb * pdf) / n)
+
+    return b, vcov, llf, margeff, J @ vcov @ J.T
+
+
+@stored
+def probitspec(spec, data=None):
+    '''average marginal effects of a probit of the outcome of a Spec (a 0/1 column) on
+    its terms, the absorb of the spec is not used. a list of specs is fitted on
+    one design of all their terms, on the rows complete in every spec, and every
+    spec starts from the coefficients of the one before (by name, new terms at zero)
+    returns a coefdf frame of the effects, or a list of them, rsquared is the pseudo
+    r-squared of McFadden'''
+
+    specs = spec if isinstance(spec, list) else [spec]
+    merged = [list(dict.fromkeys(t for s in specs for t in getattr(s, field)))
+              for field in ('regressors', 'controls', 'interactions')]
+    union = Spec(specs[-1].outcome, *merged, [], specs[-1].cluster)
+    with stage('compile_spec') as info:
+        X, names, slices, sub = compile_spec(union, data)
+        info.update(rows=X.shape[0], cols=X.shape[1])
+    # compile_spec leaves the outcome to the estimator
+    keep = sub[union.outcome].notna().values
+    X, sub = X[keep], sub[keep]
+    y = sub[union.outcome].values.astype(float)
+    index = cluster_index(sub, union.cluster)
+
+    # log likelihood of the intercept alone, for the pseudo r-squared
+    p = y.mean()
+    llnull = len(y) * (p * np.log(p) + (1 - p) * np.log(1 - p))
+
+    results, previous = [], pd.Series(dtype=float)
+    for s in specs:
+        cols = np.concatenate([slices[term_name(t)] for t in spec_terms(s)])
+        start = previous.reindex(names[cols]).fillna(0).values
+        coeff, vcov, llf, margeff, margeffvcov = probitsolve(y, X[:, cols], index, start=start)
+        previous = pd.Series(coeff, index=names[cols])
+        effects = np.flatnonzero(names[cols] != 'Intercept')
+        results.append(coefdf(margeff[effects], margeffvcov[np.ix_(effects, effects)], names[cols][effects],
+                              1 - llf / llnull, np.nan, len(y)))
+
+    return results if isinstance(spec, list) else results[0]
+
+
+###a .dta file is converted once into a column store next to it: one .npy per
+###numeric column, memory mapped on read, rebuilt when the file content changes
+FILE_HASHES = {}
+
+
+def file_hash(location):
+    '''blake2b of the content of location, recomputed only when its size or
+    modification time changed'''
+
+    st = os.stat(location)
+    stamp = (os.path.abspath(location), st.st_size, st.st_mtime_ns)
+    if stamp not in FILE_HASHES:
+        h = hashlib.blake2b(digest_size=16)
+        with open(location, 'rb') as f:
+            for chunk in iter(lambda: f.read(2 ** 24), b''):
+                h.update(chunk)
+        FILE_HASHES[stamp] = h.hexdigest()
+
+    return FILE_HASHES[stamp]
+
+
+def write_store(store, data, **meta):
+    '''writes data into the folder store, one .npy per numeric column and the
+    others pickled, with meta (and the columns and index) in meta.pkl. the files
+    are written to a temporary folder next to store which is then renamed to it,
+    so readers in other processes never see a partial store'''
+
+    root, name = os.path.split(store)
+    os.makedirs(root, exist_ok=True)
+    temp = tempfile.mkdtemp(prefix='.' + name + '.', dir=root)
+    meta.update({'columns': list(data.columns), 'index': data.index, 'npy': []})
+    try:
+        for i, col in enumerate(data.columns):
+            values = data[col].values
+            if isinstance(values, np.ndarray) and values.dtype.kind in 'biufcmM':
+                np.save(os.path.join(temp, '{}.npy'.format(i)), values)
+                meta['npy'].append(col)
+            else:
+                # labelled and string columns keep their pandas dtype
+                data[col].to_pickle(os.path.join(temp, '{}.pkl'.format(i)))
+        with open(os.path.join(temp, 'meta.pkl'), 'wb') as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # another process publishing this version first is as good, a store without
+        # meta.pkl is left over from an interrupted writer and is replaced
+        for attempt in range(2):
+            try:
+                os.rename(temp, store)
+                break
+            except OSError:
+                if os.path.exists(os.path.join(store, 'meta.pkl')):
+                    break
+                if attempt:
+                    raise
+                shutil.rmtree(store, ignore_errors=True)
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+    # the stores of earlier versions of the file are removed once this one is published,
+    # numeric columns memory mapped from them stay readable until they are closed
+    stem = name.rsplit('-', 1)[0]
+    for old in os.listdir(root):
+        if old.rsplit('-', 1)[0] == stem and old != name:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def pickle_replace(value, file):
+    '''pickles value to file through a temporary file next to it that replaces
+    file in one step, readers see the old content or the new, never a part'''
+
+    folder = os.path.dirname(file) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, temp = tempfile.mkstemp(prefix='.' + os.path.basename(file) + '.', dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, file)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def store_meta(store):
+    '''the columns, index and partitions of a store'''
+
+    with open(os.path.join(store, 'meta.pkl'), 'rb') as f:
+        return pickle.load(f)
+
+
+def read_store(store, meta, columns=None, ranges=None):
+    '''the columns (all by default) of a store as a frame, numeric columns as copy
+    on write memory maps. ranges, a list of (start, stop), reads only these rows'''
+
+    position = {col: i for i, col in enumerate(meta['columns'])}
+    if columns is None:
+        columns = meta['columns']
+    columns = [col for col in dict.fromkeys(columns) if col in position]
+
+    def take(values):
+        if ranges is None:
+            return values
+        if len(ranges) == 1:
+            return values[ranges[0][0]:ranges[0][1]]
+        return np.concatenate([values[start:stop] for start, stop in ranges])
+
+    data = {}
+    for col in columns:
+        if col in meta['npy']:
+            data[col] = take(np.load(os.path.join(store, '{}.npy'.format(position[col])), mmap_mode='c'))
+        else:
+            data[col] = take(pd.read_pickle(os.path.join(store, '{}.pkl'.format(position[col]))).values)
+
+    return pd.DataFrame(data, index=take(meta['index']), columns=columns, copy=False)
+
+
+def stata_store(location):
+    '''folder of the column store of location, written on the first call and
+    whenever the content of location changes (stale stores are removed)'''
+
+    root = os.path.join(os.path.dirname(location) or '.', '.colstore')
+    stem = os.path.splitext(os.path.basename(location))[0]
+    store = os.path.join(root, stem + '-' + file_hash(location))
+    if os.path.exists(os.path.join(store, 'meta.pkl')):
+        return store
+
+    with stage('read_stata', location=location) as info:
+        data = pd.read_stata(location)
+        info.update(rows=data.shape[0], cols=data.shape[1])
+    write_store(store, data)
+
+    return store
+
+
+def load_stata(location, columns=None):
+    '''pd.read_stata through the column store: only columns (all by default) are
+    read, numeric ones as copy on write memory maps of the store'''
+
+    with stage('load_stata', location=location) as info:
+        store = stata_store(location)
+        data = read_store(store, store_meta(store), columns)
+        info.update(rows=len(data), cols=data.shape[1])
+
+    return data
+
+
+###the Global Terrorism Database is converted once into a column store with its rows
+###ordered by country and year, every (country, year) partition a range of rows:
+###a filter on country and year reads only the ranges it keeps
+READERS = {'.xlsx': pd.read_excel, '.xls': pd.read_excel, '.csv': pd.read_csv, '.dta': pd.read_stata}
+
+
+def partition_store(location, keys=('country', 'iyear')):
+    '''folder of the column store of location (an excel, csv or stata file) with the
+    rows sorted by keys, rebuilt when the content of location changes. the meta of
+    the store has the first and last row of every partition'''
+
+    root = os.path.join(os.path.dirname(location) or '.', '.colstore')
+    stem = os.path.splitext(os.path.basename(location))[0]
+    store = os.path.join(root, '{}_{}-{}'.format(stem, '_'.join(keys), file_hash(location)))
+    if os.path.exists(os.path.join(store, 'meta.pkl')):
+        return store
+
+    with stage('read_partitioned', location=location) as info:
+        data = READERS[os.path.splitext(location)[1].lower()](location)
+        info.update(rows=data.shape[0], cols=data.shape[1])
+    data = data.sort_values(list(keys), kind='stable')
+
+    bounds = data.groupby(list(keys), sort=False, dropna=False).size()
+    partitions = bounds.index.to_frame(index=False)
+    partitions['stop'] = bounds.cumsum().values
+    partitions['start'] = partitions['stop'] - bounds.values
+    write_store(store, data, keys=list(keys), partitions=partitions)
+
+    return store
+
+
+def load_partitioned(location, columns=None, where=None, keys=('country', 'iyear'), **ranges):
+    '''the columns of location in the partitions kept by ranges and the rows kept by
+    the query where. ranges are given per key, a value, a list of values or a
+    (first, last) pair with None for no bound, e.g. country=217, iyear=(None, 2013).
+    only the kept partitions are read, and of them only the columns asked for and
+    the ones where needs'''
+
+    with stage('load_partitioned', location=location) as info:
+        store = partition_store(location, keys)
+        meta = store_meta(store)
+
+        parts = meta['partitions']
+        keep = np.ones(len(parts), dtype=bool)
+        for key, value in ranges.items():
+            if isinstance(value, tuple):
+                if value[0] is not None:
+                    keep &= (parts[key] >= value[0]).values
+                if value[1] is not None:
+                    keep &= (parts[key] <= value[1]).values
+            else:
+                keep &= parts[key].isin(value if isinstance(value, list) else [value]).values
+
+        # neighbouring partitions are read as one range, the rows are in key order
+        kept = parts[keep]
+        merged = []
+        for start, stop in zip(kept['start'], kept['stop']):
+            if merged and merged[-1][1] == start:
+                merged[-1][1] = stop
+            else:
+                merged.append([start, stop])
 
+        wanted = meta['columns'] if columns is None else list(columns)
+        data = read_store(store, meta, wanted + ([] if where is None else used_columns(where)), merged or [(0, 0)])
+        if where is not None:
+            data = data.query(where)
+        info.update(partitions=int(keep.sum()), rows=len(data), cols=len(wanted))
 
-def statadf(location, condition):
-    '''Small function to import and read the statafiles and subset under certain conditions'''
-    data = pd.read_stata(location)
+    return data[[col for col in dict.fromkeys(wanted) if col in data.columns]]
 
-    data = data.dropna(subset=condition)
+
+def used_columns(*formulas):
+    '''names in formulas (and lists of names) that can be data columns, for the
+    columns argument of load_stata and statadf'''
+
+    names = []
+    for formula in formulas:
+        formula = formula if isinstance(formula, str) else ' '.join(formula)
+        names += re.findall(r'[A-Za-z_]\w*', formula)
+
+    return list(dict.fromkeys(names))
+
+
+def statadf(location, condition, columns=None):
+    '''Small function to import and read the statafiles and subset under certain conditions
+    columns restricts the columns read, condition is always included'''
+    data = load_stata(location, None if columns is None else list(condition) + list(columns))
+
+    with stage('dropna', cols=len(condition)) as info:
+        data = data.dropna(subset=condition)
+        info['rows'] = len(data)
 
     data.fillna(0)
 
     return data
 
 
+def load_samples(locations, columns=None):
+    '''load_stata for several files of the same table, the frames are returned in
+    order. a column with the same content in several files is one array shared
+    by all of their frames'''
+
+    shared = {}
+    frames = []
+    for location in locations:
+        data = load_stata(location, columns)
+        arrays = {}
+        for col in data.columns:
+            values = data[col].values
+            h = hashlib.blake2b(digest_size=16)
+            h.update(pd.util.hash_pandas_object(data[col], index=True).values.tobytes())
+            arrays[col] = shared.setdefault((col, str(values.dtype), h.hexdigest()), values)
+        frames.append(pd.DataFrame(arrays, index=data.index, columns=data.columns, copy=False))
+
+    return frames
+
+
+###balance tables: every statistic of every covariate comes from the sums, squares and
+###counts of the cells of group and cluster, one sparse product over the rows
+def balance(data, covariates, group, levels=(1, 0), cluster=None, scale=None):
+    '''means and standard deviations of covariates in the rows where group is levels[0]
+    (mean1, sd1, nobs1) and levels[1] (mean0, sd0, nobs0), the difference of the means
+    and its standard error, t-statistic and p-value clustered by cluster (robust
+    without), as the regression of a covariate on a group dummy gives them. missing
+    values are left out covariate by covariate, scale maps a covariate to a divisor'''
+
+    covariates = list(covariates)
+    with stage('balance', rows=len(data), cols=len(covariates)) as info:
+        rows = data[group].isin(levels).to_numpy()
+        n = rows.sum()
+        treated = (data[group] == levels[0]).to_numpy()[rows]
+        keys = cluster if isinstance(cluster, list) else [cluster]
+        clusters = np.arange(n) if cluster is None else data.loc[rows, keys].groupby(keys, sort=False, observed=True).ngroup().values
+        cells, cell = np.unique(clusters * 2 + treated, return_inverse=True)
+        D = sparse.csr_matrix((np.ones(n), (cell, np.arange(n))), shape=(len(cells), n))
+        info['cells'] = len(cells)
+
+        # the covariates go through in blocks of about 2**24 values
+        S, Q, N, shift = [], [], [], []
+        block = max(1, 2 ** 24 // max(n, 1))
+        for first in range(0, len(covariates), block):
+            cols = covariates[first:first + block]
+            X = data.loc[rows, cols].to_numpy(dtype=float)
+            if scale:
+                X = X / np.array([scale.get(c, 1.) for c in cols])
+            ok = np.isfinite(X)
+            # shifted by about the means (of the first rows), so the squares do not cancel
+            head = np.where(ok[:1000], X[:1000], 0.)
+            shift.append(head.sum(axis=0) / np.maximum(ok[:1000].sum(axis=0), 1))
+            X = np.where(ok, X - shift[-1], 0.)
+            S.append(D @ X)
+            Q.append(D @ X ** 2)
+            N.append(D @ ok.astype(float))
+        S, Q, N, shift = (np.hstack(part) for part in (S, Q, N, shift))
+
+    moments = []
+    for mine in [cells % 2 == 1, cells % 2 == 0]:
+        nobs, total, squares = N[mine].sum(axis=0), S[mine].sum(axis=0), Q[mine].sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / nobs
+            moments.append((nobs, mean, np.sqrt(np.maximum(squares - total * mean, 0) / (nobs - 1))))
+    (n1, m1, sd1), (n0, m0, sd0) = moments
+
+    # the score of the slope in a cluster is its residual sum among the treated over n1
+    # less the one among the others over n0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = np.where((cells % 2 == 1)[:, None], (S - N * m1) / n1, -(S - N * m0) / n0)
+    C = sparse.csr_matrix((np.ones(len(cells)), (cells // 2, np.arange(len(cells)))))
+    W = C @ w
+    G = ((C @ N) > 0).sum(axis=0)
+    nobs = n1 + n0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stde = np.sqrt(G / (G - 1.) * (nobs - 1.) / (nobs - 2.) * (W ** 2).sum(axis=0))
+        tstat = (m1 - m0) / stde
+
+    return pd.DataFrame({'mean1': m1 + shift, 'mean0': m0 + shift, 'sd1': sd1, 'sd0': sd0,
+                         'difference': m1 - m0, 'stderror': stde, 'tstat': tstat,
+                         'pvals': 2 * stats.norm.sf(np.abs(tstat)), 'nobs1': n1, 'nobs0': n0}, index=covariates)
+
+
+###crosstabs of indicators: counts, successes and the sums of the columns of interest
+###of every indicator at once, as the product of the stacked indicators with them
+def crosstab(flags, success=None, values=None):
+    '''for every column of the boolean frame flags: the number of rows where it holds,
+    their share of all rows, how many of them succeeded (success is a boolean array
+    aligned with flags, all rows without) and the success rate, and the means of
+    the columns of the frame values among its successful rows. missing values are
+    left out of a mean, an indicator without rows gets missing rates and means'''
+
+    n = len(flags)
+    F = flags.to_numpy(dtype=float)
+    s = np.ones(n) if success is None else np.asarray(success, dtype=float)
+    V = np.zeros((n, 0)) if values is None else values.to_numpy(dtype=float)
+    ok = np.isfinite(V)
+    m = V.shape[1]
+
+    with stage('crosstab', rows=n, cols=F.shape[1]):
+        sums = F.T @ np.column_stack([np.ones(n), s, np.where(ok, V, 0.) * s[:, None], ok * s[:, None]])
+
+    count, wins = sums[:, 0], sums[:, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table = pd.DataFrame({'count': count.astype(np.int64), 'share': count / n, 'successes': wins.astype(np.int64),
+                              'success_rate': wins / count}, index=flags.columns)
+        means = sums[:, 2:2 + m] / sums[:, 2 + m:]
+    for j, col in enumerate([] if values is None else values.columns):
+        table[col] = means[:, j]
+
+    return table
+
+
 def dftable(key, data, begin, end):
     '''custom function dealing with sample3'''
 
@@ -133,24 +1673,23 @@ def dftable(key, data, begin, end):
 
     df = statadf(data, list)
 
-    year, e = iindexer(data=df, key='year', custom='year', a=begin, b=end, between=1)
-    month, f = iindexer(data=df, key='month', custom='month', a=1, b=12, between=1)
+    # year and month enter as codes, the wide frame is not copied for dummies
+    df['i_year'], e = iindexer(data=df, key='year', custom='i_year', a=begin, b=end, between=1, codes=True)
+    df['i_month'], f = iindexer(data=df, key='month', custom='i_month', a=1, b=12, between=1, codes=True)
 
-    df = pd.concat([df, year, month], axis=1)
-    formula = key + '~ successful + post + meventperyear' + ' + ' + ' + '.join(e) + ' + ' + ' + '.join(f)
+    formula = key + '~ successful + post + meventperyear + C(i_year) + C(i_month)'
 
     return df, formula
 
 
 def fastdf(condition, data, year1, year2 ):
     '''an experess version of statadf
-    
+    month, year and division are added as the codes i_month, i_year and i_div
     '''
     df = data.dropna(subset=condition)
-    temp1, a=iindexer(data=df, key='month', custom='month', a=1, b=12, between=1)
-    temp2, b=iindexer(data=df, key='year', custom='year', a=year1, b=year2, between=1)
-    div,c= iindexer(data=df,key='div_9_all', custom='div', a=1, b=9, between=1)
-    df=pd.concat([df, temp1, temp2, div], axis=1)
+    df['i_month'], a=iindexer(data=df, key='month', custom='i_month', a=1, b=12, between=1, codes=True)
+    df['i_year'], b=iindexer(data=df, key='year', custom='i_year', a=year1, b=year2, between=1, codes=True)
+    df['i_div'], c= iindexer(data=df,key='div_9_all', custom='i_div', a=1, b=9, between=1, codes=True)
     
     return df
 
@@ -159,107 +1698,60 @@ def fastdf(condition, data, year1, year2 ):
 
 
 
-def table_7(condition, data, formula, key):
+def table_7(condition, data, key):
     '''This function is aimed soley to deal with the repetitive nature of table 7
     which consists of 5 data groups and each data spits out 3 output
     
     '''
     
     df=data.dropna(subset=condition)
-    temp1, a=iindexer(data=df, key='year', custom='year', a=1970, b=2013, between=1)
-    temp2, b=iindexer(data=df, key='month', custom='month', a=1, b=12, between=1)
-    temp3, c=iindexer(data=df, key='div_9_all', custom='div', a=1, b=9, between=1)
-    df=pd.concat([df, temp1, temp2, temp3], axis=1)
-    d= [str(j)+'*'+str(i)  for i in a for j in b]
-    e= [str(j)+'*'+str(i)  for i in a for j in c]
-    f= formula + ' + '.join(d+e)
-    a7c1= aregdf(f, data=df, absorb='fips', cluster='fips')
-    a7c1=a7c1[['coeff', 'stderror','rsquaredadj']]
-    a7c1=a7c1.loc[[key, 'post'],:]
-
-    #Panel B
-    f2=f.replace('ln_emp_pop', 'ln_real_qp1_job')
-    b7c1= aregdf(f2, data=df, absorb='fips', cluster='fips')
-    b7c1=b7c1[['coeff', 'stderror','rsquaredadj']]
-    b7c1=b7c1.loc[[key, 'post'],:]
-
-    #Panel C
-    f3=f.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c7c1= aregdf(f3, data=df, absorb='fips', cluster='fips')
-    c7c1=c7c1[['coeff', 'stderror','rsquaredadj']]
-    c7c1=c7c1.loc[[key, 'post'],:]
+    controls=['non_us_t', 'int_l', 'aa_assass', 'aa_armed', 'aa_bomb', 'aa_facility', 'ww_firearm', 'ww_explo', 'ww_incend']
+    #Panel A, B and C share the right hand side
+    keys=['ln_emp_pop', 'ln_real_qp1_job', 'ln_real_qp1_pop']
+    spec=Spec(outcome=keys, regressors=[key, 'post', 'meventperyear'], controls=controls,
+              interactions=[('month', 'year'), ('div_9_all', 'year')], absorb='fips', cluster='fips')
+    a7c1, b7c1, c7c1=[c[['coeff', 'stderror','rsquaredadj', 'nobs']].loc[[key, 'post'],:] for c in aregspec(spec, df)]
     
     return a7c1, b7c1, c7c1
 
-def table_10(key, location, condition):
-    '''The function for Table 10
-    
+def table_10(keys, location, condition):
+    '''The function for Table 10, all outcomes in keys share the right hand side
+    of each column so they are fitted together; returns c1..c6 and both
+    observation counts for every outcome
     
     '''
     
     df= statadf(location, condition)
     df1= df.query('location_amb!=1')
+    df2= df.query('catastro!=1')
 
-    temp1, a= iindexer(data=df1, key='year', custom='year', a=1970, b=2013, between=1)
-    temp2, b= iindexer(data=df1, key='month', custom='month', a=1, b=12, between=1)
-    temp3, c= iindexer(data=df1, key='div_9_all', custom='div', a=1, b=9, between=1)
-    df1= pd.concat([df1, temp1, temp2, temp3], axis=1)
-    
-    
-    ###column 1#####
-    formula= key + ' ~ successful + post + meventperyear +'+ ' + '.join(a+b)
-    c1=aregdf(formula, data=df1, absorb='fips', cluster='fips')
-    c1=c1.loc[['successful'],:]
-    c1=c1.iloc[[0],[0,3]]
+    spec1= Spec(outcome=keys, regressors=['successful', 'post', 'meventperyear'], absorb=['fips', 'year', 'month'], cluster='fips')
+    controls=['non_us_t', 'int_l', 'aa_assass', 'aa_armed', 'aa_bomb', 'aa_facility', 'ww_firearm', 'ww_explo', 'ww_incend']
+    spec2= spec1._replace(controls=controls, absorb=['fips', ('year', 'month')])
+    spec3= spec2._replace(absorb=['fips', ('year', 'month'), ('year', 'div_9_all')])
 
-    ###column 2#####
+    ###column 1-3 omit ambiguous locations, column 4-6 omit catastrophic attacks#####
+    columns=[]
+    for data in [df1, df2]:
+        columns+=[aregspec(spec, data) for spec in [spec1, spec2, spec3]]
+
+    results=[]
+    for i, key in enumerate(keys):
+        c=[col[i].loc[['successful'],:].iloc[[0],[0,3]] for col in columns]
+        results.append(c + [df1[key].notna().sum(), df2[key].notna().sum()])
     
-    additional='+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility)+ C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    d=[str(i)+'*'+str(j) for i in a for j in b]
-    formula2= key + ' ~ successful + post + meventperyear + '+ ' + '.join(a+d) + additional
-    c2=aregdf(formula2, data=df1, absorb='fips', cluster='fips')
-    c2=c2.loc[['successful'],:]
-    c2=c2.iloc[[0],[0,3]]
-    
-    ###column 3####
-    e=[str(i)+'*'+str(j) for i in a for j in c]
-    formula3= key + '~ successful + post + meventperyear + '+ ' + '.join(e+d)+ additional
-    c3=aregdf(formula3, data=df1, absorb='fips', cluster='fips')
-    c3=c3.loc[['successful'],:]
-    c3=c3.iloc[[0],[0,3]]
-
-     ###column 4#####
-    df2=df.query('catastro!=1')
-    temp1, a= iindexer(data=df2, key='year', custom='year', a=1970, b=2013, between=1)
-    temp2, b= iindexer(data=df2, key='month', custom='month', a=1, b=12, between=1)
-    temp3, c= iindexer(data=df2, key='div_9_all', custom='div', a=1, b=9, between=1)
-    df2= pd.concat([df2, temp1, temp2, temp3], axis=1)
-    c4=aregdf(formula, data=df2, absorb='fips', cluster='fips')
-    c4=c4.loc[['successful'],:]
-    c4=c4.iloc[[0],[0,3]]
-
-    ###column 5#####
-    c5=aregdf(formula2, data=df2, absorb='fips', cluster='fips')
-    c5=c5.loc[['successful'],:]
-    c5=c5.iloc[[0],[0,3]]
-
-    ###column 6######
-    c6=aregdf(formula3, data=df2, absorb='fips', cluster='fips')
-    c6=c6.loc[['successful'],:]
-    c6=c6.iloc[[0],[0,3]]
-    
-    return c1, c2, c3, c4, c5, c6, len(df1), len(df2)
+    return results
 
 def table_10_fin(location):
+    condition=['year', 'successful', 'month']
+    keys=['ln_emp_pop', 'ln_real_qp1_pop', 'ln_real_qp1_job']
+    panels=table_10(keys, location, condition)
     #Panel A
-    condition=['year', 'ln_emp_pop', 'successful', 'month']
-    a1, a2, a3, a4, a5, a6, o1, o2=table_10('ln_emp_pop', location, condition)
+    a1, a2, a3, a4, a5, a6, o1, o2=panels[0]
     #Panel B
-    condition=['year', 'ln_real_qp1_pop', 'successful', 'month']
-    b1, b2, b3, b4, b5, b6, o1, o2=table_10('ln_real_qp1_pop', location, condition)
+    b1, b2, b3, b4, b5, b6, o1, o2=panels[1]
     #Panel C
-    condition=['year', 'ln_real_qp1_job', 'successful', 'month']
-    c1, c2, c3, c4, c5, c6, o1, o2=table_10('ln_real_qp1_job', location, condition)
+    c1, c2, c3, c4, c5, c6, o1, o2=panels[2]
 
 #the c1&c4 number; i failed to recreate these two numbers and my guessing is stata 
 #done something with the number internally; I have checked my observation size and also 
@@ -395,48 +1887,23 @@ def table_a12_fin(location):
 
     #Column 5 no iyear and i month but i.month##i.year
     #Column 6 i.year##i.div_9_all i.month##i.year
-    temp1, a= iindexer(data=df, key='year', custom='year', a=1969, b=2013, between=1)
-    temp2, b= iindexer(data=df, key='month', custom='month', a=1, b=12, between=1)
-    temp3, c= iindexer(data=df, key='div_9_all', custom='div', a=1, b=9, between=1)
-    df=pd.concat([df, temp1, temp2, temp3], axis=1)
-    d= [str(i)+'*'+str(j) for i in a for j in b]
-    e= [str(i)+'*'+str(j) for i in a for j in c ]
-
-    #column 1
-    formula= 'ln_ca1_pop_1 ~ successful + post + meventperyear + '+' + '.join(a+b)
-    c1= aregdf(formula, df, absorb='fips', cluster='fips')
-    c1= c1[['coeff', 'stderror']]
-    c1= c1.loc[['successful', 'post'],:]
-
-    #column2
-    formula2=formula+ ' + '+ additional1
-    c2= aregdf(formula2, df, absorb='fips', cluster='fips')
-    c2= c2[['coeff', 'stderror']]
-    c2= c2.loc[['successful', 'post'],:]
+    fe= ['fips', 'year', 'month']
+    fe5= ['fips', ('year', 'month')]
+    fe6= ['fips', ('year', 'month'), ('year', 'div_9_all')]
 
-
-    #column3
-    formula3=formula2+' + '+ additional2
-    c3= aregdf(formula3, df, absorb='fips', cluster='fips')
-    c3= c3[['coeff', 'stderror']]
-    c3= c3.loc[['successful', 'post'],:]
-
-
-    #column4
-    formula4=formula3+' + '+ additional3
-    c4= aregdf(formula4, df, absorb='fips', cluster='fips')
-    c4= c4[['coeff', 'stderror']]
-    c4= c4.loc[['successful', 'post'],:]
+    #column 1 to 4 are nested, one ladder
+    formula= 'ln_ca1_pop_1 ~ successful + post + meventperyear'
+    c1, c2, c3, c4= aregladder(formula, [additional1, additional2, additional3], df, absorb=fe, cluster='fips')
+    c1, c2, c3, c4= [c[['coeff', 'stderror']].loc[['successful', 'post'],:] for c in [c1, c2, c3, c4]]
+    formula4=formula+' + '+ additional1+' + '+ additional2+' + '+ additional3
 
     #column5
-    formula5='ln_ca1_pop_1 ~ successful + post + meventperyear + '+ additional1+ ' + '+ additional2+ ' + '+ additional3+ ' + '+' + '.join(d)
-    c5= aregdf(formula5, df, absorb='fips', cluster='fips')
+    c5= aregdf(formula4, df, absorb=fe5, cluster='fips')
     c5= c5[['coeff', 'stderror']]
     c5= c5.loc[['successful', 'post'],:]
 
     #column6
-    formula6=formula5+' + '+ ' + '.join(e)
-    c6= aregdf(formula6, df, absorb='fips', cluster='fips')
+    c6= aregdf(formula4, df, absorb=fe6, cluster='fips')
     c6= c6[['coeff', 'stderror']]
     c6= c6.loc[['successful', 'post'],:]
 
@@ -467,55 +1934,20 @@ def table_a7_fin():
     
     '''
     
-    df1 = pd.read_stata('Data/Final-Sample5a.dta')
-    o1=pd.read_stata('Data/Final-Sample5a.dta')
-    o1=o1.dropna(subset=['ln_emp_pop','month', 'year'])
-    o1=len(o1)
-    df2 = pd.read_stata('Data/Final-Sample5b.dta')
-    o2=pd.read_stata('Data/Final-Sample5b.dta')
-    o2=o2.dropna(subset=['ln_emp_pop','month', 'year'])
-    o2=len(o2)
-    df3 = pd.read_stata('Data/Final-Sample5c.dta')
-    o3=pd.read_stata('Data/Final-Sample5c.dta')
-    o3=o3.dropna(subset=['ln_emp_pop','month', 'year'])
-    o3=len(o3)
-    df4 = pd.read_stata('Data/Final-Sample5d.dta')
-    o4=pd.read_stata('Data/Final-Sample5d.dta')
-    o4=o4.dropna(subset=['ln_emp_pop','month', 'year'])
-    o4=len(o4)
-    df5 = pd.read_stata('Data/Final-Sample5e.dta')
-    o5=pd.read_stata('Data/Final-Sample5e.dta')
-    o5=o5.dropna(subset=['ln_emp_pop','month', 'year'])
-    o5=len(o5)
     ##The result I computed differs with the authors; but is exactly the same result as the stata code
     ##the author provided, therefore this is possibily another mistake
 
-    #Column 1
-    condition=['ln_emp_pop', 'successful6', 'month', 'year']
-    formula='ln_emp_pop ~ successful6 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' 
-    a1, b1, c1 = table_7(condition, df1, formula, 'successful6')
-    
-
-
-    #Column 2
-    condition=['ln_emp_pop', 'successful5', 'month', 'year']
-    formula='ln_emp_pop ~ successful5 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' 
-    a2, b2, c2 = table_7(condition, df2, formula, 'successful5')
-
-    #Column 3
-    condition=['ln_emp_pop', 'successful2', 'month', 'year']
-    formula='ln_emp_pop ~ successful2 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' 
-    a3, b3, c3 = table_7(condition, df3, formula, 'successful2')
-
-    #Column 4
-    condition=['ln_emp_pop', 'successful3', 'month', 'year']
-    formula='ln_emp_pop ~ successful3 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' 
-    a4, b4, c4 = table_7(condition, df4, formula, 'successful3')
-
-    #Column 5
-    condition=['ln_emp_pop', 'successful4', 'month', 'year']
-    formula='ln_emp_pop ~ successful4 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' 
-    a5, b5, c5 = table_7(condition, df5, formula, 'successful4')
+    #Column 1 to 5: each sample is read once and the five are fitted side by side
+    samples=[('Data/Final-Sample5a.dta', 'successful6'), ('Data/Final-Sample5b.dta', 'successful5'),
+             ('Data/Final-Sample5c.dta', 'successful2'), ('Data/Final-Sample5d.dta', 'successful3'),
+             ('Data/Final-Sample5e.dta', 'successful4')]
+    frames=load_samples([location for location, key in samples])
+    with ThreadPoolExecutor(min(len(samples), os.cpu_count() or 1)) as pool:
+        fits=list(pool.map(lambda df, key: table_7(['ln_emp_pop', key, 'month', 'year'], df, key), frames, [key for location, key in samples]))
+    (a1, b1, c1), (a2, b2, c2), (a3, b3, c3), (a4, b4, c4), (a5, b5, c5) = fits
+
+    #observations are the ones of the fits
+    o1, o2, o3, o4, o5 = [a['nobs'].iloc[0] for a, b, c in fits]
     #Wrapping up#
 
     #panel A
@@ -591,19 +2023,12 @@ def table_a9_fin():
     formula='ln_real_qp1_pop ~ successful + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' + ' + '.join(a+d)
 
     ###########
+    ###every year is dropped once, the fits downdate the full sample
     c = list(range(1970, 2014, 1))
-    c = ['year' + str(element) for element in c]
-    c = [ i + '==0' for i in c]
-
-    error=[]
-    coeff=[]
-    for i in c:
-        df2=df.query(i)
-        temp3=aregdf(formula, data=df2, absorb='fips', cluster='fips')
-        temp4=temp3.loc['successful', 'coeff']
-        temp5=temp3.loc['successful', 'stderror']
-        coeff.append(temp4)
-        error.append(temp5)
+    fits=aregjackknife(formula, data=df, absorb='fips', cluster='fips', leaveout='year')
+
+    coeff=[fits[i].loc['successful', 'coeff'] for i in c]
+    error=[fits[i].loc['successful', 'stderror'] for i in c]
 
     ###Finalisation
     prep=[['1970', '1971', '1972', '1973', '1974'],
@@ -651,19 +2076,12 @@ def table_a8_final():
     formula='ln_emp_pop ~ successful + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) +' + ' + '.join(a+d)
 
     ###########
+    ###every year is dropped once, the fits downdate the full sample
     c = list(range(1970, 2014, 1))
-    c = ['year' + str(element) for element in c]
-    c = [ i + '==0' for i in c]
-
-    error=[]
-    coeff=[]
-    for i in c:
-        df2=df.query(i)
-        temp3=aregdf(formula, data=df2, absorb='fips', cluster='fips')
-        temp4=temp3.loc['successful', 'coeff']
-        temp5=temp3.loc['successful', 'stderror']
-        coeff.append(temp4)
-        error.append(temp5)
+    fits=aregjackknife(formula, data=df, absorb='fips', cluster='fips', leaveout='year')
+
+    coeff=[fits[i].loc['successful', 'coeff'] for i in c]
+    error=[fits[i].loc['successful', 'stderror'] for i in c]
 
     ###Finalisation
     prep=[['1970', '1971', '1972', '1973', '1974'],
@@ -711,55 +2129,27 @@ def table_house_fin(location1, location2):
     df=df.dropna(subset=['year_fips','year_x', 'month','housing_index'])
     df['ln_hh_index']=100*np.log(df['housing_index'])
 
-    temp1, a=iindexer(data=df, key='year_x', custom='year', a=1975, b=2013, between=1)
-    temp2, b=iindexer(data=df, key='month', custom='month', a=1, b=12, between=1)
-    temp3, c=iindexer(data=df, key='div_9_all', custom='div', a=1, b=9, between=1)
-    d=[str(i)+'*'+str(j) for i in a for j in b]
-    e=[str(i)+'*'+str(j) for i in a for j in c]
-
-    df=pd.concat([df, temp1, temp2, temp3], axis=1)
+    fe= ['fips_x', 'year_x', 'month']
+    fe5= ['fips_x', ('year_x', 'month')]
+    fe6= ['fips_x', ('year_x', 'month'), ('year_x', 'div_9_all')]
 
     #####start the calculation#####
-    ###column 0
-    formula0='ln_hh_index ~ post + meventperyear + '+ ' + '.join(a+b)
-    c0= aregdf(formula0, df, absorb='fips_x', cluster='fips_x')
+    ###column 0 to 4 are nested, every column adds one block to the previous
+    formula0='ln_hh_index ~ post + meventperyear'
+    blocks=['successful1', 'C(non_us_t) + C(int_l)', 'C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility)', 'C(ww_firearm) + C(ww_explo) + C(ww_incend)']
+    c0, c1, c2, c3, c4= aregladder(formula0, blocks, df, absorb=fe, cluster='fips_x')
     c0= c0[['coeff', 'stderror','rsquaredadj']]
     c0= c0.loc[['post'],:]
-    
-
-    ###column1######
-    formula='ln_hh_index ~ successful1 + post + meventperyear + '+ ' + '.join(a+b)
-    c1= aregdf(formula, df, absorb='fips_x', cluster='fips_x')
-    c1= c1[['coeff', 'stderror','rsquaredadj']]
-    c1= c1.loc[['successful1', 'post'],:]
-
-    ###colum2#######
-    formula2=formula+' + C(non_us_t) + C(int_l)'
-    c2= aregdf(formula2, df, absorb='fips_x', cluster='fips_x')
-    c2= c2[['coeff', 'stderror','rsquaredadj']]
-    c2= c2.loc[['successful1', 'post'],:]
-
-    ###column3#####
-    formula3=formula2+ ' + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility)'
-    c3= aregdf(formula3, df, absorb='fips_x', cluster='fips_x')
-    c3= c3[['coeff', 'stderror','rsquaredadj']]
-    c3= c3.loc[['successful1', 'post'],:]
-
-    ###column4#####
-    formula4= formula3+ ' + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    c4= aregdf(formula4, df, absorb='fips_x', cluster='fips_x')
-    c4= c4[['coeff', 'stderror','rsquaredadj']]
-    c4= c4.loc[['successful1', 'post'],:]
+    c1, c2, c3, c4= [c[['coeff', 'stderror','rsquaredadj']].loc[['successful1', 'post'],:] for c in [c1, c2, c3, c4]]
+    formula4=formula0+' + '+' + '.join(blocks)
 
     ###column5#####
-    formula5= 'ln_hh_index ~ successful1 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) + '+' + '.join(a+d)
-    c5= aregdf(formula5, df, absorb='fips_x', cluster='fips_x')
+    c5= aregdf(formula4, df, absorb=fe5, cluster='fips_x')
     c5= c5[['coeff', 'stderror','rsquaredadj']]
     c5= c5.loc[['successful1', 'post'],:]
 
     ###column6#####
-    formula6= 'ln_hh_index ~ successful1 + post + meventperyear + C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend) + '+' + '.join(d+e)
-    c6= aregdf(formula6, df, absorb='fips_x', cluster='fips_x')
+    c6= aregdf(formula4, df, absorb=fe6, cluster='fips_x')
     c6= c6[['coeff', 'stderror','rsquaredadj']]
     c6= c6.loc[['successful1', 'post'],:]
     ##author made a mistake in this table
@@ -969,81 +2359,35 @@ def table_7_fin(location):
     
     '''
     addition='C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm)+ C(ww_explo) + C(ww_incend)'
+    ##every industry is a pair of nested columns, the second adds the attack controls
+    keep=['coeff', 'stderror','rsquaredadj']
     ##Panel A
-    ##Column 1
+    ##Column 1 and 2
     df7,formula7_1a=dftable('ln_emp_manu_pop', location,1970,1997)
-    t7c1_a=aregdf(formula7_1a,data=df7,absorb='fips',cluster='fips')
-    t7c1_a=t7c1_a[['coeff', 'stderror','rsquaredadj']]
-    t7c1_a=t7c1_a.loc[['successful','post'],:]
-    
-    ##column 2
-    formula7_2a= formula7_1a+' + ' + addition
-    t7c2_a=aregdf(formula7_2a,data=df7,absorb='fips',cluster='fips')
-    t7c2_a=t7c2_a[['coeff', 'stderror','rsquaredadj']]
-    t7c2_a=t7c2_a.loc[['successful','post'],:]
+    t7c1_a, t7c2_a=[c[keep].loc[['successful','post'],:] for c in aregladder(formula7_1a, [addition], data=df7, absorb='fips', cluster='fips')]
     
-    ##column 3
+    ##column 3 and 4
     df7_b,formula7_3a=dftable('ln_emp_const_pop', location,1970,1997)
     df7_b=df7_b.query('treated_counties==1')
-    t7c3_a=aregdf(formula7_3a,data=df7_b,absorb='fips',cluster='fips')
-    t7c3_a=t7c3_a[['coeff', 'stderror','rsquaredadj']]
-    t7c3_a=t7c3_a.loc[['successful','post'],:]
+    t7c3_a, t7c4_a=[c[keep].loc[['successful','post'],:] for c in aregladder(formula7_3a, [addition], data=df7_b, absorb='fips', cluster='fips')]
     
-    ##column 4
-    formula7_4a=formula7_3a+ ' + ' + addition
-    t7c4_a=aregdf(formula7_4a,data=df7_b,absorb='fips',cluster='fips')
-    t7c4_a=t7c4_a[['coeff', 'stderror','rsquaredadj']]
-    t7c4_a=t7c4_a.loc[['successful','post'],:]
-    
-    ##column 5
+    ##column 5 and 6
     df7_c,formula7_5a=dftable('ln_emp_whole_pop', location,1970,1997)
-    t7c5_a=aregdf(formula7_5a,data=df7_c,absorb='fips',cluster='fips')
-    t7c5_a=t7c5_a[['coeff', 'stderror','rsquaredadj']]
-    t7c5_a=t7c5_a.loc[['successful','post'],:]
-    
-    ##column 6
-    formula7_6a=formula7_5a+ ' + ' + addition
-    t7c6_a=aregdf(formula7_6a,data=df7_c,absorb='fips',cluster='fips')
-    t7c6_a=t7c6_a[['coeff', 'stderror','rsquaredadj']]
-    t7c6_a=t7c6_a.loc[['successful','post'],:]
+    t7c5_a, t7c6_a=[c[keep].loc[['successful','post'],:] for c in aregladder(formula7_5a, [addition], data=df7_c, absorb='fips', cluster='fips')]
     
     ####Panel B
     
-    ##column 1
+    ##column 1 and 2
     df7_d,formula7_1b=dftable('ln_emp_retail_pop', location,1970,1997)
-    t7c1_b=aregdf(formula7_1b,data=df7_d,absorb='fips',cluster='fips')
-    t7c1_b=t7c1_b[['coeff', 'stderror','rsquaredadj']]
-    t7c1_b=t7c1_b.loc[['successful','post'],:]
+    t7c1_b, t7c2_b=[c[keep].loc[['successful','post'],:] for c in aregladder(formula7_1b, [addition], data=df7_d, absorb='fips', cluster='fips')]
     
-    ##column 2
-    formula7_2b=formula7_1b+' + ' + addition
-    t7c2_b=aregdf(formula7_2b,data=df7_d,absorb='fips',cluster='fips')
-    t7c2_b=t7c2_b[['coeff', 'stderror','rsquaredadj']]
-    t7c2_b=t7c2_b.loc[['successful','post'],:]
-    
-    ##column 3
+    ##column 3 and 4
     df7_e,formula7_3b=dftable('ln_emp_services_pop', location,1970,1997)
-    t7c3_b=aregdf(formula7_3b,data=df7_e,absorb='fips',cluster='fips')
-    t7c3_b=t7c3_b[['coeff', 'stderror','rsquaredadj']]
-    t7c3_b=t7c3_b.loc[['successful','post'],:]
-    
-    ##column 4
-    formula7_4b=formula7_3b+' + ' + addition
-    t7c4_b=aregdf(formula7_4b,data=df7_e,absorb='fips',cluster='fips')
-    t7c4_b=t7c4_b[['coeff', 'stderror','rsquaredadj']]
-    t7c4_b=t7c4_b.loc[['successful','post'],:]
+    t7c3_b, t7c4_b=[c[keep].loc[['successful','post'],:] for c in aregladder(formula7_3b, [addition], data=df7_e, absorb='fips', cluster='fips')]
     
-    ##column 5
+    ##column 5 and 6
     df7_f,formula7_5b=dftable('ln_emp_finance_pop', location,1970,1997)
-    t7c5_b=aregdf(formula7_5b,data=df7_f,absorb='fips',cluster='fips')
-    t7c5_b=t7c5_b[['coeff', 'stderror','rsquaredadj']]
-    t7c5_b=t7c5_b.loc[['successful','post'],:]
-    
-    ##column 6
-    formula7_6b=formula7_5b+' + ' + addition
-    t7c6_b=aregdf(formula7_6b,data=df7_f,absorb='fips',cluster='fips')
-    t7c6_b=t7c6_b[['coeff', 'stderror','rsquaredadj']]
-    t7c6_b=t7c6_b.loc[['successful','post'],:]
+    t7c5_b, t7c6_b=[c[keep].loc[['successful','post'],:] for c in aregladder(formula7_5b, [addition], data=df7_f, absorb='fips', cluster='fips')]
     
     ###Finalisation####
     prep=[['(1)','(2)','(3)','(4)','(5)', '(6)', 'Section', 'Index'],
@@ -1081,144 +2425,35 @@ def table_6_fin():
     '''
     
     '''
-    ###Panel A
-    ###column 0
-    df0,formula6_0a=dftable('ln_emp_pop','Data/Final-Sample3.dta',1970,2013)
-    formula6_0a=formula6_0a.replace('successful + ', '')
-    c0_a=aregdf(formula6_0a,data=df0,absorb='fips',cluster='fips')
-    c0_a=c0_a[['coeff', 'stderror','rsquaredadj']]
-    c0_a=c0_a.loc[['post'],:]
-    
-    ###column 1
-    df6,formula6_1a=dftable('ln_emp_pop','Data/Final-Sample3.dta',1970,2013)
-    c1_a=aregdf(formula6_1a,data=df6,absorb='fips',cluster='fips')
-    c1_a=c1_a[['coeff', 'stderror','rsquaredadj']]
-    c1_a=c1_a.loc[['successful','post'],:]
-    ###column 2
-    formula6_2a=formula6_1a+' + '+ 'C(non_us_t)'+ ' + '+ 'C(int_l)'
-    c2_a=aregdf(formula6_2a,data=df6,absorb='fips',cluster='fips')
-    c2_a=c2_a[['coeff', 'stderror','rsquaredadj']]
-    c2_a=c2_a.loc[['successful','post'],:]
-    ###column 3
-    formula6_3a=formula6_2a +' + '+ 'C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility)'
-    c3_a=aregdf(formula6_3a,data=df6,absorb='fips',cluster='fips')
-    c3_a=c3_a[['coeff', 'stderror','rsquaredadj']]
-    c3_a=c3_a.loc[['successful','post'],:]
-    
-    ###column 4
-    formula6_4a=formula6_3a+ ' + '+ 'C(ww_firearm)+ C(ww_explo) + C(ww_incend)'
-    c4_a=aregdf(formula6_4a,data=df6,absorb='fips',cluster='fips')
-    c4_a=c4_a[['coeff', 'stderror','rsquaredadj']]
-    c4_a=c4_a.loc[['successful','post'],:]
-    
-    ###column 5
-    temp1,year6= iindexer(data=df6, key='year', custom='year', a=1970, b=2013, between=1)
-    temp2,month6= iindexer(data=df6, key='month', custom='month', a=1, b=12, between=1)
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year6 for j in month6]
-    formula6_5a=formula6_4a+' + '+ ' + '.join(c)
-    c5_a=aregdf(formula6_5a,data=df6,absorb='fips',cluster='fips')
-    c5_a=c5_a[['coeff', 'stderror','rsquaredadj']]
-    c5_a=c5_a.loc[['successful','post'],:]
-
-    ###column 6
-    div,d=iindexer(data=df6,key='div_9_all', custom='div', a=1, b=9, between=1)
-    df6 =pd.concat([df6,div], axis=1)
-    e=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year6 for j in div]
-    formula6_6a=formula6_5a+' + '+ ' + '.join(e)
-    c6_a=aregdf(formula6_6a,data=df6,absorb='fips',cluster='fips')
-    c6_a=c6_a[['coeff', 'stderror','rsquaredadj']]
-    c6_a=c6_a.loc[['successful','post'],:]
-    
-    #####Panel B###
-    ###column 0
-    formula6_0b=formula6_0a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c0_b=aregdf(formula6_0b,data=df0,absorb='fips',cluster='fips')
-    c0_b=c0_b[['coeff', 'stderror','rsquaredadj']]
-    c0_b=c0_b.loc[['post'],:]
-    
+    ###the three panels share the right hand side of every column and the
+    ###columns are nested, so the whole table is one ladder for all three outcomes
+    keys=['ln_emp_pop', 'ln_real_qp1_pop', 'ln_real_qp1_job']
+    df6=statadf('Data/Final-Sample3.dta', ['ln_emp_pop', 'successful', 'month', 'year', 'meventperyear', 'fips'])
+    keep=['coeff', 'stderror','rsquaredadj']
+
+    ###column 0 is the base, every later column adds to the one before
+    spec0=Spec(outcome=keys, regressors=['post', 'meventperyear'], controls=['year', 'month'], absorb='fips', cluster='fips')
     ###column 1
-    formula6_1b=formula6_1a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c1_b=aregdf(formula6_1b,data=df6,absorb='fips',cluster='fips')
-    c1_b=c1_b[['coeff', 'stderror','rsquaredadj']]
-    c1_b=c1_b.loc[['successful','post'],:]
-    
+    spec1=spec0._replace(regressors=['successful', 'post', 'meventperyear'])
     ###column 2
-    formula6_2b=formula6_2a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c2_b=aregdf(formula6_2b,data=df6,absorb='fips',cluster='fips')
-    c2_b=c2_b[['coeff', 'stderror','rsquaredadj']]
-    c2_b=c2_b.loc[['successful','post'],:]
-    
+    spec2=spec1._replace(controls=spec1.controls+['non_us_t', 'int_l'])
     ###column 3
-    formula6_3b=formula6_3a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c3_b=aregdf(formula6_3b,data=df6,absorb='fips',cluster='fips')
-    c3_b=c3_b[['coeff', 'stderror','rsquaredadj']]
-    c3_b=c3_b.loc[['successful','post'],:]
-    
-    
+    spec3=spec2._replace(controls=spec2.controls+['aa_assass', 'aa_armed', 'aa_bomb', 'aa_facility'])
     ###column 4
-    formula6_4b=formula6_4a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c4_b=aregdf(formula6_4b,data=df6,absorb='fips',cluster='fips')
-    c4_b=c4_b[['coeff', 'stderror','rsquaredadj']]
-    c4_b=c4_b.loc[['successful','post'],:]
-    
-    
+    spec4=spec3._replace(controls=spec3.controls+['ww_firearm', 'ww_explo', 'ww_incend'])
     ###column 5
-    formula6_5b=formula6_5a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c5_b=aregdf(formula6_5b,data=df6,absorb='fips',cluster='fips')
-    c5_b=c5_b[['coeff', 'stderror','rsquaredadj']]
-    c5_b=c5_b.loc[['successful','post'],:]
-    
-    
+    spec5=spec4._replace(interactions=[('month', 'year')])
     ###column 6
-    formula6_6b=formula6_6a.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c6_b=aregdf(formula6_6b,data=df6,absorb='fips',cluster='fips')
-    c6_b=c6_b[['coeff', 'stderror','rsquaredadj']]
-    c6_b=c6_b.loc[['successful','post'],:]
-    
-    
-    ######Panel C
-    ###column 0
-    formula6_0c=formula6_0a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c0_c=aregdf(formula6_0c,data=df0,absorb='fips',cluster='fips')
-    c0_c=c0_c[['coeff', 'stderror','rsquaredadj']]
-    c0_c=c0_c.loc[['post'],:]
+    spec6=spec5._replace(interactions=[('month', 'year'), ('div_9_all', 'year')])
 
-    ###column 1
-    formula6_1c=formula6_1a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c1_c=aregdf(formula6_1c,data=df6,absorb='fips',cluster='fips')
-    c1_c=c1_c[['coeff', 'stderror','rsquaredadj']]
-    c1_c=c1_c.loc[['successful','post'],:]
-    
-    
-    ###column 2
-    formula6_2c=formula6_2a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c2_c=aregdf(formula6_2c,data=df6,absorb='fips',cluster='fips')
-    c2_c=c2_c[['coeff', 'stderror','rsquaredadj']]
-    c2_c=c2_c.loc[['successful','post'],:]
-    
-    ###column 3
-    formula6_3c=formula6_3a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c3_c=aregdf(formula6_3c,data=df6,absorb='fips',cluster='fips')
-    c3_c=c3_c[['coeff', 'stderror','rsquaredadj']]
-    c3_c=c3_c.loc[['successful','post'],:]
-    
-    ###column 4
-    formula6_4c=formula6_4a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c4_c=aregdf(formula6_4c,data=df6,absorb='fips',cluster='fips')
-    c4_c=c4_c[['coeff', 'stderror','rsquaredadj']]
-    c4_c=c4_c.loc[['successful','post'],:]
-    
-    ###column 5
-    formula6_5c=formula6_5a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c5_c=aregdf(formula6_5c,data=df6,absorb='fips',cluster='fips')
-    c5_c=c5_c[['coeff', 'stderror','rsquaredadj']]
-    c5_c=c5_c.loc[['successful','post'],:]
-    
-    ###column 6
-    formula6_6c=formula6_6a.replace('ln_emp_pop', 'ln_real_qp1_job')
-    c6_c=aregdf(formula6_6c,data=df6,absorb='fips',cluster='fips')
-    c6_c=c6_c[['coeff', 'stderror','rsquaredadj']]
-    c6_c=c6_c.loc[['successful','post'],:]
+    panels=aregspec([spec0, spec1, spec2, spec3, spec4, spec5, spec6], df6)
+    c0_a, c0_b, c0_c=[p[0][keep].loc[['post'],:] for p in panels]
+    c1_a, c1_b, c1_c=[p[1][keep].loc[['successful','post'],:] for p in panels]
+    c2_a, c2_b, c2_c=[p[2][keep].loc[['successful','post'],:] for p in panels]
+    c3_a, c3_b, c3_c=[p[3][keep].loc[['successful','post'],:] for p in panels]
+    c4_a, c4_b, c4_c=[p[4][keep].loc[['successful','post'],:] for p in panels]
+    c5_a, c5_b, c5_c=[p[5][keep].loc[['successful','post'],:] for p in panels]
+    c6_a, c6_b, c6_c=[p[6][keep].loc[['successful','post'],:] for p in panels]
     
 #####finalisation#############
     prep=[['(1)','(2)','(3)','(4)','(5)', '(6)', 'Section', 'Index'],
@@ -1267,91 +2502,50 @@ def table_5_fin(location):
     '''
     
     '''
-    #import the data
-    df4=pd.read_stata(location)
-    df4=df4.dropna(subset = ['ln_emp_pop','year','month','bon1'])
-
-    ###column 1
-    #subset the needed ones
-    df4_1=df4[['fips','ln_emp_pop','year','month','post_5_success','post_4_success','post_3_success','post_2_success','post_1_success','post_0_success','pre_1_success','pre_2_success','pre_3_success','meventperyear']]
-
-    #call in custom function
-    year,a=iindexer(data=df4_1,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df4_1,key='month', custom='month', a=1, b=12, between=1)
-    df4_1 =pd.concat([df4_1,year,month], axis=1)
+    #year, month and county effects are absorbed, only the event dummies stay in X
+    fe= ['fips', 'year', 'month']
+    fe3= ['fips', ('year', 'month')]
 
     #define basemodel
-    basemodel='ln_emp_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-
-    #implement the areg function
-    t5c1=aregdf(basemodel,data=df4_1,absorb='fips',cluster='fips')
-    t5c1=t5c1[['coeff', 'stderror', 'rsquaredadj']]
-    t5c1=t5c1.iloc[1:9,:]
-    ##column 2
-    #add the additional columns
-    temp=df4[['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']]
-
-    df4_2 =pd.concat([df4_1,temp], axis=1)
-
-    #modify basemodel from first section
+    basemodel='ln_emp_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'
+    #modify basemodel for the columns with controls
     bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
     bl2=['C('+i+')' for i in bl2]
     basemodel_2=basemodel+' + '+' + '.join(bl2)
 
+    #import the data, only the columns of the models
+    df4=statadf(location, ['ln_emp_pop','year','month','bon1'], columns=used_columns(basemodel_2, ['ln_real_qp1_pop', 'fips']))
 
-    t5c2=aregdf(basemodel_2,data=df4_2,absorb='fips',cluster='fips')
+    ###column 1
+    #implement the areg function
+    t5c1=aregdf(basemodel,data=df4,absorb=fe,cluster='fips')
+    t5c1=t5c1[['coeff', 'stderror', 'rsquaredadj']]
+    t5c1=t5c1.iloc[1:9,:]
+    ##column 2
+    t5c2=aregdf(basemodel_2,data=df4,absorb=fe,cluster='fips')
     t5c2=t5c2[['coeff', 'stderror', 'rsquaredadj']]
     t5c2=t5c2.iloc[1:9,:]
     ###column 3
-    
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
-
-    basemodel_3=basemodel_2+' + '+' + '.join(c)
-
-    t5c3=aregdf(basemodel_3,data=df4_2,absorb='fips',cluster='fips')
+    t5c3=aregdf(basemodel_2,data=df4,absorb=fe3,cluster='fips')
     t5c3=t5c3[['coeff', 'stderror', 'rsquaredadj']]
     t5c3=t5c3.iloc[1:9,:]
     ###column 4
-    df4_3=df4[['fips','ln_real_qp1_pop','year','month','post_5_success','post_4_success','post_3_success','post_2_success','post_1_success','post_0_success','pre_1_success','pre_2_success','pre_3_success','meventperyear']]
-
-    #call in custom function
-    year,a=iindexer(data=df4_1,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df4_1,key='month', custom='month', a=1, b=12, between=1)
-    df4_3 =pd.concat([df4_3,year,month], axis=1)
- 
-    #define basemodel
-    basemodel_2='ln_real_qp1_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
+    basemodel_3=basemodel.replace('ln_emp_pop', 'ln_real_qp1_pop')
 
     #implement the areg function
-    t5c4=aregdf(basemodel_2,data=df4_3,absorb='fips',cluster='fips')
+    t5c4=aregdf(basemodel_3,data=df4,absorb=fe,cluster='fips')
     t5c4=t5c4[['coeff', 'stderror', 'rsquaredadj']]
     t5c4=t5c4.iloc[1:9,:]
     
     ###column 5
-    #add the additional columns
-    temp=df4[['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']]
-
-    df4_4 =pd.concat([df4_3,temp], axis=1)
-    
-      
-    
-    #modify basemodel from first section
-    bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
-    bl2=['C('+i+')' for i in bl2]
-    basemodel_3=basemodel_2+' + '+' + '.join(bl2)
-    
+    basemodel_4=basemodel_2.replace('ln_emp_pop', 'ln_real_qp1_pop')
 
-    t5c5=aregdf(basemodel_3,data=df4_4,absorb='fips',cluster='fips')
+    t5c5=aregdf(basemodel_4,data=df4,absorb=fe,cluster='fips')
     t5c5=t5c5[['coeff', 'stderror', 'rsquaredadj']]
     t5c5=t5c5.iloc[1:9,:]
     
     ##column 6
-    
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
-
-    basemodel_4=basemodel_3+' + '+' + '.join(c)
-
-    t5c6=aregdf(basemodel_4,data=df4_4,absorb='fips',cluster='fips')
+    t5c6=aregdf(basemodel_4,data=df4,absorb=fe3,cluster='fips')
     t5c6=t5c6[['coeff', 'stderror', 'rsquaredadj']]
     t5c6=t5c6.iloc[1:9,:]
     
@@ -1401,46 +2595,22 @@ def table_3_fin(location):
     '''
     df2=pd.read_stata(location)
     df2=df2[df2['emp'].notna()]
-    df2_1=df2.query('success == 1')
-    df2_2=df2.query('success == 0')
     #create tuples
     list_name2=('ln_emp_pop','ln_real_qp1','capital_state','coastal_county','major_airport','medium_airport','ln_ca1_pop_1_lag1','ln_deaths_lag1_cap','ln_births_lag1_cap','ln_social_sec_recip_lag1_cap','ln_pov_allages_lag1_cap','ln_educ_pubenrol_lag1_cap','ln_crime_violent_lag1_cap','ln_crime_robb_lag1_cap','ln_crime_property_lag1_cap','ln_crime_motorveh_lag1_cap','region1','region2','region3','region4')
 
+    # the outcomes are in 100*log points
+    table = balance(df2, list_name2, 'success', cluster='fips', scale={'ln_emp_pop': 100, 'ln_real_qp1': 100})
 
-    storage12=[]
-    storage22=[]
-    dif2=[]
-    sstorage12=[]
-    sstorage22=[]
-
-    for i in list_name2:
-            storage12.append(df2_1[i].mean())
-            sstorage12.append(df2_1[i].std())
-            storage22.append(df2_2[i].mean())
-            sstorage22.append(df2_2[i].std())
-        
-
-         
-    storage12[0]=storage12[0]/100        
-    storage12[1]=storage12[1]/100
-    sstorage12[0]=sstorage12[0]/100   
-    sstorage12[1]=sstorage12[1]/100
-    storage22[0]=storage22[0]/100 
-    storage22[1]=storage22[1]/100
-    sstorage22[0]=sstorage22[0]/100 
-    sstorage22[1]=sstorage22[1]/100
-
-    dif2=np.subtract(storage12,storage22)
-    
     ###Finalisation##
     Index2=['log jobs per capita','Log total earnings','State Capital','Coastal County','Airport(large hub)','Airport(medium hub)','Log Population','Log deaths per capita','Log births per capita','Log social security recipients per capita','log people in poverty per capita','log public school enrollment per capita','log violent crimes per capita','log robberies per capita','Log property crimes per capita','log motor vehicle thefts per capital','Region Northeast','Region Midwest','Region South','Region West']
-    dfd4={'Successful(mean)':storage12,'Failed(mean)':storage22}
-    df4=pd.DataFrame.from_dict(dfd4)
-    df4['Index']=Index2
-    df4.set_index('Index')
-    dfd5={'Successful(standard deviation)':sstorage12,'Failed(standard deviation)':sstorage22, 'Difference':dif2}
-    df5=pd.DataFrame.from_dict(dfd5)
-    result=pd.concat([df4, df5], axis=1)
+    result = pd.DataFrame({'Successful(mean)': table['mean1'].values, 'Failed(mean)': table['mean0'].values,
+                           'Index': Index2,
+                           'Successful(standard deviation)': table['sd1'].values,
+                           'Failed(standard deviation)': table['sd0'].values,
+                           'Difference': table['difference'].values,
+                           # the difference tested with standard errors clustered by county
+                           't-statistic (clustered)': table['tstat'].values,
+                           'p-value': table['pvals'].values})
     
     return result
 
@@ -1453,39 +2623,15 @@ def table_1_fin(location):
         #house keeping (drop all emp=nan, nonus=nan)
     df = df[df['emp'].notna()&df['non_us_target'].notna()]
 
-    list=('attack_assass','attack_armed','attack_bomb','attack_facility','attack_unarmed','attack_unknown','targ_business','targ_governgen','targ_abortion','targ_airport','targ_educ','targ_priv','targ_relig','targ_other','weap_firearm','weap_explo','weap_incend','weap_melee','weap_sabot','weap_other','lonenotterrorgroup','non_us_target','int_log')
-    #even though I call it list, it is actually tuples, so the running time is faster
-    observes=[]
-
-    for i in list:
-        observes.append(df.loc[df[i]==1].shape[0])
-    
-    observes.insert(21,df.loc[df['multipleeventperyear']>=2].shape[0])
-    percentage= [x / 1013 for x in observes]
-
-    #get all observes
-    df_filtered = df.query('success == 1')
-    success=[]
-    for i in list:
-        success.append(df_filtered.loc[df[i]==1].shape[0])
-    
-    success.insert(21,df_filtered.loc[df['multipleeventperyear']>=2].shape[0])
-    successrate=[y/x for x,y in zip(observes,success)]   #get the success rate
-
-    #if attack successful
-    nwound=[]
-    nkill=[]
-    damage=[]
-    for i in list:
-        nwound.append(df_filtered.loc[df[i]==1].mean()['nwound'])
-        nkill.append(df_filtered.loc[df[i]==1].mean()['nkill'])
-        damage.append(df_filtered.loc[df[i]==1].mean()['real_propvalue'])
-    
-    nwound.insert(21,df_filtered.loc[df['multipleeventperyear']>=2].mean()['nwound'])
-    nkill.insert(21,df_filtered.loc[df['multipleeventperyear']>=2].mean()['nkill'])
-    damage.insert(21,df_filtered.loc[df['multipleeventperyear']>=2].mean()['real_propvalue'])
-
+    indicators=['attack_assass','attack_armed','attack_bomb','attack_facility','attack_unarmed','attack_unknown','targ_business','targ_governgen','targ_abortion','targ_airport','targ_educ','targ_priv','targ_relig','targ_other','weap_firearm','weap_explo','weap_incend','weap_melee','weap_sabot','weap_other','lonenotterrorgroup','non_us_target','int_log']
 
+    #one crosstab for every indicator, multiple attacks in a year and all attacks (the total row)
+    flags = df[indicators] == 1
+    flags.insert(21, 'multipleeventperyear', df['multipleeventperyear'] >= 2)
+    flags['total'] = True
+    table = crosstab(flags, df['success'] == 1, df[['nwound', 'nkill', 'real_propvalue']])
+    total = table.loc['total']
+    table = table.drop('total')
 
     #Conclude the table
     #d = {'col1': [1, 2], 'col2': [3, 4]}
@@ -1494,11 +2640,12 @@ def table_1_fin(location):
     Weapon=['Firearms','Explosives','Incendiary','Melee','Sabotage','Other and unknown']
     Type=['Lone wolf','Multiple Attacks','Target non-United States','Logistic international']
 
-    dfd={'Observations':observes,'Percentage':percentage,'Attack Success':successrate,'Injured':nwound,'Killed':nkill,'Damage(USD)':damage}
+    #the percentages are of all attacks in the sample
+    dfd={'Observations':table['count'].tolist(),'Percentage':table['share'].tolist(),'Attack Success':table['success_rate'].tolist(),'Injured':table['nwound'].tolist(),'Killed':table['nkill'].tolist(),'Damage(USD)':table['real_propvalue'].tolist()}
     df1=pd.DataFrame.from_dict(dfd)
     df1['Index']=Attack+Target+Weapon+Type
 
-    prep2=[len(df), ' ', len(df.query('success==1'))/len(df), df_filtered['nwound'].mean(), df_filtered['nkill'].mean(), df_filtered['real_propvalue'].mean(), 'Total Observations']
+    prep2=[int(total['count']), ' ', total['success_rate'], total['nwound'], total['nkill'], total['real_propvalue'], 'Total Observations']
     df1.loc['24']=prep2
     df1['Section']=['Tactics']*6 + ['Target']*8 + ['Weapon']*6 + ['Others']*5
     return df1
@@ -1542,69 +2689,34 @@ def table_4_fin(location):
     df=df.query('attack_armed==0&int_log==0')
     df = df.dropna()
 
-    ####column 1######
-    control1=' + C(attack_assass) + C(attack_armed) + C(attack_bomb) + C(attack_facility) + C(int_log)'
-    control2=control1 + ' + C(weap_firearm) + C(weap_explo) + C(weap_incend)'
-
-
-    formula='success ~ ln_emp_pop + C(capital_state) + C(coastal_county) + C(major_airport) + C(medium_airport) + ln_ca1_pop_1_lag1 + ln_births_lag1 + ln_social_sec_recip_lag1 + ln_educ_pubenrol_lag1 + ln_crime_violent_lag1 + ln_crime_robb_lag1 + ln_crime_property_lag1 + ln_crime_motorveh_lag1 + multipleeventperyear + C(non_us_target)' + control1
-
-    mod1=smf.probit(formula=formula, data=df).fit(cov_type='cluster', cov_kwds={'groups': df['fips']})
-    margeff1=mod1.get_margeff()
-
-    c1= margeff1.margeff
-    c1= np.delete(c1, [5, 6, 7])
-    c1= c1.tolist()
-    c1.insert(6, ' ')
-    c2= margeff1.margeff_se
-    c2= np.delete(c2, [5, 6, 7])
-    c2= c2.tolist()
-    c2.insert(6, ' ')
-
-    #column 2
-    formula1='success ~ ln_emp_pop + C(capital_state) + C(coastal_county) + C(major_airport) + C(medium_airport) + ln_ca1_pop_1_lag1 + ln_births_lag1 + ln_social_sec_recip_lag1 + ln_educ_pubenrol_lag1 + ln_crime_violent_lag1 + ln_crime_robb_lag1 + ln_crime_property_lag1 + ln_crime_motorveh_lag1 + multipleeventperyear + C(non_us_target)' + control2
-
-    mod2=smf.probit(formula=formula1, data=df).fit(cov_type='cluster', cov_kwds={'groups': df['fips']})
-    margeff2=mod2.get_margeff()
-    c3= margeff2.margeff
-    c3= np.delete(c3, [5, 6, 7, 8, 9, 10])
-    c3= c3.tolist()
-    c3.insert(6, ' ')
-    c4= margeff2.margeff_se
-    c4= np.delete(c4, [5, 6, 7, 8 , 9, 10])
-    c4= c4.tolist()
-    c4.insert(6, ' ')
-
-    #column 3
-    formula_2=formula.replace('ln_emp_pop', 'ln_real_qp1')
-    mod3=smf.probit(formula=formula_2, data=df).fit(cov_type='cluster', cov_kwds={'groups': df['fips']})
-    margeff3=mod3.get_margeff()
-    c5= margeff3.margeff
-    c5= np.delete(c5, [5, 6, 7])
-    c5= c5.tolist()
-    c5.insert(5, ' ')
-    c6= margeff3.margeff_se
-    c6= np.delete(c6, [5, 6, 7])
-    c6= c6.tolist()
-    c6.insert(5, ' ')
-
-    #column 4
-    formula1_2=formula1.replace('ln_emp_pop', 'ln_real_qp1')
-    mod4=smf.probit(formula=formula1_2, data=df).fit(cov_type='cluster', cov_kwds={'groups': df['fips']})
-    margeff4=mod4.get_margeff()
-    c7= margeff4.margeff
-    c7= np.delete(c7, [5, 6, 7, 8, 9, 10])
-    c7= c7.tolist()
-    c7.insert(5, ' ')
-    c8= margeff4.margeff_se
-    c8= np.delete(c8, [5, 6, 7, 8 , 9, 10])
-    c8= c8.tolist()
-    c8.insert(5, ' ')
+    ####the four columns on one design, jobs or earnings per capita with and without the weapon controls######
+    controls1 = ['capital_state', 'coastal_county', 'major_airport', 'medium_airport', 'non_us_target',
+                 'attack_assass', 'attack_armed', 'attack_bomb', 'attack_facility', 'int_log']
+    controls2 = controls1 + ['weap_firearm', 'weap_explo', 'weap_incend']
+    lags = ['ln_ca1_pop_1_lag1', 'ln_births_lag1', 'ln_social_sec_recip_lag1', 'ln_educ_pubenrol_lag1',
+            'ln_crime_violent_lag1', 'ln_crime_robb_lag1', 'ln_crime_property_lag1', 'ln_crime_motorveh_lag1',
+            'multipleeventperyear']
+    specs = [Spec('success', [key] + lags, controls, [], [], 'fips')
+             for key in ['ln_emp_pop', 'ln_real_qp1'] for controls in [controls1, controls2]]
+    fits = probitspec(specs, df)
 
     ###building df###
-    index= ['State Capital', 'Coastal county', 'Airport (Large hub)', 'Airport (Medium hub)', 'Non-US target', 'log jobs per capita', 'log total earnings', 'log population', 'log births', 'log Social Security recipients', 'log public school enrollment', 'log violent crimes', 'log robberies', 'log property crimes', 'log motor vehicle thefts', 'number of attacks']
-    data = {'Index':index , 'Successful(1)': c1, 'Robust Standard Error(1)': c2, 'Successful(2)': c3, 'Robust Standard Error(2)': c4, 'Successful(3)': c5, 'Robust Standard Error(3)': c6, 'Successful(4)': c7, 'Robust Standard Error(4)': c8}
-    result = pd.DataFrame(data) 
+    names = {'capital_state': 'State Capital', 'coastal_county': 'Coastal county', 'major_airport': 'Airport (Large hub)',
+             'medium_airport': 'Airport (Medium hub)', 'non_us_target': 'Non-US target', 'ln_emp_pop': 'log jobs per capita',
+             'ln_real_qp1': 'log total earnings', 'ln_ca1_pop_1_lag1': 'log population', 'ln_births_lag1': 'log births',
+             'ln_social_sec_recip_lag1': 'log Social Security recipients', 'ln_educ_pubenrol_lag1': 'log public school enrollment',
+             'ln_crime_violent_lag1': 'log violent crimes', 'ln_crime_robb_lag1': 'log robberies',
+             'ln_crime_property_lag1': 'log property crimes', 'ln_crime_motorveh_lag1': 'log motor vehicle thefts',
+             'multipleeventperyear': 'number of attacks'}
+    index = list(names.values())
+    data = {'Index': index}
+    for i, fit in zip([1, 2, 3, 4], fits):
+        # the effects are picked by name, a dummy is named by its column, capital_state[1.0]
+        labels = fit.index.map(lambda name: names.get(name.split('[')[0]))
+        fit = fit.set_axis(labels)[labels.notna()].reindex(index)
+        data['Successful({})'.format(i)] = [v if v == v else ' ' for v in fit['coeff']]
+        data['Robust Standard Error({})'.format(i)] = [v if v == v else ' ' for v in fit['stderror']]
+    result = pd.DataFrame(data)
 
     prep2=[['Index', 'Successful(1)', 'Robust Standard Error(1)', 'Successful(2)', 'Robust Standard Error(2)', 'Successful(3)', 'Robust Standard Error(3)', 'Successful(4)', 'Robust Standard Error(4)'],
            ['year', '1989-2006', '1989-2006', '1989-2006', '1989-2006', '1989-2006', '1989-2006', '1989-2006', '1989-2006'],
@@ -1626,11 +2738,11 @@ def table_9_fin(location):
     '''
     
     
-    df= pd.read_stata(location)
-    df= df.dropna(subset=['year', 'month', 'attack_assass', 'attack_armed', 'attack_bomb', 'attack_facility', 'weap_firearm','weap_explo', 'weap_incend', 'non_us_target', 'int_log', 'meventperyear', 'ln_emp_pop'])
+    #the file is read once, both samples are cut from it
+    data= load_stata(location)
+    df= data.dropna(subset=['year', 'month', 'attack_assass', 'attack_armed', 'attack_bomb', 'attack_facility', 'weap_firearm','weap_explo', 'weap_incend', 'non_us_target', 'int_log', 'meventperyear', 'ln_emp_pop'])
     control='C(attack_assass) + C(attack_armed) + C(attack_bomb) + C(attack_facility) + C(weap_firearm) + C(weap_explo) + C(weap_incend) + C(non_us_target) + C(int_log) + meventperyear'
-    df2= pd.read_stata(location)
-    df2= df2.dropna(subset=['year', 'month', 'attack_assass', 'attack_armed', 'attack_bomb', 'attack_facility', 'weap_firearm','weap_explo', 'weap_incend', 'non_us_target', 'int_log', 'meventperyear', 'ln_emp_pop', 'ln_abc_cbs_nbc_lenght'])
+    df2= data.dropna(subset=['year', 'month', 'attack_assass', 'attack_armed', 'attack_bomb', 'attack_facility', 'weap_firearm','weap_explo', 'weap_incend', 'non_us_target', 'int_log', 'meventperyear', 'ln_emp_pop', 'ln_abc_cbs_nbc_lenght'])
     ###panel A
     ###column 1
     formula= 'abc_cbs_nbc_mention1 ~ success + ln_vanderbilt_cityyear + C(year) + C(month) + C(state) + '+ control
@@ -1818,125 +2930,36 @@ def table_a5_fin(location):
     #####Panel A####################
 
     condition=['ln_est_pop', 'successful', 'post', 'month', 'year']
-    df1=df.dropna(subset=condition)
+    df1=fastdf(condition, df, year1=1970, year2=2013)
     ######column 1###########
-    temp1, a=iindexer(data=df1, key='month', custom='month', a=1, b=12, between=1)
-    temp2, b=iindexer(data=df1, key='year', custom='year', a=1970, b=2013, between=1)
-    df1=pd.concat([df1, temp1, temp2], axis=1)
-    formula='ln_est_pop ~successful + post + meventperyear'+' + '+' + '.join(a+b)
-    a5c1=aregdf(formula, df1, absorb='fips', cluster='fips')
-    a5c1=a5c1[['coeff', 'stderror']]
-    a5c1=a5c1.loc[['successful'],:]
+    spec1= Spec(outcome='ln_est_pop', regressors=['successful', 'post', 'meventperyear'], controls=['i_month', 'i_year'])
 
     #######column 2###############
-    additional= '+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    formula_2= formula+ additional
-    a5c2=aregdf(formula_2, df1, absorb='fips', cluster='fips')
-    a5c2=a5c2[['coeff', 'stderror']]
-    a5c2=a5c2.loc[['successful'],:]
+    additional= ['non_us_t', 'int_l', 'aa_assass', 'aa_armed', 'aa_bomb', 'aa_facility', 'ww_firearm', 'ww_explo', 'ww_incend']
+    spec2= spec1._replace(controls=spec1.controls+additional)
+    a5c1, a5c2=[c[['coeff', 'stderror']].loc[['successful'],:] for c in aregspec([spec1, spec2], df1)]
+
     #######column 3############
-    div,c= iindexer(data=df1,key='div_9_all', custom='div', a=1, b=9, between=1)
-    df1= pd.concat([df1,div], axis=1)
-    df1= df1.fillna(0)
-    d= [str(j)+'*'+str(i)  for i in a for j in b]
-    e= [str(j)+'*'+str(i)  for i in b for j in c]
-    formula_3= formula_2+' + '+' + '.join(d+e)
-    a5c3= aregdf(formula_3, df1, absorb='fips', cluster='fips')
-    a5c3=a5c3[['coeff', 'stderror']]
-    a5c3=a5c3.loc[['successful'],:]
+    #column 3 and panel B run on the zero filled frame
+    df1= fastdf(condition, df.dropna(subset=condition).fillna(0), year1=1970, year2=2013)
+    spec3= spec2._replace(interactions=[('i_month', 'i_year'), ('i_div', 'i_year')])
 
     #######Panel B####################
-    ######column 1################
-    formula2=formula.replace('ln_est_pop', 'ln_small_est_pop')
-    b5c1=aregdf(formula2, df1, absorb='fips', cluster='fips')
-    b5c1=b5c1[['coeff', 'stderror']]
-    b5c1=b5c1.loc[['successful'],:]
-
-    ######column 2###############
-    formula2_2=formula_2.replace('ln_est_pop', 'ln_small_est_pop')
-    b5c2=aregdf(formula2_2, df1, absorb='fips', cluster='fips')
-    b5c2=b5c2[['coeff', 'stderror']]
-    b5c2=b5c2.loc[['successful'],:]
-
-    #####column 3##################
-    formula2_3=formula_3.replace('ln_est_pop', 'ln_small_est_pop')
-    b5c3=aregdf(formula2_3, df1, absorb='fips', cluster='fips')
-    b5c3=b5c3[['coeff', 'stderror']]
-    b5c3=b5c3.loc[['successful'],:]
-
-
-    #####Panel C#####################
-    condition=['ln_medium_est_pop', 'successful', 'post', 'month', 'year']
+    ######column 1, 2 and 3################
+    keys=['ln_est_pop', 'ln_small_est_pop']
+    panels= aregspec([spec._replace(outcome=keys) for spec in [spec1, spec2, spec3]], df1)
+    a5c3=panels[0][2][['coeff', 'stderror']].loc[['successful'],:]
+    b5c1, b5c2, b5c3=[c[['coeff', 'stderror']].loc[['successful'],:] for c in panels[1]]
+
+
+    #####Panel C, D and E#####################
+    #each outcome keeps its own rows, the three nested columns are one ladder for all three
+    condition=['successful', 'post', 'month', 'year']
+    keys=['ln_medium_est_pop', 'ln_n500_pop', 'ln_emp_est']
     df2= fastdf(condition, df, year1=1970, year2=2013)
-    ####column 1#####################
-    formula3=formula.replace('ln_est_pop', 'ln_medium_est_pop')
-    c5c1=aregdf(formula3, df2, absorb='fips', cluster='fips')
-    c5c1=c5c1[['coeff', 'stderror']]
-    c5c1=c5c1.loc[['successful'],:]
-
-    ####column 2#####################
-    formula3_2=formula_2.replace('ln_est_pop', 'ln_medium_est_pop')
-    c5c2=aregdf(formula3_2, df2, absorb='fips', cluster='fips')
-    c5c2=c5c2[['coeff', 'stderror']]
-    c5c2=c5c2.loc[['successful'],:]
-
-    ####column 3#######################
-    formula3_3=formula_3.replace('ln_est_pop', 'ln_medium_est_pop')
-    c5c3=aregdf(formula3_3, df2, absorb='fips', cluster='fips')
-    c5c3=c5c3[['coeff', 'stderror']]
-    c5c3=c5c3.loc[['successful'],:]
-
-    #######Panel D#########################
-    condition=['ln_n500_pop', 'successful', 'post', 'month', 'year']
-    df4=df.dropna(subset=condition)
-    temp1, a=iindexer(data=df4, key='month', custom='month', a=1, b=12, between=1)
-    temp2, b=iindexer(data=df4, key='year', custom='year', a=1970, b=2013, between=1)
-    div,c= iindexer(data=df4,key='div_9_all', custom='div', a=1, b=9, between=1)
-    df4=pd.concat([df4, temp1, temp2, div], axis=1)
-
-    #######column 1########################
-    formula4=formula.replace('ln_est_pop', 'ln_n500_pop')
-    d5c1=aregdf(formula4, df4, absorb='fips', cluster='fips')
-    d5c1=d5c1[['coeff', 'stderror']]
-    d5c1=d5c1.loc[['successful'],:]
-
-    #######column 2###########################
-    formula4_2=formula_2.replace('ln_est_pop', 'ln_n500_pop')
-    d5c2=aregdf(formula4_2, df4, absorb='fips', cluster='fips')
-    d5c2=d5c2[['coeff', 'stderror']]
-    d5c2=d5c2.loc[['successful'],:]
-
-    #######column 3###########################
-    formula4_3=formula_3.replace('ln_est_pop', 'ln_n500_pop')
-    d5c3=aregdf(formula4_3, df4, absorb='fips', cluster='fips')
-    d5c3=d5c3[['coeff', 'stderror']]
-    d5c3=d5c3.loc[['successful'],:]
- 
-    #######Panel E#############################
-    condition=['ln_emp_est', 'successful', 'post', 'month', 'year']
-    df3=df.dropna(subset=condition)
-    temp1, a=iindexer(data=df3, key='month', custom='month', a=1, b=12, between=1)
-    temp2, b=iindexer(data=df3, key='year', custom='year', a=1970, b=2013, between=1)
-    div,c= iindexer(data=df3,key='div_9_all', custom='div', a=1, b=9, between=1)
-    df3=pd.concat([df3, temp1, temp2, div], axis=1)
-
-    #######column 1########################
-    formula5=formula.replace('ln_est_pop', 'ln_emp_est')
-    e5c1=aregdf(formula5, df3, absorb='fips', cluster='fips')
-    e5c1=e5c1[['coeff', 'stderror']]
-    e5c1=e5c1.loc[['successful'],:]
-
-    #######column 2###########################
-    formula5_2=formula_2.replace('ln_est_pop', 'ln_emp_est')
-    e5c2=aregdf(formula5_2, df3, absorb='fips', cluster='fips')
-    e5c2=e5c2[['coeff', 'stderror']]
-    e5c2=e5c2.loc[['successful'],:]
-
-    #######column 3###########################
-    formula5_3=formula_3.replace('ln_est_pop', 'ln_emp_est')
-    e5c3=aregdf(formula5_3, df3, absorb='fips', cluster='fips')
-    e5c3=e5c3[['coeff', 'stderror']]
-    e5c3=e5c3.loc[['successful'],:]
+    ####column 1, 2 and 3 as in panel A#####################
+    panels= aregspec([spec._replace(outcome=keys) for spec in [spec1, spec2, spec3]], df2)
+    (c5c1, c5c2, c5c3), (d5c1, d5c2, d5c3), (e5c1, e5c2, e5c3)=[[c[['coeff', 'stderror']].loc[['successful'],:] for c in p] for p in panels]
 
     ####finalisation###########
     prep=[['Panel','Index', '(1)', '(2)', '(3)'],
@@ -1971,47 +2994,151 @@ def table_a5_fin(location):
 ############################################
 #####Figure functions#######################
 
-def fig_3and4_fin(location):
-    
-    ##figure 3 data prep
-    condition3=['ln_emp_pop','month','bon1','year']
-    fdf3=statadf(location, condition3)
+###figures are drawn through subplots and show: headless (see render) they are
+###plain Agg figures outside of pyplot, no display is needed and workers can draw them
+RENDER = {'headless': False, 'figures': []}
 
-    year,a=iindexer(data=fdf3, key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=fdf3, key='month', custom='month', a=1, b=12, between=1)
-    fdf3 =pd.concat([fdf3,year,month], axis=1)
 
-    #figure 3 formula
-    f3f= 'ln_emp_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-    f3df= aregdf(f3f, data=fdf3 , absorb='fips', cluster='fips')
+def subplots(*args, **kwargs):
+    '''plt.subplots, headless a Figure of its own that render collects'''
 
-    #rearranging the datas
-    f3df= f3df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f3df= f3df.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f3df= pd.concat([f3df.iloc[:2], line, f3df.iloc[2:]])
-    f3df['time']=range(-3,6,1)
-    
-    #figure 4 data prep
+    if not RENDER['headless']:
+        return plt.subplots(*args, **kwargs)
+
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    RENDER['figures'].append(fig)
+    return fig, fig.subplots(*args, **kwargs)
+
+
+def show():
+    '''plt.show, nothing to do headless'''
+
+    if not RENDER['headless']:
+        plt.show()
+
+
+def render(function, *args, out=None, formats=('png',)):
+    '''calls the figure function headless and returns the figures it drew; with out
+    they are also written there as name_0.png, name_1.png, ... in every format'''
+
+    RENDER.update(headless=True, figures=[])
+    try:
+        function(*args)
+        figures = RENDER['figures']
+    finally:
+        RENDER.update(headless=False, figures=[])
+
+    if out is not None:
+        os.makedirs(out, exist_ok=True)
+        for i, fig in enumerate(figures):
+            for fmt in formats:
+                fig.savefig(os.path.join(out, '{}_{}.{}'.format(function.__name__, i, fmt)), bbox_inches='tight')
+
+    return figures
+
+
+###the event study estimates of a figure are computed once and kept on disk,
+###the figure functions only draw them
+EVENT_CACHE = {'path': os.path.join('Data', '.eventstudy'), 'entries': {}}
+
+
+def eventstudy_cache(path=None, clear=False):
+    '''sets the folder the event study estimates are kept in, clear drops the
+    ones in memory and on disk. returns the folder and the cached keys'''
+
+    if path is not None:
+        EVENT_CACHE['path'] = path
+    if clear:
+        EVENT_CACHE['entries'].clear()
+        if os.path.isdir(EVENT_CACHE['path']):
+            for name in os.listdir(EVENT_CACHE['path']):
+                os.remove(os.path.join(EVENT_CACHE['path'], name))
+
+    return {'path': EVENT_CACHE['path'], 'entries': list(EVENT_CACHE['entries'])}
+
+
+def eventstudy(fit, terms, start, omitted=None):
+    '''the lead and lag rows of an aregdf frame in event time order, with the
+    columns coeff, stderror, conf_lower, conf_higher, pvals and time
+    terms are the event dummies as written in the formula (C(pre_3_success)),
+    start is the event time of the first one. omitted is the event time of the
+    normalised period, it enters as a row of zeros'''
+
+    rows = [next((n for n in fit.index if n == t or n.startswith(t + '[')), t) for t in terms]
+    es = fit.reindex(rows)[['coeff', 'stderror', 'conf_lower', 'conf_higher', 'pvals']]
+    times = list(range(start, start + len(terms) + (omitted is not None)))
+    if omitted is not None:
+        times.remove(omitted)
+        line = pd.DataFrame({'coeff': 0., 'stderror': 0., 'conf_lower': 0., 'conf_higher': 0., 'pvals': np.nan}, index=['omitted'])
+        at = times.index(omitted + 1) if omitted + 1 in times else len(times)
+        es = pd.concat([es.iloc[:at], line, es.iloc[at:]])
+        times.insert(at, omitted)
+    es['time'] = times
+
+    return es
+
+
+def event_results(builder, *locations):
+    '''builder(*locations), a dict of eventstudy frames, estimated on the first
+    call and read back from memory or the cache folder afterwards. the key is
+    the code of builder and of eventstudy and the estimators (code_version),
+    the K rule and the content of the files, editing any of them refits'''
+
+    h = hashlib.blake2b(digest_size=20)
+    h.update(builder.__name__.encode())
+    h.update(inspect.getsource(builder).encode())
+    h.update(inspect.getsource(eventstudy).encode())
+    h.update((code_version() + KRULE['k']).encode())
+    for location in locations:
+        h.update(file_hash(location).encode())
+    key = h.hexdigest()
+
+    entries = EVENT_CACHE['entries']
+    file = os.path.join(EVENT_CACHE['path'], builder.__name__ + '-' + key + '.pkl')
+    if key not in entries:
+        if os.path.exists(file):
+            with open(file, 'rb') as f:
+                entries[key] = pickle.load(f)
+        else:
+            entries[key] = builder(*locations)
+            # figures run in parallel workers, a concurrent reader must not see a partial file
+            pickle_replace(entries[key], file)
+
+    return entries[key]
+
+
+def fig_3and4_results(location):
+    '''event study estimates of figure 3 (successful attacks) and 4 (failed attacks)'''
+
+    results={}
+    for e, bon in [('success', 'bon1'), ('fail', 'bon0')]:
+        #data prep
+        fdf=statadf(location, ['ln_emp_pop','month',bon,'year'])
+        year,a=iindexer(data=fdf, key='year', custom='year', a=1970, b=2013, between=1)
+        month,b=iindexer(data=fdf, key='month', custom='month', a=1, b=12, between=1)
+        fdf =pd.concat([fdf,year,month], axis=1)
+
+        #formula, one year before is the omitted period
+        terms=['C(pre_3_{})'.format(e), 'C(pre_2_{})'.format(e)] + ['C(post_{}_{})'.format(i, e) for i in range(6)]
+        formula='ln_emp_pop ~ '+' + '.join(terms)+' + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
+        fit= aregdf(formula, data=fdf , absorb='fips', cluster='fips')
+        results[e]=eventstudy(fit, terms, -3, omitted=-1)
+
+    return results
+
+
+def fig_3and4_fin(location):
     
-    condition4=['ln_emp_pop','month','bon0','year']
-    fdf4=statadf(location, condition4)
-    year,c=iindexer(data=fdf4, key='year', custom='year', a=1970, b=2013, between=1)
-    month,d=iindexer(data=fdf4, key='month', custom='month', a=1, b=12, between=1)
-    fdf4 =pd.concat([fdf4,year,month], axis=1)
-    f4f='ln_emp_pop ~ C(pre_3_fail) + C(pre_2_fail) + C(post_0_fail)+ C(post_1_fail) + C(post_2_fail) + C(post_3_fail) + C(post_4_fail) + C(post_5_fail) + meventperyear'+ ' + ' + ' + '.join(c)+' + '+' + '.join(d)
-    f4df= aregdf(f4f, data=fdf4 , absorb='fips', cluster='fips')
-
-    #rearranging the datas
-    f4df= f4df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f4df= f4df.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f4df= pd.concat([f4df.iloc[:2], line, f4df.iloc[2:]])
-    f4df['time']=range(-3,6,1)
+    results=event_results(fig_3and4_results, location)
+    f3df, f4df=results['success'], results['fail']
 
     #plotting
     
-    fig, (ax1, ax2) = plt.subplots(1, 2)
+    fig, (ax1, ax2) = subplots(1, 2)
     fig.set_size_inches(8, 3.5)
     ax1.plot( 'time', 'coeff', data=f3df, markersize=12, color='red', linewidth=3, label='Point estimate')
     ax1.plot( 'time', 'conf_lower', data=f3df, marker='', color='blue', linewidth=2, linestyle='dashed', label='Robust 95% confidence Intervel')
@@ -2046,59 +3173,38 @@ def fig_3and4_fin(location):
     
     return
 
-def fig_5and5e_fin(location):   
-    
-    df4=pd.read_stata(location)
+def fig_5and5e_results(location):
+    '''event study estimates of figure 5 (successful attacks) and 5e (failed attacks)'''
+
+    events=['{}_{}_{}'.format(t, i, e) for t in ['pre', 'post'] for i in range(6) for e in ['success', 'fail']]
+    df4=load_stata(location, events + ['fips', 'ln_emp_pop', 'ln_real_qp1_pop', 'year', 'month', 'bon1', 'meventperyear'])
     df4=df4.dropna(subset = ['ln_emp_pop','year','month','bon1'])
-    df4_1=df4[['fips','ln_emp_pop','year','month','post_5_success','post_4_success','post_3_success','post_2_success','post_1_success','post_0_success','pre_1_success','pre_2_success','pre_3_success','meventperyear']]
-    df4_3=df4[['fips','ln_real_qp1_pop','year','month','post_5_success','post_4_success','post_3_success','post_2_success','post_1_success','post_0_success','pre_1_success','pre_2_success','pre_3_success','meventperyear']]
 
     #call in custom function
-    year,a=iindexer(data=df4_1,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df4_1,key='month', custom='month', a=1, b=12, between=1)
-    df4_3 =pd.concat([df4_3,year,month], axis=1)
+    year,a=iindexer(data=df4,key='year', custom='year', a=1970, b=2013, between=1)
+    month,b=iindexer(data=df4,key='month', custom='month', a=1, b=12, between=1)
+    df4 =pd.concat([df4,year,month], axis=1)
 
-    #define basemodel
-    basemodel_2='ln_real_qp1_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-
-    #implement the areg function
-    f5df=aregdf(basemodel_2,data=df4_3,absorb='fips',cluster='fips')
-    ####use the table t5c4
-
-    #rearranging the datas
-    f5df= f5df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f5df= f5df.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f5df= pd.concat([f5df.iloc[:2], line, f5df.iloc[2:]])
-    f5df['time']=range(-3,6,1)
-    
-    ####extension of 5####
-    dfe=pd.read_stata(location)
-    dfe=dfe.dropna(subset = ['ln_emp_pop','year','month','bon1'])
-    df4_1e=dfe[['fips','ln_emp_pop','year','month','post_5_fail','post_4_fail','post_3_fail','post_2_fail','post_1_fail','post_0_fail','pre_1_fail','pre_2_fail','pre_3_fail','meventperyear']]
-    df4_3e=dfe[['fips','ln_real_qp1_pop','year','month','post_5_fail','post_4_fail','post_3_fail','post_2_fail','post_1_fail','post_0_fail','pre_1_fail','pre_2_fail','pre_3_fail','meventperyear']]
+    results={}
+    for e in ['success', 'fail']:
+        #define basemodel
+        terms=['C(pre_3_{})'.format(e), 'C(pre_2_{})'.format(e)] + ['C(post_{}_{})'.format(i, e) for i in range(6)]
+        basemodel_2='ln_real_qp1_pop ~ '+' + '.join(terms)+' + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
 
-    #call in custom function
-    year,a=iindexer(data=df4_1e,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df4_1e,key='month', custom='month', a=1, b=12, between=1)
-    df4_3e =pd.concat([df4_3e,year,month], axis=1)
+        #implement the areg function, one year before is the omitted period
+        fit=aregdf(basemodel_2,data=df4,absorb='fips',cluster='fips')
+        results[e]=eventstudy(fit, terms, -3, omitted=-1)
 
-        #define basemodel
-    basemodel_2='ln_real_qp1_pop ~  C(pre_3_fail) +C(pre_2_fail) + C(post_0_fail) + C(post_1_fail) + C(post_2_fail) + C(post_3_fail) + C(post_4_fail) + C(post_5_fail)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
+    return results
 
-        #implement the areg function
-    f5dfe=aregdf(basemodel_2,data=df4_3e,absorb='fips',cluster='fips')
-        ####use the table t5c4
 
-        #rearranging the datas
-    f5dfe= f5dfe.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f5dfe= f5dfe.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f5dfe= pd.concat([f5dfe.iloc[:2], line, f5dfe.iloc[2:]])
-    f5dfe['time']=range(-3,6,1)
+def fig_5and5e_fin(location):   
+    
+    results=event_results(fig_5and5e_results, location)
+    f5df, f5dfe=results['success'], results['fail']
     
     ##plot##
-    fig, (ax1, ax2) = plt.subplots(1, 2)
+    fig, (ax1, ax2) = subplots(1, 2)
     fig.set_size_inches(8, 3.5)
     ax1.plot( 'time', 'coeff', data=f5df, markersize=12, color='red', linewidth=3, label='Point estimate')
     ax1.plot( 'time', 'conf_lower', data=f5df, marker='', color='blue', linewidth=2, linestyle='dashed', label='Robust 95% confidence Intervel')
@@ -2132,36 +3238,31 @@ def fig_5and5e_fin(location):
     ax2.text(0.5,-0.1, 'Failed Attacks and Total Earnings', size=12, ha="center", transform=ax2.transAxes)
     return
 
-def fig_6and7_fin(location):
+def fig_6and7_results(location):
+    '''event study estimates of figure 6 and 7, the comparison model on employment and earnings'''
+
     #get data and fit models
     condition6=['ln_emp_pop','month','sample','year']
     fdf=statadf(location, condition6)
     year,a=iindexer(data=fdf,key='year', custom='year', a=1970, b=2013, between=1)
     month,b=iindexer(data=fdf,key='month', custom='month', a=1, b=12, between=1)
     fdf =pd.concat([fdf,year,month], axis=1)
-    basemodel= 'ln_emp_pop ~ C(success_3_pre) + C(success_2_pre) + C(success_1_pre)+ C(success_0_post) + C(success_1_post) + C(success_2_post) + C(success_3_post) + C(success_4_post) + C(success_5_post) + C(pre_3) + C(pre_2) + C(pre_1) + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
+    terms=['C(success_{}_pre)'.format(i) for i in [3, 2, 1]] + ['C(success_{}_post)'.format(i) for i in range(6)]
+    basemodel= 'ln_emp_pop ~ '+' + '.join(terms)+' + C(pre_3) + C(pre_2) + C(pre_1) + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
     f6df=aregdf(basemodel, data=fdf,absorb='fips',cluster='fips')
 
-    #slicing and subsetting the dataframe
-    f6df= f6df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f6df= f6df.iloc[1:10,:]
-    f6df['time']=range(-3,6,1)
-    
-    
-    condition6=['ln_emp_pop','month','sample','year']
-    fdf=statadf(location, condition6)
-    year,a=iindexer(data=fdf,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=fdf,key='month', custom='month', a=1, b=12, between=1)
-    fdf =pd.concat([fdf,year,month], axis=1)
-    basemodel= 'ln_emp_pop ~ C(success_3_pre) + C(success_2_pre) + C(success_1_pre)+ C(success_0_post) + C(success_1_post) + C(success_2_post) + C(success_3_post) + C(success_4_post) + C(success_5_post) + C(pre_3) + C(pre_2) + C(pre_1) + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
     basemodel2= basemodel.replace('ln_emp_pop','ln_real_qp1_pop')
     f7df=aregdf(basemodel2, data=fdf,absorb='fips',cluster='fips')
-    f7df= f7df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f7df= f7df.iloc[1:10,:]
-    f7df['time']=range(-3,6,1)
+
+    return {'employment': eventstudy(f6df, terms, -3), 'earnings': eventstudy(f7df, terms, -3)}
+
+
+def fig_6and7_fin(location):
+    results=event_results(fig_6and7_results, location)
+    f6df, f7df=results['employment'], results['earnings']
     
     ####plotting
-    fig, (ax1, ax2) = plt.subplots(1, 2)
+    fig, (ax1, ax2) = subplots(1, 2)
     fig.set_size_inches(8, 3.5)
     ax1.plot( 'time', 'coeff', data=f6df, markersize=12, color='red', linewidth=3, label='Point estimate')
     ax1.plot( 'time', 'conf_lower', data=f6df, marker='', color='blue', linewidth=2, linestyle='dashed', label='Robust 95% confidence Intervel')
@@ -2194,160 +3295,64 @@ def fig_6and7_fin(location):
     
     return
 
-def fig_allsum_fin():    
-    
-    df4=pd.read_stata('Data/Final-Sample2.dta')
-    df4=df4.dropna(subset = ['ln_emp_pop','year','month','bon1'])
+def fig_allsum_results(location='Data/Final-Sample2.dta'):
+    '''event study estimates of the fixed effect extension, basic (t5c) and comparison (c) model'''
 
-    ###column 1
-
-    df4_1=df4
+    df4_1=statadf(location, ['ln_emp_pop','year','month','bon1'])
 
     #call in custom function
     year,a=iindexer(data=df4_1,key='year', custom='year', a=1970, b=2013, between=1)
     month,b=iindexer(data=df4_1,key='month', custom='month', a=1, b=12, between=1)
     df4_1 =pd.concat([df4_1,year,month], axis=1)
 
-    #define basemodel
-    basemodel='ln_emp_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-
-    #implement the areg function
-    t5c1=aregdf(basemodel,data=df4_1,absorb='fips',cluster='fips')
-    t5c1=t5c1[['coeff', 'pvals']]
-    t5c1=t5c1.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    t5c1= pd.concat([t5c1.iloc[:2], line, t5c1.iloc[2:]])
-    t5c1['time']=range(-3, 6, 1)
-    
-
-
-    #modify basemodel from first section
-    bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
-    bl2=['C('+i+')' for i in bl2]
-    basemodel_2=basemodel+' + '+' + '.join(bl2)
-
-
-    t5c2=aregdf(basemodel_2,data=df4_1,absorb='fips',cluster='fips')
-    t5c2=t5c2[['coeff', 'stderror', 'rsquaredadj']]
-    t5c2=t5c2.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    t5c2= pd.concat([t5c2.iloc[:2], line, t5c2.iloc[2:]])
-    t5c2['time']=range(-3, 6, 1)
-    ###column 3
-    
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
-
-    basemodel_3=basemodel_2+' + '+' + '.join(c)
-
-    t5c3=aregdf(basemodel_3,data=df4_1,absorb='fips',cluster='fips')
-    t5c3=t5c3[['coeff', 'stderror', 'rsquaredadj']]
-    t5c3=t5c3.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    t5c3= pd.concat([t5c3.iloc[:2], line, t5c3.iloc[2:]])
-    t5c3['time']=range(-3, 6, 1)
-   
- 
-    #define basemodel
-    basemodel_2='ln_real_qp1_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-
-    #implement the areg function
-    t5c4=aregdf(basemodel_2,data=df4_1,absorb='fips',cluster='fips')
-    t5c4=t5c4[['coeff', 'stderror', 'rsquaredadj']]
-    t5c4=t5c4.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    t5c4= pd.concat([t5c4.iloc[:2], line, t5c4.iloc[2:]])
-    t5c4['time']=range(-3, 6, 1)
-    ###column 5
-    #add the additional columns
-    
-      
-    
-    #modify basemodel from first section
+    #the basic model, one year before is the omitted period
+    terms=['C(pre_3_success)', 'C(pre_2_success)'] + ['C(post_{}_success)'.format(i) for i in range(6)]
+    basemodel='ln_emp_pop ~ '+' + '.join(terms)+' + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
     bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
     bl2=['C('+i+')' for i in bl2]
-    basemodel_3=basemodel_2+' + '+' + '.join(bl2)
-    
-
-    t5c5=aregdf(basemodel_3,data=df4_1,absorb='fips',cluster='fips')
-    t5c5=t5c5[['coeff', 'stderror', 'rsquaredadj']]
-    t5c5=t5c5.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    t5c5= pd.concat([t5c5.iloc[:2], line, t5c5.iloc[2:]])
-    t5c5['time']=range(-3, 6, 1)
-    
     c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
 
-    basemodel_4=basemodel_3+' + '+' + '.join(c)
-
-    t5c6=aregdf(basemodel_4,data=df4_1,absorb='fips',cluster='fips')
-    t5c6=t5c6[['coeff', 'stderror', 'rsquaredadj']]
-    t5c6=t5c6.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    t5c6= pd.concat([t5c6.iloc[:2], line, t5c6.iloc[2:]])
-    t5c6['time']=range(-3, 6, 1)
+    results={}
+    for n, outcome in [(1, 'ln_emp_pop'), (4, 'ln_real_qp1_pop')]:
+        basemodel_1=basemodel.replace('ln_emp_pop', outcome)
+        basemodel_2=basemodel_1+' + '+' + '.join(bl2)
+        basemodel_3=basemodel_2+' + '+' + '.join(c)
+        for m, formula in enumerate([basemodel_1, basemodel_2, basemodel_3]):
+            fit=aregdf(formula,data=df4_1,absorb='fips',cluster='fips')
+            results['t5c{}'.format(n + m)]=eventstudy(fit, terms, -3, omitted=-1)
 
- 
     #it becomes stable after the shock
-   
     condition6=['ln_emp_pop','month','sample','year']
-    fdf=statadf('Data/Final-Sample2.dta', condition6)
+    fdf=statadf(location, condition6)
     fdf=fdf.query('sample==1')
     year,a=iindexer(data=fdf,key='year', custom='year', a=1970, b=2013, between=1)
     month,b=iindexer(data=fdf,key='month', custom='month', a=1, b=12, between=1)
     fdf =pd.concat([fdf,year,month], axis=1)
-    basemodel= 'ln_emp_pop ~ C(success_3_pre) + C(success_2_pre) + C(success_1_pre)+ C(success_0_post) + C(success_1_post) + C(success_2_post) + C(success_3_post) + C(success_4_post) + C(success_5_post) + C(pre_3) + C(pre_2) + C(pre_1) + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-    c1=aregdf(basemodel, data=fdf,absorb='fips',cluster='fips')
-
-    #slicing and subsetting the dataframe
-    c1= c1.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    c1= c1.iloc[1:10,]
-    c1['time']=range(-3, 6, 1)
-    
-    #
-    #modify basemodel from first section
-    bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
-    bl2=['C('+i+')' for i in bl2]
+    terms=['C(success_{}_pre)'.format(i) for i in [3, 2, 1]] + ['C(success_{}_post)'.format(i) for i in range(6)]
+    basemodel= 'ln_emp_pop ~ '+' + '.join(terms)+' + C(pre_3) + C(pre_2) + C(pre_1) + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
     basemodel_2=basemodel+' + '+' + '.join(bl2)
+    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
+    basemodel_3=basemodel_2+' + '+' + '.join(c)
 
+    #c4 is fitted on the employment outcome with all fixed effects, as in the original code
+    models=[basemodel, basemodel_2, basemodel_3, basemodel_3,
+            basemodel_2.replace('ln_emp_pop', 'ln_real_qp1_pop'), basemodel_3.replace('ln_emp_pop', 'ln_real_qp1_pop')]
+    for n, formula in enumerate(models):
+        fit=aregdf(formula,data=fdf,absorb='fips',cluster='fips')
+        results['c{}'.format(n + 1)]=eventstudy(fit, terms, -3)
 
-    c2=aregdf(basemodel_2,data=fdf,absorb='fips',cluster='fips')
-    c2=c2[['coeff', 'stderror', 'rsquaredadj']]
-    c2= c2.iloc[1:10,]
-    c2['time']=range(-3, 6, 1)
-    ###column 3
-    
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
+    return results
 
-    basemodel_3=basemodel_2+' + '+' + '.join(c)
 
-    c3=aregdf(basemodel_3,data=fdf,absorb='fips',cluster='fips')
-    c3=c3[['coeff', 'stderror', 'rsquaredadj']]
-    c3= c3.iloc[1:10,]
-    c3['time']=range(-3, 6, 1)
-    
+def fig_allsum_fin():    
     
-    ######
-    basemodel_4=basemodel.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c4=aregdf(basemodel_3,data=fdf,absorb='fips',cluster='fips')
-    c4= c4[['coeff', 'stderror', 'rsquaredadj']]
-    c4= c4.iloc[1:10,]
-    c4['time']=range(-3, 6, 1)
-    ######
-    basemodel_5=basemodel_2.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c5=aregdf(basemodel_5,data=fdf,absorb='fips',cluster='fips')
-    c5= c5[['coeff', 'stderror', 'rsquaredadj']]
-    c5= c5.iloc[1:10,]
-    c5['time']=range(-3, 6, 1)
-    #####
-    basemodel_6=basemodel_3.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c6=aregdf(basemodel_6,data=fdf,absorb='fips',cluster='fips')
-    c6= c6[['coeff', 'stderror', 'rsquaredadj']]
-    c6= c6.iloc[1:10,]
-    c6['time']=range(-3, 6, 1)
+    results=event_results(fig_allsum_results, 'Data/Final-Sample2.dta')
+    t5c1, t5c2, t5c3, t5c4, t5c5, t5c6=[results['t5c{}'.format(n)] for n in range(1, 7)]
+    c1, c2, c3, c4, c5, c6=[results['c{}'.format(n)] for n in range(1, 7)]
     
     
     ##plotting##
-    fig, axs = plt.subplots(2, 2)
+    fig, axs = subplots(2, 2)
     fig.set_size_inches(12, 8)
     fig.suptitle('Extension: Fixed Effect Inclusion (All Models)', fontsize=18)
     axs[0,0].plot('time', 'coeff', data=t5c1, label='Only County & Time FE')
@@ -2404,98 +3409,60 @@ def fig_1_fin(location):
     '''
     
     '''
-    df=pd.read_excel(location)
-    df=df.query('iyear<=2013&country==217&crit1==1&crit2==1&crit3==1')
-    dfs=df.query('success==1')
-    dff=df.query('success==0')
-
-    a=['iyear=='+str(i) for i in range(1970, 2014, 1)]
+    # only the US partitions up to 2013 are read, one count per year and outcome
+    df=load_partitioned(location, ['iyear', 'success'], where='crit1==1&crit2==1&crit3==1', country=217, iyear=(None, 2013))
     b=[i for i in range(1970, 2014, 1)]
-    amounts=[]
-    amountf=[]
-    for i in a:
-        amounts.append(len(dfs.query(i)))
-        amountf.append(len(dff.query(i)))
+    counts=df.groupby(['iyear', 'success']).size().unstack(fill_value=0).reindex(index=b, columns=[1, 0], fill_value=0)
+    amounts=counts[1].tolist()
+    amountf=counts[0].tolist()
     
     prep=[amounts, amountf, b]
     result=pd.DataFrame(prep)
 
-    plt.plot( result.iloc[2,:], result.iloc[0,:], markersize=12, color='red', linewidth=3, label='Point estimate')
-    plt.plot( result.iloc[2,:], result.iloc[1,:], markersize=12, color='blue', linewidth=3, label='Point estimate')
-    plt.hlines([50, 100, 150, 200, 250, 300, 350], xmin=1970, xmax=2013, linewidth=0.5, zorder=1)
-    plt.ylabel('Year Observations')
-    plt.xlabel('Year')
-    plt.title('Figure 1. Successful and Failed Attack',fontsize=16)
-    plt.legend(['Successful Attacks', 'Failed Attacks'])
+    fig, ax = subplots()
+    ax.plot( result.iloc[2,:], result.iloc[0,:], markersize=12, color='red', linewidth=3, label='Point estimate')
+    ax.plot( result.iloc[2,:], result.iloc[1,:], markersize=12, color='blue', linewidth=3, label='Point estimate')
+    ax.hlines([50, 100, 150, 200, 250, 300, 350], xmin=1970, xmax=2013, linewidth=0.5, zorder=1)
+    ax.set_ylabel('Year Observations')
+    ax.set_xlabel('Year')
+    ax.set_title('Figure 1. Successful and Failed Attack',fontsize=16)
+    ax.legend(['Successful Attacks', 'Failed Attacks'])
     
     return
 
+def fig_a4andall_results(location):
+    '''event study estimates of figure A4 and its extensions, all fixed effects'''
+
+    addition='+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
+    #one read of the columns of the four models, the samples are cut from it
+    events=['{}_{}_{}'.format(t, i, e) for t in ['pre', 'post'] for i in range(6) for e in ['success', 'fail']]
+    data=load_stata(location, used_columns(addition, events, ['ln_emp_pop', 'ln_real_qp1_pop', 'meventperyear', 'bon0', 'bon1', 'fips', 'year', 'month']))
+    df=data.dropna(subset = ['ln_emp_pop','year','month','bon1'])
+    condition4=['ln_emp_pop','month','bon0','year']
+    fdf4=data.dropna(subset=condition4)
+    #year, month and month*year effects are absorbed together with the county
+    fe=['fips', ('year', 'month')]
+
+    results={}
+    #a4, a4_1, a4_2 and a4_3; one year before is the omitted period
+    for name, outcome, e, sample in [('f3df', 'ln_emp_pop', 'success', df), ('f4df', 'ln_emp_pop', 'fail', fdf4),
+                                     ('f5df', 'ln_real_qp1_pop', 'success', df), ('f5df1', 'ln_real_qp1_pop', 'fail', df)]:
+        terms=['C(pre_3_{})'.format(e), 'C(pre_2_{})'.format(e)] + ['C(post_{}_{})'.format(i, e) for i in range(6)]
+        formula=outcome+' ~ '+' + '.join(terms)+' + meventperyear'+ addition
+        fit=aregdf(formula, data=sample, absorb=fe, cluster='fips')
+        results[name]=eventstudy(fit, terms, -3, omitted=-1)
+
+    return results
+
+
 def fig_a4andall_fin(location):
     ##a4####
     
-    df=pd.read_stata(location)
-    df=df.dropna(subset = ['ln_emp_pop','year','month','bon1'])
-    addition='+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    #call in custom function
-    year,a=iindexer(data=df,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df,key='month', custom='month', a=1, b=12, between=1)
-    c=[str(i)+'*'+str(j) for i in a for j in b]
-    df =pd.concat([df,year,month], axis=1)
-    f3f= 'ln_emp_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a+b+c)+ addition
-    f3df= aregdf(f3f, data=df , absorb='fips', cluster='fips')
-    f3df= f3df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f3df= f3df.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f3df= pd.concat([f3df.iloc[:2], line, f3df.iloc[2:]])
-    f3df['time']=range(-3,6,1)
-    #######a4_1##
-    condition4=['ln_emp_pop','month','bon0','year']
-    fdf4=statadf(location, condition4)
-    year,c=iindexer(data=fdf4, key='year', custom='year', a=1970, b=2013, between=1)
-    month,d=iindexer(data=fdf4, key='month', custom='month', a=1, b=12, between=1)
-    e=[str(i)+'*'+str(j) for i in c for j in d]
-    addition='+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    fdf4 =pd.concat([fdf4,year,month], axis=1)
-    f4f='ln_emp_pop ~ C(pre_3_fail) + C(pre_2_fail) + C(post_0_fail)+ C(post_1_fail) + C(post_2_fail) + C(post_3_fail) + C(post_4_fail) + C(post_5_fail) + meventperyear'+ ' + ' + ' + '.join(c+d+e)+ addition
-    f4df= aregdf(f4f, data=fdf4 , absorb='fips', cluster='fips')
-    f4df= f4df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f4df= f4df.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f4df= pd.concat([f4df.iloc[:2], line, f4df.iloc[2:]])
-    f4df['time']=range(-3,6,1)
-    ##a4_2##
-    df=pd.read_stata(location)
-    df=df.dropna(subset = ['ln_emp_pop','year','month','bon1'])
-    addition='+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    year,a=iindexer(data=df,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df,key='month', custom='month', a=1, b=12, between=1)
-    c=[str(i)+'*'+str(j) for i in a for j in b]
-    df =pd.concat([df,year,month], axis=1)
-    basemodel_2='ln_real_qp1_pop ~  C(pre_3_success) +C(pre_2_success) + C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a+b+c)+ addition
-    f5df=aregdf(basemodel_2,data=df,absorb='fips',cluster='fips')
-    f5df= f5df.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f5df= f5df.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f5df= pd.concat([f5df.iloc[:2], line, f5df.iloc[2:]])
-    f5df['time']=range(-3,6,1)
-    ###a4_3####
-    df=pd.read_stata(location)
-    df=df.dropna(subset = ['ln_emp_pop','year','month','bon1'])
-    addition='+ C(non_us_t) + C(int_l) + C(aa_assass) + C(aa_armed) + C(aa_bomb) + C(aa_facility) + C(ww_firearm) + C(ww_explo) + C(ww_incend)'
-    year,a=iindexer(data=df,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df,key='month', custom='month', a=1, b=12, between=1)
-    c=[str(i)+'*'+str(j) for i in a for j in b]
-    df =pd.concat([df,year,month], axis=1)
-    basemodel_2='ln_real_qp1_pop ~  C(pre_3_fail) +C(pre_2_fail) + C(post_0_fail) + C(post_1_fail) + C(post_2_fail) + C(post_3_fail) + C(post_4_fail) + C(post_5_fail)+ meventperyear'+ ' + ' + ' + '.join(a+b+c)+addition
-    f5df1=aregdf(basemodel_2,data=df,absorb='fips',cluster='fips')
-    f5df1= f5df1.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    f5df1= f5df1.iloc[1:9,:]
-    line= pd.DataFrame({'coeff': 0, 'conf_lower': 0, 'conf_higher': 0},index=['C(pre_1_success)'])
-    f5df1= pd.concat([f5df1.iloc[:2], line, f5df1.iloc[2:]])
-    f5df1['time']=range(-3,6,1)
+    results=event_results(fig_a4andall_results, location)
+    f3df, f4df, f5df, f5df1=[results[name] for name in ['f3df', 'f4df', 'f5df', 'f5df1']]
     
     ###ploting
-    fig, axs = plt.subplots(2, 2)
+    fig, axs = subplots(2, 2)
     fig.set_size_inches(11, 6)
     axs[0,0].plot( 'time', 'coeff', data=f3df, markersize=12, color='red', linewidth=3, label='Point estimate')
     axs[0,0].plot( 'time', 'conf_lower', data=f3df, marker='', color='blue', linewidth=2, linestyle='dashed', label='Robust 95% confidence Intervel')
@@ -2562,170 +3529,64 @@ def fig_a4andall_fin(location):
 ##### for chapter extension########
 ###################################
 
-def extend_fig2_fin():    
-    df4=pd.read_stata('Data/Final-Sample2.dta')
-    df4=df4.dropna(subset = ['ln_emp_pop','year','month','bon1'])
+def extend_fig2_results(location='Data/Final-Sample2.dta'):
+    '''event study estimates of the post-attack extension, basic (t5c) and comparison (c) model'''
 
-    ###column 1
-    #subset the needed ones
-    df4_1=df4[['emp','fips','ln_emp_pop','year','month','post_5_success','post_4_success','post_3_success','post_2_success','post_1_success','post_0_success','meventperyear']]
+    df4_1=statadf(location, ['ln_emp_pop','year','month','bon1'])
 
     #call in custom function
     year,a=iindexer(data=df4_1,key='year', custom='year', a=1970, b=2013, between=1)
     month,b=iindexer(data=df4_1,key='month', custom='month', a=1, b=12, between=1)
     df4_1 =pd.concat([df4_1,year,month], axis=1)
 
-    #define basemodel
-    basemodel='ln_emp_pop ~ C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-
-    #implement the areg function
-    t5c1=aregdf(basemodel,data=df4_1,absorb='fips',cluster='fips')
-    t5c1=t5c1[['coeff', 'pvals']]
-    t5c1=t5c1.iloc[1:7,:]
-    pvalues= t5c1.iloc[:,1]
-    
-    temp=df4[['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']]
-
-    df4_2 =pd.concat([df4_1,temp], axis=1)
-
-    #modify basemodel from first section
+    #the basic model, only the periods after the attack
+    terms=['C(post_{}_success)'.format(i) for i in range(6)]
+    basemodel='ln_emp_pop ~ '+' + '.join(terms)+' + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
     bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
     bl2=['C('+i+')' for i in bl2]
-    basemodel_2=basemodel+' + '+' + '.join(bl2)
-
-
-    t5c2=aregdf(basemodel_2,data=df4_2,absorb='fips',cluster='fips')
-    t5c2=t5c2[['coeff', 'stderror', 'rsquaredadj']]
-    t5c2=t5c2.iloc[1:7,:]
-    ###column 3
-    
     c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
 
-    basemodel_3=basemodel_2+' + '+' + '.join(c)
-
-    t5c3=aregdf(basemodel_3,data=df4_2,absorb='fips',cluster='fips')
-    t5c3=t5c3[['coeff', 'stderror', 'rsquaredadj']]
-    t5c3=t5c3.iloc[1:7,:]
-    ###column 4
-    df4_3=df4[['real_qp1','fips','ln_real_qp1_pop','year','month','post_5_success','post_4_success','post_3_success','post_2_success','post_1_success','post_0_success','meventperyear']]
+    results={}
+    for n, outcome in [(1, 'ln_emp_pop'), (4, 'ln_real_qp1_pop')]:
+        basemodel_1=basemodel.replace('ln_emp_pop', outcome)
+        basemodel_2=basemodel_1+' + '+' + '.join(bl2)
+        basemodel_3=basemodel_2+' + '+' + '.join(c)
+        for m, formula in enumerate([basemodel_1, basemodel_2, basemodel_3]):
+            fit=aregdf(formula,data=df4_1,absorb='fips',cluster='fips')
+            results['t5c{}'.format(n + m)]=eventstudy(fit, terms, 0)
 
-    #call in custom function
-    year,a=iindexer(data=df4_1,key='year', custom='year', a=1970, b=2013, between=1)
-    month,b=iindexer(data=df4_1,key='month', custom='month', a=1, b=12, between=1)
-    df4_3 =pd.concat([df4_3,year,month], axis=1)
- 
-    #define basemodel
-    basemodel_2='ln_real_qp1_pop ~ C(post_0_success) + C(post_1_success) + C(post_2_success) + C(post_3_success) + C(post_4_success) + C(post_5_success)+ meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-
-    #implement the areg function
-    t5c4=aregdf(basemodel_2,data=df4_3,absorb='fips',cluster='fips')
-    t5c4=t5c4[['coeff', 'stderror', 'rsquaredadj']]
-    t5c4=t5c4.iloc[1:7,:]
-    
-    ###column 5
-    #add the additional columns
-    temp=df4[['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']]
-
-    df4_4 =pd.concat([df4_3,temp], axis=1)
-    
-      
-    
-    #modify basemodel from first section
-    bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
-    bl2=['C('+i+')' for i in bl2]
-    basemodel_3=basemodel_2+' + '+' + '.join(bl2)
-    
-
-    t5c5=aregdf(basemodel_3,data=df4_4,absorb='fips',cluster='fips')
-    t5c5=t5c5[['coeff', 'stderror', 'rsquaredadj']]
-    t5c5=t5c5.iloc[1:7,:]
-    
-    ##column 6
-    
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
-
-    basemodel_4=basemodel_3+' + '+' + '.join(c)
-
-    t5c6=aregdf(basemodel_4,data=df4_4,absorb='fips',cluster='fips')
-    t5c6=t5c6[['coeff', 'stderror', 'rsquaredadj']]
-    t5c6=t5c6.iloc[1:7,:]
-
-     #plotting prepartion
-    X=[]
-    Y=[]
-    Z=[]
-    A=[]
-    B=[]
-    C=[]
-    for i in range(0, 6, 1):
-        X.append(t5c1.iloc[i, 0])
-        Y.append(t5c2.iloc[i, 0] )
-        Z.append(t5c3.iloc[i, 0] )
-        A.append(t5c4.iloc[i, 0] )
-        B.append(t5c5.iloc[i, 0] )
-        C.append(t5c6.iloc[i, 0])
     #it becomes stable after the shock
-   
     condition6=['ln_emp_pop','month','sample','year']
-    fdf=statadf('Data/Final-Sample2.dta', condition6)
+    fdf=statadf(location, condition6)
     year,a=iindexer(data=fdf,key='year', custom='year', a=1970, b=2013, between=1)
     month,b=iindexer(data=fdf,key='month', custom='month', a=1, b=12, between=1)
     fdf =pd.concat([fdf,year,month], axis=1)
-    basemodel= 'ln_emp_pop ~  C(success_0_post) + C(success_1_post) + C(success_2_post) + C(success_3_post) + C(success_4_post) + C(success_5_post) + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
-    c1=aregdf(basemodel, data=fdf,absorb='fips',cluster='fips')
-
-    #slicing and subsetting the dataframe
-    c1= c1.loc[:,['coeff', 'conf_lower', 'conf_higher']]
-    c1= c1.iloc[1:7,]
-    c1['time']=range(0, 6, 1)
-    
-    #
-    #modify basemodel from first section
-    bl2=['non_us_t','int_l','aa_assass','aa_armed','aa_bomb','aa_facility','ww_firearm','ww_explo','ww_incend']
-    bl2=['C('+i+')' for i in bl2]
+    terms=['C(success_{}_post)'.format(i) for i in range(6)]
+    basemodel= 'ln_emp_pop ~  '+' + '.join(terms)+' + C(post_0) + C(post_1) + C(post_2) + C(post_3) + C(post_4) +  C(post_5) + meventperyear'+ ' + ' + ' + '.join(a)+' + '+' + '.join(b)
     basemodel_2=basemodel+' + '+' + '.join(bl2)
+    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
+    basemodel_3=basemodel_2+' + '+' + '.join(c)
 
+    #c4 is fitted on the employment outcome with all fixed effects, as in the original code
+    models=[basemodel, basemodel_2, basemodel_3, basemodel_3,
+            basemodel_2.replace('ln_emp_pop', 'ln_real_qp1_pop'), basemodel_3.replace('ln_emp_pop', 'ln_real_qp1_pop')]
+    for n, formula in enumerate(models):
+        fit=aregdf(formula,data=fdf,absorb='fips',cluster='fips')
+        results['c{}'.format(n + 1)]=eventstudy(fit, terms, 0)
 
-    c2=aregdf(basemodel_2,data=fdf,absorb='fips',cluster='fips')
-    c2=c2[['coeff', 'stderror', 'rsquaredadj']]
-    c2= c2.iloc[1:7,]
-    c2['time']=range(0, 6, 1)
-    ###column 3
-    
-    c=['C('+str(j)+')'+'*'+'C('+str(i)+')'  for i in year for j in month]
+    return results
 
-    basemodel_3=basemodel_2+' + '+' + '.join(c)
 
-    c3=aregdf(basemodel_3,data=fdf,absorb='fips',cluster='fips')
-    c3=c3[['coeff', 'stderror', 'rsquaredadj']]
-    c3= c3.iloc[1:7,]
-    c3['time']=range(0, 6, 1)
-    
-    
-    ######
-    basemodel_4=basemodel.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c4=aregdf(basemodel_3,data=fdf,absorb='fips',cluster='fips')
-    c4= c4[['coeff', 'stderror', 'rsquaredadj']]
-    c4= c4.iloc[1:7,]
-    c4['time']=range(0, 6, 1)
-    ######
-    basemodel_5=basemodel_2.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c5=aregdf(basemodel_5,data=fdf,absorb='fips',cluster='fips')
-    c5= c5[['coeff', 'stderror', 'rsquaredadj']]
-    c5= c5.iloc[1:7,]
-    c5['time']=range(0, 6, 1)
-    #####
-    basemodel_6=basemodel_3.replace('ln_emp_pop', 'ln_real_qp1_pop')
-    c6=aregdf(basemodel_6,data=fdf,absorb='fips',cluster='fips')
-    c6= c6[['coeff', 'stderror', 'rsquaredadj']]
-    c6= c6.iloc[1:7,]
-    c6['time']=range(0, 6, 1)
+def extend_fig2_fin():    
 
+    results=event_results(extend_fig2_results, 'Data/Final-Sample2.dta')
+    c1, c2, c3, c4, c5, c6=[results['c{}'.format(n)] for n in range(1, 7)]
 
+    #plotting prepartion
+    X, Y, Z, A, B, C=[list(results['t5c{}'.format(n)]['coeff']) for n in range(1, 7)]
 
 
-    
-    fig, (ax1, ax2) = plt.subplots(1, 2)
+    fig, (ax1, ax2) = subplots(1, 2)
     fig.suptitle('Extension: Post-Attack Analysis', fontsize=17)
     ax1.plot(X, label='Only County & Time FE')
     ax1.plot(Y, label='County, Weapon, Tactics, and Time FE')
@@ -2744,16 +3605,16 @@ def extend_fig2_fin():
     ax2.spines['right'].set_visible(False)
     ax2.spines['top'].set_visible(False)
     ax2.spines['bottom'].set_position(('data', 0))
-    plt.subplots_adjust(wspace=0.5, hspace=0.5)
+    fig.subplots_adjust(wspace=0.5, hspace=0.5)
     ax1.set_ylabel('100*ln(employment/population)')
     ax2.set_ylabel('100*ln(total earning/population)')
     ax1.text(0.5,-0.1, 'Basic Model (A)', size=12, ha="center", transform=ax1.transAxes)
     ax1.text(0.5,-0.1, 'Basic Model (B)', size=12, ha="center", transform=ax2.transAxes)
     legend = ax2.legend(  title="legend", fontsize='small', bbox_to_anchor=(1.05, 1), loc='upper left', borderaxespad=0.)
-    plt.show()
+    show()
     
     
-    fig, (ax3, ax4) = plt.subplots(1, 2)
+    fig, (ax3, ax4) = subplots(1, 2)
     
 
     ax3.plot('time', 'coeff', data=c1, label='Only County & Time FE')
@@ -2782,30 +3643,370 @@ def extend_fig2_fin():
     ax4.text(0.5,-0.1, 'Comparision Model (B)', size=12, ha="center", transform=ax2.transAxes)
     ax3.set_ylabel('100*ln(employment/population)', rotation=90)
     ax4.set_ylabel('100*ln(total earning/population)')
-    plt.subplots_adjust(wspace=0.5, hspace=0.5)
-    plt.show()
+    fig.subplots_adjust(wspace=0.5, hspace=0.5)
+    show()
     return
 
 
 
+###aggregate cubes: the sums and counts of a few columns in the cells of year (or of year and
+###division, ...), kept in memory and on disk. a cube asked for a column it lacks aggregates
+###only that column, rows added to a panel are folded in by cube_update
+CUBE_CACHE = {'path': os.path.join('Data', '.cubes'), 'entries': {}}
+
+
+def cube_cache(path=None, clear=False):
+    '''sets the folder the cubes are kept in, clear drops the ones in memory and on
+    disk. returns the folder and the cached keys'''
+
+    if path is not None:
+        CUBE_CACHE['path'] = path
+    if clear:
+        CUBE_CACHE['entries'].clear()
+        if os.path.isdir(CUBE_CACHE['path']):
+            for name in os.listdir(CUBE_CACHE['path']):
+                os.remove(os.path.join(CUBE_CACHE['path'], name))
+
+    return {'path': CUBE_CACHE['path'], 'entries': list(CUBE_CACHE['entries'])}
+
+
+@contextmanager
+def file_lock(path):
+    '''holds an exclusive lock on the file path across processes for the block,
+    released by the system if the process dies (no lock without fcntl)'''
+
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def cube_cells(data, columns, by, fill=None):
+    '''the sum and the count of the non missing values of columns in every cell of by,
+    columns (column, 'sum') and (column, 'count'). fill replaces missing values first'''
+
+    values = data[list(columns)]
+    if fill is not None:
+        values = values.fillna(fill)
+    with stage('cube_cells', rows=len(data), cols=len(columns)):
+        return values.groupby([data[key] for key in by]).agg(['sum', 'count'])
+
+
+def cube_update(cube, data, fill=None):
+    '''cube with the rows of data added to its cells'''
+
+    columns = list(dict.fromkeys(cube.columns.get_level_values(0)))
+    return cube.add(cube_cells(data, columns, list(cube.index.names), fill), fill_value=0)
+
+
+def aggregate_cube(location, columns, by=('year',), where=None, dropna=(), fill=None, **ranges):
+    '''the cube of columns by the columns by for the rows of location (a stata file, or
+    the partitioned store of another file with ranges as in load_partitioned) that
+    have no missing value in dropna and are kept by the query where. the key is the
+    content of the file and the arguments, a kept cube gains the columns it lacks'''
+
+    by, dropna = list(by), list(dropna)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((by, where, dropna, fill, sorted(ranges.items()))).encode())
+    h.update(file_hash(location).encode())
+    key = h.hexdigest()
+    stem = os.path.splitext(os.path.basename(location))[0]
+    file = os.path.join(CUBE_CACHE['path'], stem + '-' + key + '.pkl')
+
+    entries = CUBE_CACHE['entries']
+    if key not in entries and os.path.exists(file):
+        with open(file, 'rb') as f:
+            entries[key] = pickle.load(f)
+    kept = entries.get(key)
+    missing = [col for col in columns if kept is None or col not in kept.columns.get_level_values(0)]
+
+    if missing:
+        needed = by + missing + dropna + ([] if where is None else used_columns(where))
+        if location.endswith('.dta'):
+            data = load_stata(location, needed)
+            data = data.dropna(subset=by + dropna)
+            if where is not None:
+                data = data.query(where)
+        else:
+            data = load_partitioned(location, needed, where, **ranges).dropna(subset=by + dropna)
+        cells = cube_cells(data, missing, by, fill)
+
+        # workers adding other columns to the same cube meanwhile are merged in, the
+        # file is read and replaced under a lock and readers never see a partial one
+        with file_lock(file + '.lock'):
+            cube = None
+            if os.path.exists(file):
+                with open(file, 'rb') as f:
+                    cube = pickle.load(f)
+            for part in [kept, cells]:
+                if part is None:
+                    continue
+                if cube is None:
+                    cube = part
+                    continue
+                new = [col for col in dict.fromkeys(part.columns.get_level_values(0))
+                       if col not in cube.columns.get_level_values(0)]
+                if new:
+                    cube = cube.join(part[new], how='outer')
+            pickle_replace(cube, file)
+        entries[key] = cube
+
+    return entries[key][[(col, stat) for col in columns for stat in ('sum', 'count')]]
+
+
+def cube_means(cube, by=None):
+    '''the means of the columns of cube in its cells, or in the cells of by (some of
+    the columns of the cube, year of a year and division cube)'''
+
+    if by is not None:
+        cube = cube.groupby(level=by).sum()
+    return cube.xs('sum', axis=1, level=1) / cube.xs('count', axis=1, level=1)
+
+
+###Zivot-Andrews tests of many series at once: the series of a length and lag order are a
+###batch that shares the deterministic design (constant, trend and break terms) of every
+###break date, only the cross products with the lagged levels and differences of the
+###series are their own. the statistics are the ones of arch.unitroot.ZivotAndrews
+def za_terms(m, lags, bp, trend):
+    '''the deterministic columns of the Zivot-Andrews regression of m rows with a break
+    at observation bp, scaled as arch scales them. column j is a + b * r in the rows
+    r >= start and zero before, returns the list of (a, b, start)'''
+
+    nobs = m + lags + 1
+    c = 1 / np.sqrt(nobs)
+    s = np.sqrt(3) / nobs ** 1.5
+    cutoff = bp - (lags + 1)
+    # the trend of row r is (lags + 3 + r) * s, a broken trend restarts at 2 * s
+    if trend == 't':
+        return [(c, 0., 0), ((lags + 3) * s, s, 0), ((2 - cutoff) * s, s, cutoff - 1)]
+    terms = [(c, 0., 0), (c, 0., cutoff), ((lags + 3) * s, s, 0)]
+    if trend == 'ct':
+        terms.append(((2 - cutoff) * s, s, cutoff))
+
+    return terms
+
+
+def za_batch(task):
+    '''the Zivot-Andrews statistics of every break date for a batch of series of the
+    same length and lag order, task is (Y, lags, trend, trim) with a series per row
+    of Y. returns the statistics, a row per series and a column per observation'''
+
+    Y, lags, trend, trim = task
+    S, nobs = Y.shape
+    dy = np.diff(Y, axis=1)
+    dy = dy / np.sqrt((dy ** 2).sum(axis=1, keepdims=True))
+    Y = Y / np.sqrt((Y ** 2).sum(axis=1, keepdims=True))
+    m = nobs - 1 - lags
+    q = 1 + lags
+
+    # the series part of the design: the lagged level and the lagged differences, and
+    # the outcome, with the sums of W and r * W over the rows from r on for every r
+    W = np.empty((S, m, q + 1))
+    W[:, :, 0] = Y[:, lags:nobs - 1]
+    for j in range(lags):
+        W[:, :, 1 + j] = dy[:, lags - 1 - j:lags - 1 - j + m]
+    W[:, :, q] = dy[:, lags:]
+    WW = np.einsum('smi,smj->sij', W, W)
+    r = np.arange(m, dtype=float)
+    P0 = np.zeros((S, m + 1, q + 1))
+    P1 = np.zeros((S, m + 1, q + 1))
+    P0[:, :m] = np.cumsum(W[:, ::-1], axis=1)[:, ::-1]
+    P1[:, :m] = np.cumsum((W * r[:, None])[:, ::-1], axis=1)[:, ::-1]
+
+    tstats = np.full((S, nobs), np.inf)
+    trimcnt = int(nobs * trim)
+    with stage('za_batch', series=S, rows=nobs, lags=lags):
+        full = None
+        for bp in range(trimcnt + 1, nobs - trimcnt + 1):
+            terms = za_terms(m, lags, bp, trend)
+            D = np.column_stack([(a + b * r) * (r >= start) for a, b, start in terms])
+            # the cross products of the break terms with the series from the sums
+            DW = np.stack([a * P0[:, start] + b * P1[:, start] for a, b, start in terms], axis=1)
+            k = len(terms) + q
+            XX = np.empty((S, k, k))
+            XX[:, :len(terms), :len(terms)] = D.T @ D
+            XX[:, :len(terms), len(terms):] = DW[:, :, :q]
+            XX[:, len(terms):, :len(terms)] = DW[:, :, :q].transpose(0, 2, 1)
+            XX[:, len(terms):, len(terms):] = WW[:, :q, :q]
+            Xe = np.concatenate([DW[:, :, q], WW[:, :q, q]], axis=1)
+            if full is None:
+                # like arch, a design short of full rank at the first break date rules a series out
+                X = np.concatenate([np.broadcast_to(D, (S,) + D.shape), W[:, :, :q]], axis=2)
+                full = np.linalg.matrix_rank(X) == k
+            XX[~full] = np.eye(k)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                inv = np.linalg.inv(XX)
+                beta = np.einsum('sij,sj->si', inv, Xe)
+                sigma2 = (WW[:, q, q] - (beta * Xe).sum(axis=1)) / (m - k)
+                tstats[:, bp] = beta[:, len(terms)] / np.sqrt(sigma2 * inv[:, len(terms), len(terms)])
+    tstats[~full] = np.nan
+
+    return tstats
+
+
+def adf_lags(Y, max_lags=None, method='aic'):
+    '''the lag order an ADF with constant and trend picks by method (aic or bic) for
+    every row of Y, as arch.unitroot.ADF picks it: all orders up to max_lags are fitted
+    on the same sample. returns the lags, -1 where the regression is singular'''
+
+    S, nobs = Y.shape
+    if max_lags is None:
+        max_lags = int(np.ceil(12. * (nobs / 100.) ** 0.25))
+        max_lags = max(min(max_lags, max((nobs - 1) // 2 - 1, 0) - 2), 0)
+    dy = np.diff(Y, axis=1)
+    m = nobs - 1 - max_lags
+
+    # constant, trend, level and the lagged differences, every column scaled to unit length
+    X = np.empty((S, m, 3 + max_lags))
+    X[:, :, 0] = 1.
+    X[:, :, 1] = np.arange(1., m + 1)
+    X[:, :, 2] = Y[:, nobs - m - 1:nobs - 1]
+    for j in range(max_lags):
+        X[:, :, 3 + j] = dy[:, max_lags - 1 - j:max_lags - 1 - j + m]
+    e = dy[:, -m:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        X = X / np.sqrt((X ** 2).sum(axis=1, keepdims=True))
+    full = np.isfinite(X).all(axis=(1, 2))
+    X[~full] = 0.
+    full &= np.linalg.matrix_rank(X) == X.shape[2]
+    X[~full] = np.eye(m, X.shape[2])
+
+    XX = np.einsum('smi,smj->sij', X, X)
+    Xe = np.einsum('smi,sm->si', X, e)
+    ee = (e ** 2).sum(axis=1)
+    sigma2 = np.empty((S, max_lags + 1))
+    for p in range(max_lags + 1):
+        k = 3 + p
+        b = np.linalg.solve(XX[:, :k, :k], Xe[:, :k, None])[:, :, 0]
+        sigma2[:, p] = (ee - (b * Xe[:, :k]).sum(axis=1)) / m
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        llf = -m / 2. * (np.log(2 * np.pi) + np.log(sigma2) + 1)
+    penalty = 2. if method == 'aic' else np.log(m)
+    lags = np.argmin(-2 * llf + penalty * np.arange(max_lags + 1.), axis=1)
+
+    return np.where(full, lags, -1)
+
+
+def zivot_andrews(series, lags=None, trend='c', trim=0.15, max_lags=None, method='aic', jobs=None, batch=512):
+    '''Zivot-Andrews tests of every column of the frame series (one row per period) as
+    arch.unitroot.ZivotAndrews runs them, the lags of a series are chosen by an ADF
+    with trend unless given. the batches run on jobs processes (one by default).
+    returns a frame with a row per column of series: the periods, the lags, the
+    statistic, its p-value and critical values and the break, the period the
+    break dummy starts in. a series that cannot be tested has the reason in error'''
+
+    from arch.unitroot.critical_values.zivot_andrews import za_critical_values
+    table = za_critical_values[trend]
+
+    rows, lengths = {}, {}
+    for name, column in series.items():
+        y = column.dropna()
+        row = {'nobs': len(y), 'lags': np.nan, 'stat': np.nan, 'pvalue': np.nan, '1%': np.nan, '5%': np.nan,
+               '10%': np.nan, 'break': np.nan, 'error': None}
+        rows[name] = row
+        if len(y) and series.index.get_loc(y.index[-1]) - series.index.get_loc(y.index[0]) + 1 != len(y):
+            row['error'] = 'missing periods inside the series'
+        elif len(y) < 8:
+            # the lag selection needs more observations than its three columns
+            row['error'] = 'too few observations'
+        else:
+            lengths.setdefault(len(y), []).append((name, y))
+
+    # the lags are picked for all series of a length at once, t-stat picks them one by one
+    groups = {}
+    with stage('adf_lags', series=sum(len(members) for members in lengths.values())):
+        for nobs, members in lengths.items():
+            Y = np.array([y.values for _, y in members], dtype=float)
+            if lags is not None:
+                chosen = np.full(len(members), lags)
+            elif method == 't-stat':
+                chosen = []
+                for y in Y:
+                    try:
+                        chosen.append(unitroot.ADF(y, max_lags=max_lags, trend='ct', method=method).lags)
+                    except Exception:
+                        chosen.append(-1)
+            else:
+                chosen = adf_lags(Y, max_lags, method)
+            for (name, y), p in zip(members, chosen):
+                row = rows[name]
+                # rows of the regression beyond its columns, and a first break date after the lags
+                if p < 0:
+                    row['error'] = 'the lag selection regression is singular'
+                elif nobs - 2 * p - (6 if trend == 'ct' else 5) <= 0 or int(nobs * trim) - p <= 0:
+                    row['error'] = 'too few observations for {} lags'.format(p)
+                else:
+                    row['lags'] = int(p)
+                    groups.setdefault((nobs, int(p)), []).append((name, y))
+
+    tasks, names = [], []
+    for (nobs, p), members in groups.items():
+        for first in range(0, len(members), batch):
+            chunk = members[first:first + batch]
+            tasks.append((np.array([y.values for _, y in chunk], dtype=float), p, trend, trim))
+            names.append([(name, y.index) for name, y in chunk])
+
+    # a worker of a pool (a pipeline node) cannot start one, it runs the batches itself
+    if (jobs or 1) > 1 and len(tasks) > 1 and not mp.current_process().daemon:
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+        with ctx.Pool(min(jobs, len(tasks))) as pool:
+            done = pool.map(za_batch, tasks, chunksize=1)
+    else:
+        done = [za_batch(task) for task in tasks]
+
+    for chunk, stat in zip(names, done):
+        for (name, index), row_stats in zip(chunk, stat):
+            row = rows[name]
+            if not np.isfinite(row_stats).any() or np.isnan(row_stats).any():
+                row['error'] = 'the regressor matrix is singular'
+                continue
+            bp = int(np.argmin(row_stats))
+            row['stat'] = row_stats[bp]
+            row['pvalue'] = float(np.interp(row['stat'], table[:, 1], table[:, 0])) / 100.
+            row['1%'], row['5%'], row['10%'] = np.interp([1., 5., 10.], table[:, 0], table[:, 1])
+            row['break'] = index[bp]
+
+    result = pd.DataFrame.from_dict(rows, orient='index')
+    result.index.name = series.columns.name
+    return result
+
+
+def za_panel(location, column='ln_real_qp1_pop', units=('fips', 'div_9_all'), jobs=None, **kwargs):
+    '''zivot_andrews of the yearly means of column in every unit (county, division) of
+    the panel in location, from the cubes of the year and the unit. returns a frame
+    indexed by the unit column and the unit'''
+
+    results = []
+    for unit in units:
+        means = cube_means(aggregate_cube(location, [column], by=['year', unit], dropna=['month', 'emp']))
+        series = means[column].unstack(unit) / 100
+        results.append(zivot_andrews(series, jobs=jobs, **kwargs))
+
+    return pd.concat(results, keys=list(units), names=['unit', 'series'])
+
+
 def extend_fig1_fin(location):
     
-    df= pd.read_stata(location)
-    df= df.dropna(subset=['month','year','emp'])
-    df= df.sort_values(by=['year'], ascending= True)
-    df2= df.query('post_0_success==1')
-    df3= pd.read_excel('Data/globalterrorismdb_0919dist.xlsx')
-    df3= df3.query('iyear<=2013&country==217&crit1==1&crit2==1&crit3==1').fillna(0)
-    df3['total']= df3['nkill']+df3['nwound']
-
-    ####with and without attack
-    df= df.groupby(['year']).mean()
+    ####with and without attack, yearly means from the cubes
+    df= cube_means(aggregate_cube(location, ['ln_real_qp1_pop'], dropna=['month','emp']))
     df['ln_real_qp1_pop']=df['ln_real_qp1_pop']/100
-    df2= df2.groupby(['year']).mean()
+    df2= cube_means(aggregate_cube(location, ['ln_real_qp1_pop'], where='post_0_success==1', dropna=['month','emp']))
     df2['ln_real_qp1_pop']=df2['ln_real_qp1_pop']/100
-    df3= df3.groupby(['iyear']).mean()
+    # missing casualties count as none
+    df3= cube_means(aggregate_cube('Data/globalterrorismdb_0919dist.xlsx', ['nkill', 'nwound'], by=['iyear'],
+                                   where='crit1==1&crit2==1&crit3==1', fill=0, country=217, iyear=(None, 2013)))
+    df3['total']= df3['nkill']+df3['nwound']
 
-    fig, ax1 = plt.subplots()
+    fig, ax1 = subplots()
 
     color = 'blue'
     ax1.set_xlabel('Year (s)')
@@ -2824,28 +4025,24 @@ def extend_fig1_fin(location):
 
     fig.tight_layout()  # otherwise the right y-label is slightly clipped
     handles, labels = [(a + b) for a, b in zip(ax1.get_legend_handles_labels(), ax2.get_legend_handles_labels())]
-    legend = plt.legend(handles, labels, title="legend", loc=0, fontsize='small', fancybox=True)
-    plt.gca().set_title('Extension: Economics Outputs to Attack Intensity')
-    plt.show()
+    legend = ax2.legend(handles, labels, title="legend", loc=0, fontsize='small', fancybox=True)
+    ax2.set_title('Extension: Economics Outputs to Attack Intensity')
+    show()
     
     return
 
 def extend_za(location):
     
-    df= pd.read_stata(location)
-    df= df.dropna(subset=['month','year','emp'])
-    df= df.sort_values(by=['year'], ascending= True)
-    df2= df.query('post_0_success==1')
-
-    ####with and without attack
-    df= df.groupby(['year']).mean()
+    ####with and without attack, the cubes of extend_fig1_fin
+    df= cube_means(aggregate_cube(location, ['ln_real_qp1_pop'], dropna=['month','emp']))
     df['ln_real_qp1_pop']=df['ln_real_qp1_pop']/100
-    df2= df2.groupby(['year']).mean()
+    df2= cube_means(aggregate_cube(location, ['ln_real_qp1_pop'], where='post_0_success==1', dropna=['month','emp']))
     df2['ln_real_qp1_pop']=df2['ln_real_qp1_pop']/100
 
-    za = ZivotAndrews(df['ln_real_qp1_pop'])
-    za2 = ZivotAndrews(df2['ln_real_qp1_pop'])
-    print(za.summary().as_text())
-    print(za2.summary().as_text())
+    ####nationwide, then every county and division, as a frame of statistics and break years
+    national= pd.concat([zivot_andrews(df[['ln_real_qp1_pop']].set_axis(['all'], axis=1)),
+                         zivot_andrews(df2[['ln_real_qp1_pop']].set_axis(['post attack'], axis=1))])
+    local= za_panel(location, 'ln_real_qp1_pop', units=('fips', 'div_9_all'), jobs=os.cpu_count())
+    result= pd.concat([pd.concat([national], keys=['national'], names=['unit', 'series']), local])
     
-    return
\ No newline at end of file
+    return result
\ No newline at end of file
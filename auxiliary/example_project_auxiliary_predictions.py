@@ -1,14 +1,13 @@
 """This module contains auxiliary functions for RD predictions used in the main notebook."""
 import json
 
-import matplotlib as plt
 import pandas as pd
 import numpy as np
-import statsmodels as sm
 
-from auxiliary.example_project_auxiliary_predictions import *
-from auxiliary.example_project_auxiliary_plots import *
-from auxiliary.example_project_auxiliary_tables import *
+from auxiliary.lazy import lazy
+from auxiliary.example_project_auxiliary_tables import estimate_RDD_multiple_datasets
+
+lazy(globals(), sm='statsmodels.api')
 
 def prepare_data(data):
     """
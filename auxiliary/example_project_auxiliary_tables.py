@@ -2,14 +2,12 @@
 
 import json
 
-import matplotlib as plt
 import pandas as pd
 import numpy as np
-import statsmodels as sm
 
-from auxiliary.example_project_auxiliary_predictions import *
-from auxiliary.example_project_auxiliary_plots import *
-from auxiliary.example_project_auxiliary_tables import *
+from auxiliary.lazy import lazy
+
+lazy(globals(), sm='statsmodels.api')
 
 
 def color_pvalues(value):
@@ -0,0 +1,36 @@
+"""This module defers the import of heavy dependencies to their first use.
+
+statsmodels, scipy.stats, matplotlib.pyplot and arch take seconds to import.
+A module binds them with lazy(globals(), sm='statsmodels.api', ...) instead of
+importing them; the first attribute looked up on a name imports the module and
+puts it in place of the stand-in, so only the code paths that use a dependency
+pay for it and later uses cost nothing.
+"""
+import importlib
+
+
+class LazyModule:
+    '''stands in for the module name, bound to alias in namespace'''
+
+    def __init__(self, namespace, alias, name):
+        self.namespace = namespace
+        self.alias = alias
+        self.name = name
+
+    def __getattr__(self, attr):
+        # the import lock makes a first use from several threads safe
+        module = importlib.import_module(self.name)
+        if self.namespace.get(self.alias) is self:
+            self.namespace[self.alias] = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return "<lazy module '{}'>".format(self.name)
+
+
+def lazy(namespace, **modules):
+    '''binds every alias=module name in namespace (the globals() of a module) to a
+    stand-in that imports the module on first use'''
+
+    for alias, name in modules.items():
+        namespace[alias] = LazyModule(namespace, alias, name)
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+"""This module rebuilds the tables and figures of the notebook as a pipeline.
+
+Every task of run_all is a node of a graph over its inputs: the data files it
+reads (its arguments and the Data/ paths in its code) and the functions of
+auxiliary_func it reaches. A node is stale when the fingerprint of these inputs
+differs from the one of its last successful run, or when its outputs are gone.
+Only stale nodes are run, in parallel, and every node leaves its DataFrame,
+figures and printed output in the output folder. The notebook is then
+assembled from these outputs instead of being executed cell by cell.
+
+Run from the root of the repository:
+
+    python -m auxiliary.pipeline --out results
+    python -m auxiliary.pipeline --out results --dry-run
+    python -m auxiliary.pipeline --out results --only table_5_fin --force
+"""
+import io
+import os
+import ast
+import sys
+import json
+import time
+import types
+import base64
+import pickle
+import hashlib
+import argparse
+import inspect
+import contextlib
+import importlib.metadata
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+
+from auxiliary import auxiliary_func as af
+from auxiliary import run_all
+
+
+###output folder of the running pipeline, set before the workers are forked
+OUT = {'path': 'results'}
+
+
+def code_names(code):
+    '''global names used by a code object and the functions, lambdas and comprehensions in it'''
+
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+
+    return names
+
+
+def code_strings(code):
+    '''string constants of a code object and the ones nested in it or in constant tuples'''
+
+    strings, todo = set(), list(code.co_consts)
+    while todo:
+        const = todo.pop()
+        if isinstance(const, str):
+            strings.add(const)
+        elif isinstance(const, (tuple, frozenset)):
+            todo += list(const)
+        elif isinstance(const, types.CodeType):
+            strings |= code_strings(const)
+
+    return strings
+
+
+def node_inputs(name):
+    '''the functions of auxiliary_func task name reaches and the Data/ files they read'''
+
+    functions, todo = set(), [name]
+    while todo:
+        function = inspect.unwrap(getattr(af, todo.pop()))
+        if function.__name__ in functions:
+            continue
+        functions.add(function.__name__)
+        for used in code_names(function.__code__):
+            value = getattr(af, used, None)
+            if inspect.isfunction(value) and value.__module__ == af.__name__:
+                todo.append(used)
+
+    files = set(run_all.TASKS[name])
+    for function in functions:
+        function = inspect.unwrap(getattr(af, function))
+        strings = code_strings(function.__code__) | {d for d in function.__defaults__ or () if isinstance(d, str)}
+        files |= {s for s in strings if s.startswith('Data/')}
+
+    return sorted(functions), sorted(files)
+
+
+def graph():
+    '''the pipeline as a DataFrame, one row per node with the functions and files it depends on'''
+
+    rows = []
+    for name in run_all.TASKS:
+        functions, files = node_inputs(name)
+        rows.append({'node': name, 'functions': functions, 'files': files})
+
+    return pd.DataFrame(rows).set_index('node')
+
+
+def library_versions():
+    '''installed versions of the libraries the tables and figures use next to the results store's'''
+
+    versions = []
+    for library in ['statsmodels', 'matplotlib', 'arch']:
+        try:
+            versions.append(importlib.metadata.version(library))
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(None)
+
+    return versions
+
+
+def fingerprint(name, functions, files):
+    '''hash of the arguments of node name, the source of its functions, the
+    content of its files and the libraries and K rule the fits depend on, None
+    if a file is missing'''
+
+    if not all(os.path.exists(f) for f in files):
+        return None
+
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((name, run_all.TASKS[name])).encode())
+    # numpy, pandas, patsy and scipy are in the code version of the results store, the
+    # versions of the others are read from the installed metadata without importing them
+    h.update(repr((af.code_version(), af.KRULE['k'], library_versions())).encode())
+    for function in functions:
+        h.update(inspect.getsource(getattr(af, function)).encode())
+    for f in files:
+        h.update((f + af.file_hash(f)).encode())
+
+    return h.hexdigest()
+
+
+def manifest(out):
+    '''fingerprint, run time and outputs of every node of the last runs in out'''
+
+    path = os.path.join(out, '.pipeline.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def outputs(name, entry):
+    '''the files node name leaves in the output folder'''
+
+    files = [name + '.pkl', name + '.txt']
+    files += ['{}_{}.png'.format(name, i) for i in range(entry.get('figures', 0))]
+
+    return files
+
+
+def plan(out, only=None, force=False):
+    '''the graph with the fingerprint of every node and its status:
+    fresh, stale (to run) or missing (some file is not there)'''
+
+    nodes = graph()
+    if only is not None:
+        nodes = nodes.loc[list(only)]
+    done = manifest(out)
+
+    status, prints = [], []
+    for name, row in nodes.iterrows():
+        prints.append(fingerprint(name, row['functions'], row['files']))
+        entry = done.get(name, {})
+        if prints[-1] is None:
+            status.append('missing')
+        elif (force or entry.get('fingerprint') != prints[-1]
+              or not all(os.path.exists(os.path.join(out, f)) for f in outputs(name, entry))):
+            status.append('stale')
+        else:
+            status.append('fresh')
+    nodes['fingerprint'] = prints
+    nodes['status'] = status
+
+    return nodes
+
+
+def run_node(name):
+    '''runs task name and writes its result, figures and printed output,
+    returns (name, number of figures, seconds, error)'''
+
+    out = OUT['path']
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        name, result, figures, seconds, error = run_all.run_task(name)
+
+    if error is None:
+        with open(os.path.join(out, name + '.pkl'), 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(out, name + '.txt'), 'w') as f:
+            f.write(stdout.getvalue())
+        if isinstance(result, pd.DataFrame):
+            result.to_csv(os.path.join(out, name + '.csv'))
+        for i, fig in enumerate(figures):
+            fig.savefig(os.path.join(out, '{}_{}.png'.format(name, i)), bbox_inches='tight')
+
+    return name, len(figures), seconds, error
+
+
+def run_pipeline(out, jobs=None, only=None, force=False):
+    '''runs the stale nodes on jobs processes (one per core by default) and
+    records them in the manifest of out, returns the plan with the run time
+    and the error of every node that ran'''
+
+    os.makedirs(out, exist_ok=True)
+    OUT['path'] = out
+    nodes = plan(out, only, force)
+    stale = list(nodes.index[nodes['status'] == 'stale'])
+    jobs = jobs or os.cpu_count()
+
+    if jobs == 1 or len(stale) < 2:
+        done = [run_node(name) for name in stale]
+    else:
+        # fork shares what this process has loaded, the data and caches are only read
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+        with ctx.Pool(min(jobs, len(stale))) as pool:
+            done = pool.map(run_node, stale, chunksize=1)
+
+    entries = manifest(out)
+    nodes['seconds'] = np.nan
+    nodes['error'] = None
+    for name, figures, seconds, error in done:
+        nodes.loc[name, 'seconds'] = seconds
+        if error is None:
+            nodes.loc[name, 'status'] = 'ran'
+            entries[name] = {'fingerprint': nodes.loc[name, 'fingerprint'], 'seconds': seconds,
+                             'figures': figures, 'finished': time.time()}
+        else:
+            nodes.loc[name, 'status'] = 'failed'
+            nodes.loc[name, 'error'] = error
+            entries.pop(name, None)
+    with open(os.path.join(out, '.pipeline.json'), 'w') as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+
+    return nodes
+
+
+def cell_node(source):
+    '''the task a notebook cell runs, None for any other cell'''
+
+    called = {node.func.id for node in ast.walk(ast.parse(source))
+              if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)}
+
+    return next((name for name in run_all.TASKS if name in called), None)
+
+
+def cell_value(source, name, result):
+    '''the value of the last expression of a cell, with the call of its task
+    answered by result; the display options it sets are undone afterwards'''
+
+    tree = ast.parse(source)
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    namespace = {'pd': pd, 'np': np, name: lambda *args, **kwargs: result}
+    with pd.option_context('display.float_format', None):
+        exec(compile(tree, '<cell>', 'exec'), namespace)
+        if last is None:
+            return None, None
+        value = eval(compile(ast.Expression(last.value), '<cell>', 'eval'), namespace)
+        html = value._repr_html_() if hasattr(value, '_repr_html_') else None
+        return html, repr(value)
+
+
+def assemble(out, notebook='Final_project.ipynb'):
+    '''writes notebook into out with the outputs of every task cell filled in
+    from the outputs of its node, returns the path of the assembled notebook'''
+
+    with open(notebook) as f:
+        nb = json.load(f)
+    entries = manifest(out)
+
+    count = 0
+    for cell in nb['cells']:
+        if cell['cell_type'] != 'code':
+            continue
+        count += 1
+        cell['execution_count'] = count
+        source = ''.join(cell['source'])
+        name = cell_node(source)
+        if name is None:
+            continue
+
+        cell['outputs'] = []
+        if name not in entries:
+            cell['outputs'].append({'output_type': 'error', 'ename': 'PipelineError',
+                                    'evalue': '{} has not run'.format(name), 'traceback': []})
+            continue
+
+        with open(os.path.join(out, name + '.txt')) as f:
+            printed = f.read()
+        if printed:
+            cell['outputs'].append({'output_type': 'stream', 'name': 'stdout', 'text': printed.splitlines(True)})
+        for i in range(entries[name]['figures']):
+            with open(os.path.join(out, '{}_{}.png'.format(name, i)), 'rb') as f:
+                png = base64.b64encode(f.read()).decode()
+            cell['outputs'].append({'output_type': 'display_data', 'metadata': {},
+                                    'data': {'image/png': png, 'text/plain': ['<Figure>']}})
+        with open(os.path.join(out, name + '.pkl'), 'rb') as f:
+            result = pickle.load(f)
+        html, text = cell_value(source, name, result)
+        if text is not None and text != 'None':
+            data = {'text/plain': text.splitlines(True)}
+            if html is not None:
+                data['text/html'] = html.splitlines(True)
+            cell['outputs'].append({'output_type': 'execute_result', 'execution_count': count,
+                                    'metadata': {}, 'data': data})
+
+    path = os.path.join(out, os.path.basename(notebook))
+    with open(path, 'w') as f:
+        json.dump(nb, f, indent=1)
+
+    return path
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Rebuild the stale tables and figures and assemble the notebook.')
+    parser.add_argument('--out', default='results', help='folder of the node outputs and the assembled notebook')
+    parser.add_argument('--jobs', type=int, default=None, help='number of processes, one per core by default')
+    parser.add_argument('--only', nargs='*', default=None, choices=list(run_all.TASKS), help='consider these nodes only')
+    parser.add_argument('--force', action='store_true', help='rerun the nodes even if they are fresh')
+    parser.add_argument('--dry-run', action='store_true', help='only show which nodes are stale')
+    parser.add_argument('--notebook', default='Final_project.ipynb', help='notebook to assemble')
+    args = parser.parse_args()
+
+    if args.dry_run:
+        print(plan(args.out, args.only, args.force)[['status']].to_string())
+        sys.exit(0)
+
+    start = time.perf_counter()
+    nodes = run_pipeline(args.out, jobs=args.jobs, only=args.only, force=args.force)
+    path = assemble(args.out, args.notebook)
+
+    print(nodes[['status', 'seconds']].to_string(float_format='{:.1f}'.format))
+    print('total wall time: {:.1f}s, notebook written to {}'.format(time.perf_counter() - start, path))
+    for name, row in nodes[nodes['status'] == 'missing'].iterrows():
+        print('\n{} is missing {}'.format(name, ', '.join(f for f in row['files'] if not os.path.exists(f))))
+    for name, error in nodes['error'].dropna().items():
+        print('\n{} failed:\n{}'.format(name, error))
+    sys.exit(int(nodes['status'].isin(['failed', 'missing']).any()))
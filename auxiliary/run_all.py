@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+"""This module runs every table and figure of the notebook on a process pool.
+
+The builders are independent of each other, so they are scheduled as separate
+tasks. Workers are forked from the calling process and therefore share whatever
+it has already loaded (modules, the design cache) read-only. Every task returns
+its DataFrame and the figures it drew, together with its wall time. Figures are
+rendered headless with Agg and drawn from the event study cache when it is warm.
+
+Run from the root of the repository:
+
+    python -m auxiliary.run_all --jobs 4 --out results
+    python -m auxiliary.run_all --figures --format png svg --out figures
+"""
+import os
+import sys
+import time
+import argparse
+import traceback
+import multiprocessing as mp
+
+import pandas as pd
+
+from auxiliary import auxiliary_func as af
+from auxiliary.lazy import lazy
+
+lazy(globals(), plt='matplotlib.pyplot')
+
+
+###task name: arguments, in the order of the notebook
+TASKS = {
+    'table_2_fin': ('Data/Final-Sample1b.dta',),
+    'table_3_fin': ('Data/Final-Sample1c.dta',),
+    'table_4_fin': ('Data/Final-Sample1d.dta',),
+    'fig_1_fin': ('Data/globalterrorismdb_0919dist.xlsx',),
+    'table_1_fin': ('Data/Final-Sample1a.dta',),
+    'table_5_fin': ('Data/Final-Sample2.dta',),
+    'fig_3and4_fin': ('Data/Final-Sample2.dta',),
+    'fig_5and5e_fin': ('Data/Final-Sample2.dta',),
+    'fig_a4andall_fin': ('Data/Final-Sample2.dta',),
+    'table_6_fin': (),
+    'fig_6and7_fin': ('Data/Final-Sample2.dta',),
+    'fig_allsum_fin': (),
+    'table_a4_fin': ('Data/Final-Sample4.dta',),
+    'table_a5_fin': ('Data/Final-Sample8.dta',),
+    'table_a6_fin': ('Data/Final-Sample3.dta',),
+    'table_a7_fin': (),
+    'table_a8_final': (),
+    'table_a9_fin': (),
+    'table_10_fin': ('Data/Final-Sample3.dta',),
+    'table_a11_fin': ('Data/Final-Sample3.dta',),
+    'table_a12_fin': ('Data/Final-Sample3.dta',),
+    'table_7_fin': ('Data/Final-Sample3.dta',),
+    'table_house_fin': ('Data/Final-Sample3.dta', 'Data/housing_index.dta'),
+    'table_9_fin': ('Data/Final-Sample7.dta',),
+    'extend_fig1_fin': ('Data/Final-Sample2.dta',),
+    'extend_za': ('Data/Final-Sample2.dta',),
+    'extend_fig2_fin': (),
+}
+
+###tasks that draw figures, they run through render
+FIGURES = [name for name in TASKS if 'fig' in name]
+
+
+def run_task(name):
+    '''runs one builder, returns (name, result, figures, seconds, error)
+    figures are drawn without a display'''
+
+    plt.switch_backend('Agg')
+    plt.close('all')
+    # patsy parses the formulas with every month*year interaction recursively
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+    start = time.perf_counter()
+    result, figures, error = None, [], None
+    try:
+        if name in FIGURES:
+            figures = af.render(getattr(af, name), *TASKS[name])
+        else:
+            result = getattr(af, name)(*TASKS[name])
+    except Exception:
+        error = traceback.format_exc()
+    seconds = time.perf_counter() - start
+
+    # anything still drawn through pyplot
+    figures += [plt.figure(n) for n in plt.get_fignums()]
+    plt.close('all')
+
+    return name, result, figures, seconds, error
+
+
+def run_all(jobs=None, only=None):
+    '''runs the builders in only (all of TASKS by default) on jobs processes,
+    one process per core if jobs is None and in this process if jobs is 1
+    returns a dict name: (result, figures) and a DataFrame with the wall time
+    and status of every task'''
+
+    names = list(only) if only is not None else list(TASKS)
+    jobs = jobs or os.cpu_count()
+
+    if jobs == 1:
+        done = [run_task(name) for name in names]
+    else:
+        # fork shares what this process has loaded, the data and caches are only read
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+        with ctx.Pool(min(jobs, len(names))) as pool:
+            done = pool.map(run_task, names, chunksize=1)
+
+    results = {name: (result, figures) for name, result, figures, seconds, error in done}
+    timing = pd.DataFrame([{'task': name,
+                            'seconds': seconds,
+                            'status': 'failed' if error else 'ok',
+                            'error': error}
+                           for name, result, figures, seconds, error in done]).set_index('task')
+
+    return results, timing
+
+
+def save(results, out, formats=('png',)):
+    '''writes every DataFrame as csv and every figure in formats (png, svg) into out'''
+
+    os.makedirs(out, exist_ok=True)
+    for name, (result, figures) in results.items():
+        if isinstance(result, pd.DataFrame):
+            result.to_csv(os.path.join(out, name + '.csv'))
+        for i, fig in enumerate(figures):
+            for fmt in formats:
+                fig.savefig(os.path.join(out, '{}_{}.{}'.format(name, i, fmt)), bbox_inches='tight')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Replicate all tables and figures.')
+    parser.add_argument('--jobs', type=int, default=None, help='number of processes, one per core by default')
+    parser.add_argument('--only', nargs='*', default=None, choices=list(TASKS), help='run these tasks only')
+    parser.add_argument('--figures', action='store_true', help='run the figure tasks only')
+    parser.add_argument('--out', default=None, help='folder for the csv tables and the figures')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'], help='file formats of the figures')
+    args = parser.parse_args()
+
+    only = args.only
+    if args.figures:
+        only = [name for name in (only or TASKS) if name in FIGURES]
+
+    start = time.perf_counter()
+    results, timing = run_all(jobs=args.jobs, only=only)
+    if args.out is not None:
+        save(results, args.out, args.format)
+
+    print(timing[['seconds', 'status']].to_string())
+    print('total wall time: {:.1f}s'.format(time.perf_counter() - start))
+    for name, error in timing['error'].dropna().items():
+        print('\n{} failed:\n{}'.format(name, error))
+    sys.exit(int((timing['status'] == 'failed').any()))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""This module generates synthetic county-month panels for load testing.
+
+The panels have the county-month columns of the Final-Sample files (fips, year,
+month, div_9_all, successful, post, meventperyear, the event time dummies, the
+attack and weapon dummies and the employment and earnings outcomes). The
+estimators (aregdf, aregmany, aregladder, aregspec, aregjackknife, probitspec)
+run on them, and so do the builders table_10_fin, table_5_fin, fig_3and4_fin,
+fig_5and5e_fin, fig_6and7_fin and fig_a4andall_fin. The other builders need
+columns the panels do not have (sector and establishment outcomes, GTD attack
+details, the attack level samples of tables 1 to 4).
+
+The effect of a successful attack on the log outcomes is known: every
+county-month at or after a successful first attack is shifted by `effect`
+(in 100*log points). Output is generated and written in chunks of counties, so
+panels much larger than memory can be streamed to disk.
+
+Run from the root of the repository:
+
+    python -m auxiliary.synthetic --counties 40000 --chunk 2000 --out Data/synthetic.csv
+"""
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+###event time dummies: years before (pre) and after (post) the first attack of a county
+PRE = range(1, 6)
+POST = range(0, 6)
+
+
+def panel_chunk(first, counties, years=(1970, 2013), density=0.001, effect=-2.0, success=0.6, seed=0):
+    '''the county-month panel of counties counties starting with county number first,
+    drawn from a generator seeded by (seed, first) so every chunk is reproducible'''
+
+    rng = np.random.default_rng([seed, first])
+    nyears = years[1] - years[0] + 1
+    shape = (counties, nyears, 12)
+    n = counties * nyears * 12
+
+    ###county, year and month of every row
+    county = np.arange(first, first + counties)
+    fips = np.repeat(1000 * (county // 250 + 1) + county % 250 + 1, nyears * 12)
+    year = np.tile(np.repeat(np.arange(years[0], years[1] + 1), 12), counties)
+    month = np.tile(np.arange(1, 13), counties * nyears)
+    div = np.repeat(rng.integers(1, 10, counties), nyears * 12)
+
+    ###attacks: the first one of a county sets its event year and whether it succeeded
+    attack = rng.random(shape) < density
+    events = np.where(attack, 1 + rng.poisson(0.5, shape), 0).reshape(n)
+    attacked = attack.any(axis=(1, 2))
+    first_year = np.where(attacked, attack.any(axis=2).argmax(axis=1), -10 ** 6)
+    won = attacked & (rng.random(counties) < success)
+    rel = (year - years[0]) - np.repeat(first_year, nyears * 12)
+    won_row = np.repeat(won, nyears * 12)
+    attacked_row = np.repeat(attacked, nyears * 12)
+
+    post = attacked_row & (rel >= 0)
+    successful = won_row & post
+
+    data = {'fips': fips.astype(float), 'year': year.astype(float), 'month': month.astype(np.float32),
+            'div_9_all': div.astype(float), 'state': (fips // 1000).astype(np.float32),
+            'successful': successful, 'post': post, 'meventperyear': events}
+    for k in PRE:
+        at = attacked_row & (rel == -k)
+        data['pre_{}_success'.format(k)] = at & won_row
+        data['pre_{}_fail'.format(k)] = at & ~won_row
+        data['pre_{}'.format(k)] = at
+        data['success_{}_pre'.format(k)] = at & won_row
+    for k in POST:
+        at = attacked_row & (rel == k)
+        data['post_{}_success'.format(k)] = at & won_row
+        data['post_{}_fail'.format(k)] = at & ~won_row
+        data['post_{}'.format(k)] = at
+        data['success_{}_post'.format(k)] = at & won_row
+
+    ###attack characteristics, only in months with an attack
+    hit = events > 0
+    kind = rng.integers(0, 5, n)
+    for i, key in enumerate(['aa_assass', 'aa_armed', 'aa_bomb', 'aa_facility']):
+        data[key] = hit & (kind == i)
+    weapon = rng.integers(0, 4, n)
+    for i, key in enumerate(['ww_firearm', 'ww_explo', 'ww_incend']):
+        data[key] = hit & (weapon == i)
+    for key, p in [('non_us_t', 0.02), ('int_l', 0.01), ('location_amb', 0.05), ('catastro', 0.02)]:
+        data[key] = hit & (rng.random(n) < p)
+
+    ###outcomes: county and year effects, noise and the effect of a successful attack
+    county_fe = np.repeat(rng.normal(-116, 40, counties), nyears * 12)
+    year_fe = np.tile(np.repeat(rng.normal(0, 5, nyears), 12), counties)
+    wage_fe = np.repeat(rng.normal(200, 20, counties), nyears * 12)
+    data['ln_emp_pop'] = county_fe + year_fe + rng.normal(0, 5, n) + effect * successful
+    data['ln_real_qp1_job'] = wage_fe + year_fe / 2 + rng.normal(0, 5, n)
+    # earnings per head are jobs per head times earnings per job, the effect carries over
+    data['ln_real_qp1_pop'] = data['ln_emp_pop'] + data['ln_real_qp1_job']
+    data['emp'] = 1000 * np.exp(data['ln_emp_pop'] / 100)
+    data['real_qp1'] = data['emp'] * np.exp(data['ln_real_qp1_job'] / 100)
+
+    df = pd.DataFrame(data)
+    for key in df.columns.drop(['fips', 'year', 'div_9_all']):
+        df[key] = df[key].astype(np.float32)
+
+    ###the samples of the comparison and basic models, missing outside like in the Stata files
+    df['sample'] = np.where(attacked_row, 1, np.nan).astype(np.float32)
+    df['bon1'] = np.where(attacked_row & ~won_row, np.nan, 1).astype(np.float32)
+    df['bon0'] = np.where(won_row, np.nan, 1).astype(np.float32)
+
+    return df
+
+
+def synthetic_panel(counties=400, years=(1970, 2013), density=0.001, effect=-2.0, success=0.6, seed=0, chunk=1000):
+    '''yields the synthetic panel in chunks of chunk counties, density is the chance
+    of an attack in a county-month and effect the true effect of a successful attack
+    on ln_emp_pop and ln_real_qp1_pop. the same seed and chunk give the same panel'''
+
+    for first in range(0, counties, chunk):
+        yield panel_chunk(first, min(chunk, counties - first), years, density, effect, success, seed)
+
+
+def write_panel(out, **kwargs):
+    '''streams synthetic_panel(**kwargs) to out chunk by chunk: a .csv (or .csv.gz)
+    is appended to, a .dta is written as numbered files out-0.dta, out-1.dta, ...
+    returns the number of rows written'''
+
+    rows = 0
+    stem, ext = os.path.splitext(out)
+    if os.path.exists(out):
+        os.remove(out)
+    for i, df in enumerate(synthetic_panel(**kwargs)):
+        if ext == '.dta':
+            df.to_stata('{}-{}.dta'.format(stem, i), write_index=False)
+        else:
+            df.to_csv(out, mode='a', header=(i == 0), index=False)
+        rows += len(df)
+
+    return rows
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Write a synthetic county-month panel.')
+    parser.add_argument('--counties', type=int, default=400)
+    parser.add_argument('--years', type=int, nargs=2, default=[1970, 2013], help='first and last year')
+    parser.add_argument('--density', type=float, default=0.001, help='chance of an attack in a county-month')
+    parser.add_argument('--effect', type=float, default=-2.0, help='effect of a successful attack, 100*log points')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk', type=int, default=1000, help='counties per chunk')
+    parser.add_argument('--out', required=True, help='.csv, .csv.gz or .dta file')
+    args = parser.parse_args()
+
+    rows = write_panel(args.out, counties=args.counties, years=tuple(args.years), density=args.density,
+                       effect=args.effect, seed=args.seed, chunk=args.chunk)
+    print('{} rows written to {}'.format(rows, args.out))
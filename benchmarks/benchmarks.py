@@ -0,0 +1,299 @@
+"""Benchmarks of the estimation hot paths.
+
+The suites follow the conventions of asv (airspeed velocity): a class with
+`params` and `param_names` is run for every combination of the parameters,
+`setup` builds the inputs and raises NotImplementedError to skip a case, and
+every `time_*` method is timed, every `peakmem_*` method measured for its
+peak memory and the code returned by every `timeraw_*` method is timed in a
+fresh interpreter. They run under asv as they are and under benchmarks/run.py, which
+also keeps a baseline to compare against.
+
+The estimators run on synthetic panels (auxiliary/synthetic.py) with the design
+cache and the results store switched off, so every call parses and solves from scratch. The builders
+run on the data files that are shipped in Data/, the others are skipped.
+"""
+import os
+import re
+import sys
+import inspect
+import tempfile
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+
+from auxiliary import auxiliary_func as af
+from auxiliary import synthetic
+from auxiliary import run_all
+
+# patsy parses the formulas with every month*year interaction recursively
+sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+
+###months per county in the synthetic panels of the estimator benchmarks
+YEARS = (2000, 2009)
+MONTHS = (YEARS[1] - YEARS[0] + 1) * 12
+
+
+def panel(rows, seed=0):
+    '''a synthetic county-month panel with about rows rows'''
+
+    return synthetic.panel_chunk(0, max(rows // MONTHS, 2), years=YEARS, density=0.01, seed=seed)
+
+
+class Cold:
+    '''switches the design, event study and cube caches and the results store off
+    for the benchmark and back on after it'''
+
+    def setup(self, *params):
+        self.cache = af.design_cache()
+        self.events = af.eventstudy_cache()['path']
+        self.cubes = af.cube_cache()['path']
+        self.store = af.results_store()['on']
+        self.tmp = tempfile.TemporaryDirectory()
+        af.design_cache(limit=0, clear=True)
+        af.DESIGN_CACHE['path'] = None
+        af.eventstudy_cache(path=self.tmp.name, clear=True)
+        af.cube_cache(path=self.tmp.name, clear=True)
+        af.results_store(on=False)
+
+    def teardown(self, *params):
+        af.design_cache(limit=self.cache['limit'], clear=True)
+        af.DESIGN_CACHE['path'] = self.cache['path']
+        af.eventstudy_cache(path=self.events)
+        af.cube_cache(path=self.cubes)
+        af.results_store(on=self.store)
+        self.tmp.cleanup()
+
+
+class AregRows(Cold):
+    '''aregdf with county, year and month effects by the number of rows, clustered
+    by county or by the 9 divisions'''
+
+    params = ([10000, 100000, 1000000], ['fips', 'div_9_all'])
+    param_names = ['rows', 'cluster']
+
+    def setup(self, rows, cluster):
+        self.data = panel(rows)
+        super().setup()
+
+    def time_aregdf(self, rows, cluster):
+        af.aregdf('ln_emp_pop ~ successful + post + meventperyear', self.data,
+                  absorb=['fips', 'year', 'month'], cluster=cluster)
+
+    def peakmem_aregdf(self, rows, cluster):
+        af.aregdf('ln_emp_pop ~ successful + post + meventperyear', self.data,
+                  absorb=['fips', 'year', 'month'], cluster=cluster)
+
+
+class AregEffects(Cold):
+    '''aregdf by the number of absorbed fixed effects'''
+
+    params = [1, 2, 3, 4]
+    param_names = ['effects']
+
+    ABSORB = ['fips', 'year', 'month', ('year', 'div_9_all')]
+
+    def setup(self, effects):
+        self.data = panel(100000)
+        super().setup()
+
+    def time_aregdf(self, effects):
+        af.aregdf('ln_emp_pop ~ successful + post', self.data, absorb=self.ABSORB[:effects], cluster='fips')
+
+    def peakmem_aregdf(self, effects):
+        af.aregdf('ln_emp_pop ~ successful + post', self.data, absorb=self.ABSORB[:effects], cluster='fips')
+
+
+class AregInteractions(Cold):
+    '''aregdf by the number of dummies in the formula, one per year*month cell
+    up to interactions and the rest pooled'''
+
+    params = [0, 12, 60, 119]
+    param_names = ['interactions']
+
+    def setup(self, interactions):
+        self.data = panel(100000)
+        cell = (self.data['year'] - YEARS[0]) * 12 + self.data['month'] - 1
+        self.data['cell'] = np.minimum(cell, interactions)
+        self.formula = 'ln_emp_pop ~ successful + post'
+        if interactions:
+            self.formula += ' + C(cell)'
+        super().setup()
+
+    def time_aregdf(self, interactions):
+        af.aregdf(self.formula, self.data, absorb=['fips'], cluster='fips')
+
+    def peakmem_aregdf(self, interactions):
+        af.aregdf(self.formula, self.data, absorb=['fips'], cluster='fips')
+
+
+class Probit(Cold):
+    '''the four probits of table 4 on one design by the number of rows: the jobs and
+    earnings regressors, each with and without the weapon dummies'''
+
+    params = [10000, 100000]
+    param_names = ['rows']
+
+    def setup(self, rows):
+        data = panel(rows)
+        data['attacked'] = (data['meventperyear'] > 0).astype(float)
+        noise = np.random.default_rng(0).normal(0, 40, len(data))
+        data['success'] = (data['ln_emp_pop'] + 116 + noise > 0).astype(float)
+        controls = ['aa_assass', 'aa_bomb', 'aa_facility', 'non_us_t']
+        weapons = controls + ['ww_firearm', 'ww_explo', 'ww_incend']
+        self.specs = [af.Spec('success', [key, 'attacked'], c, [], [], 'fips')
+                      for key in ['ln_emp_pop', 'ln_real_qp1_pop'] for c in [controls, weapons]]
+        self.data = data
+        super().setup()
+
+    def time_probitspec(self, rows):
+        af.probitspec(self.specs, self.data)
+
+    def peakmem_probitspec(self, rows):
+        af.probitspec(self.specs, self.data)
+
+
+class Balance:
+    '''the balance table of successful and failed attacks, clustered by county,
+    by the number of rows and covariates'''
+
+    params = ([100000, 1000000], [20, 200])
+    param_names = ['rows', 'covariates']
+
+    def setup(self, rows, covariates):
+        rng = np.random.default_rng(0)
+        self.columns = ['x{}'.format(i) for i in range(covariates)]
+        self.data = pd.DataFrame(rng.normal(size=(rows, covariates)).astype(np.float32), columns=self.columns)
+        self.data['success'] = rng.integers(0, 2, rows).astype(float)
+        self.data['fips'] = rng.integers(0, 3000, rows).astype(float)
+
+    def time_balance(self, rows, covariates):
+        af.balance(self.data, self.columns, 'success', cluster='fips')
+
+    def peakmem_balance(self, rows, covariates):
+        af.balance(self.data, self.columns, 'success', cluster='fips')
+
+
+class Iindexer:
+    '''the year dummies of iindexer, as columns and as codes'''
+
+    params = [10000, 100000, 1000000]
+    param_names = ['rows']
+
+    def setup(self, rows):
+        self.data = panel(rows)
+
+    def time_dummies(self, rows):
+        af.iindexer(self.data, 'year', 'i_year', YEARS[0], YEARS[1])
+
+    def time_codes(self, rows):
+        af.iindexer(self.data, 'year', 'i_year', YEARS[0], YEARS[1], codes=True)
+
+
+class ZivotAndrews:
+    '''the batched Zivot-Andrews tests by the number and length of the series, yearly
+    and monthly random walks'''
+
+    params = ([100, 1000], [44, 528])
+    param_names = ['series', 'periods']
+
+    def setup(self, series, periods):
+        rng = np.random.default_rng(0)
+        self.series = pd.DataFrame(np.cumsum(rng.normal(size=(periods, series)), axis=0))
+
+    def time_zivot_andrews(self, series, periods):
+        af.zivot_andrews(self.series)
+
+
+###the data files every builder reads, from its arguments and the paths in its source
+def builder_files(name):
+    '''the Data/ files the builder name reads'''
+
+    source = inspect.getsource(getattr(af, name))
+    for builder in re.findall(r'event_results\((\w+)', source):
+        source += inspect.getsource(getattr(af, builder))
+    files = set(re.findall(r"'(Data/[^']+)'", source)) | set(run_all.TASKS[name])
+
+    return sorted(files)
+
+
+class Builders(Cold):
+    '''the tables and figures of the notebook on the shipped data, from cold caches'''
+
+    params = list(run_all.TASKS)
+    param_names = ['builder']
+    timeout = 600
+    # a builder is timed from cold, including the first use of its dependencies
+    warmup_time = 0
+
+    def setup(self, builder):
+        missing = [f for f in builder_files(builder) if not os.path.exists(f)]
+        if missing:
+            raise NotImplementedError('missing ' + ', '.join(missing))
+        super().setup()
+
+    def time_builder(self, builder):
+        self.run(builder)
+
+    def peakmem_builder(self, builder):
+        self.run(builder)
+
+    def run(self, builder):
+        error = run_all.run_task(builder)[-1]
+        if error:
+            raise RuntimeError(error)
+
+
+class ImportTime:
+    '''cold start: importing a module in a fresh interpreter, tests/test_import.py
+    fails when one of them pulls in the heavy dependencies again'''
+
+    params = ['auxiliary.auxiliary_func', 'auxiliary.run_all', 'auxiliary.pipeline',
+              'auxiliary.example_project_auxiliary_plots', 'auxiliary.example_project_auxiliary_predictions',
+              'auxiliary.example_project_auxiliary_tables']
+    param_names = ['module']
+
+    def timeraw_import(self, module):
+        return 'import ' + module
+
+
+###the RDD helpers of the example project on a synthetic running variable
+def rdd_data(rows, seed=0):
+    '''a sharp RD around a GPA cutoff at zero with a jump of 0.1 below it'''
+
+    rng = np.random.default_rng(seed)
+    dist = np.round(rng.uniform(-1.6, 1.6, rows), 2)
+    below = (dist < 0).astype(float)
+    data = pd.DataFrame({'dist_from_cut': dist, 'gpalscutoff': below,
+                         'gpaXgpalscutoff': dist * below, 'gpaXgpagrcutoff': dist * (1 - below),
+                         'const': 1.0, 'clustervar': dist})
+    data['left_school'] = (rng.random(rows) < 0.05 + 0.1 * below).astype(float)
+    data['nextGPA'] = 0.5 * dist + 0.1 * below + rng.normal(0, 0.5, rows)
+
+    return data
+
+
+class RDD:
+    '''the RD estimates and prediction curves of the example project'''
+
+    params = [10000, 50000]
+    param_names = ['rows']
+
+    REGRESSORS = ['const', 'gpalscutoff', 'gpaXgpalscutoff', 'gpaXgpagrcutoff']
+
+    def setup(self, rows):
+        from auxiliary import example_project_auxiliary_predictions as predictions
+        from auxiliary import example_project_auxiliary_tables as tables
+        self.predictions, self.tables = predictions, tables
+        self.data = rdd_data(rows)
+
+    def time_estimate_multiple_outcomes(self, rows):
+        self.tables.estimate_RDD_multiple_outcomes(self.data, ['left_school', 'nextGPA'], self.REGRESSORS)
+
+    def time_create_predictions(self, rows):
+        self.predictions.create_predictions(self.data, 'nextGPA', self.REGRESSORS, 0.6)
+
+    def peakmem_create_predictions(self, rows):
+        self.predictions.create_predictions(self.data, 'nextGPA', self.REGRESSORS, 0.6)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+"""This module runs the benchmarks and compares them against a stored baseline.
+
+It runs the suites of benchmarks/benchmarks.py the way asv does: setup, then
+every time_* method is timed (the median of --repeat calls), every peakmem_*
+method is run once under tracemalloc for its peak memory and the code returned
+by every timeraw_* method is timed in a new interpreter, then teardown. Both
+time_* and peakmem_* get an untimed warm up call first unless the suite sets
+warmup_time = 0. The
+results can be saved as a baseline, a later run compared against it fails when
+a benchmark got slower or bigger by more than --factor.
+
+Run from the root of the repository:
+
+    python -m benchmarks.run --save benchmarks/baseline.json
+    python -m benchmarks.run --bench Areg --compare benchmarks/baseline.json --factor 1.2
+"""
+import re
+import sys
+import json
+import time
+import inspect
+import subprocess
+import argparse
+import warnings
+import itertools
+import statistics
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks import benchmarks
+
+
+def cases(suite):
+    '''every combination of the parameters of suite as tuples, () without parameters'''
+
+    params = getattr(suite, 'params', None)
+    if params is None:
+        return [()]
+    if len(getattr(suite, 'param_names', [])) > 1:
+        return list(itertools.product(*params))
+    return [(p,) for p in params]
+
+
+def label(suite, method, case):
+    '''the name of a benchmark, Suite.method(name=value, ...)'''
+
+    names = getattr(suite, 'param_names', [])
+    args = ', '.join('{}={}'.format(n, v) for n, v in zip(names, case))
+    return '{}.{}({})'.format(suite.__name__, method, args)
+
+
+###timeraw code runs in a child interpreter that prints how long it took
+RAW = 'import time; start = time.perf_counter(); exec({!r}); print(time.perf_counter() - start)'
+
+
+def measure(function, case, kind, repeat, warmup=True):
+    '''the median wall time in seconds or the peak traced memory in bytes of function(*case)
+    with warmup a first untimed call loads what the function imports on first use'''
+
+    if kind == 'timeraw':
+        code = RAW.format(function(*case))
+        return statistics.median(float(subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                                                      text=True).stdout) for _ in range(repeat))
+    if warmup:
+        function(*case)
+    if kind == 'peakmem':
+        tracemalloc.start()
+        try:
+            function(*case)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*case)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run(bench=None, repeat=3):
+    '''runs every benchmark whose name matches the regular expression bench
+    returns a DataFrame with the kind, value and status of every benchmark'''
+
+    rows = []
+    suites = [s for _, s in inspect.getmembers(benchmarks, inspect.isclass) if s.__module__ == benchmarks.__name__]
+    for suite in suites:
+        methods = [m for m in dir(suite) if m.startswith(('time_', 'timeraw_', 'peakmem_'))]
+        for case in cases(suite):
+            selected = [m for m in methods if bench is None or re.search(bench, label(suite, m, case))]
+            if not selected:
+                continue
+            instance = suite()
+            try:
+                if hasattr(instance, 'setup'):
+                    instance.setup(*case)
+            except NotImplementedError as skip:
+                rows += [{'benchmark': label(suite, m, case), 'kind': m.split('_')[0], 'value': None,
+                          'status': 'skipped', 'note': str(skip)} for m in selected]
+                continue
+            try:
+                for m in selected:
+                    kind = m.split('_')[0]
+                    row = {'benchmark': label(suite, m, case), 'kind': kind, 'value': None, 'status': 'ok', 'note': ''}
+                    try:
+                        row['value'] = measure(getattr(instance, m), case, kind, repeat, getattr(suite, 'warmup_time', 1) > 0)
+                    except Exception as error:
+                        row.update(status='failed', note=repr(error).splitlines()[0][:200])
+                    rows.append(row)
+                    print('{:<70} {}'.format(row['benchmark'], fmt(row['kind'], row['value']) or row['status']),
+                          flush=True)
+            finally:
+                if hasattr(instance, 'teardown'):
+                    instance.teardown(*case)
+
+    return pd.DataFrame(rows, columns=['benchmark', 'kind', 'value', 'status', 'note']).set_index('benchmark')
+
+
+def fmt(kind, value):
+    '''seconds as ms, bytes as MB'''
+
+    if value is None or value != value:
+        return ''
+    if kind in ('time', 'timeraw'):
+        return '{:.1f}ms'.format(1000 * value)
+    return '{:.1f}MB'.format(value / 2 ** 20)
+
+
+def save(results, path):
+    '''writes the measured values as the baseline'''
+
+    ok = results[results['status'] == 'ok']
+    with open(path, 'w') as f:
+        json.dump({name: {'kind': row['kind'], 'value': row['value']} for name, row in ok.iterrows()},
+                  f, indent=1, sort_keys=True)
+
+
+def compare(results, path, factor=1.2):
+    '''adds the baseline, the ratio to it and whether the benchmark regressed
+    (is slower or bigger than factor times the baseline) or improved'''
+
+    with open(path) as f:
+        baseline = json.load(f)
+
+    results = results.copy()
+    results['baseline'] = [baseline.get(name, {}).get('value') for name in results.index]
+    results['ratio'] = pd.to_numeric(results['value']) / pd.to_numeric(results['baseline'])
+    results['change'] = ''
+    results.loc[results['ratio'] > factor, 'change'] = 'regressed'
+    results.loc[results['ratio'] < 1 / factor, 'change'] = 'improved'
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Run the benchmarks.')
+    parser.add_argument('--bench', default=None, help='regular expression, run the matching benchmarks only')
+    parser.add_argument('--repeat', type=int, default=3, help='timed calls per benchmark, the median is kept')
+    parser.add_argument('--save', default=None, help='json file to store the results in as a baseline')
+    parser.add_argument('--compare', default=None, help='json file with a baseline to compare against')
+    parser.add_argument('--factor', type=float, default=1.2, help='ratio to the baseline that counts as a change')
+    args = parser.parse_args()
+
+    # the fits warn about what they are given (rank deficient windows of the RDD curves)
+    warnings.simplefilter('ignore')
+    results = run(args.bench, args.repeat)
+    if args.save is not None:
+        save(results, args.save)
+
+    failed = (results['status'] == 'failed').any()
+    if args.compare is not None:
+        results = compare(results, args.compare, args.factor)
+        table = results[['kind', 'baseline', 'value', 'ratio', 'change']].copy()
+        table['baseline'] = [fmt(k, v) for k, v in zip(table['kind'], table['baseline'])]
+        table['value'] = [fmt(k, v) for k, v in zip(table['kind'], table['value'])]
+        print('\n' + table.drop(columns='kind').to_string(float_format='{:.2f}'.format))
+        failed = failed or (results['change'] == 'regressed').any()
+
+    for name, row in results[results['status'] != 'ok'].iterrows():
+        print('{} {}: {}'.format(name, row['status'], row['note']))
+    sys.exit(int(failed))
@@ -0,0 +1,132 @@
+"""This module checks the fast estimators against the statsmodels and arch fits they replace.
+
+Every test fits a synthetic county-month panel (auxiliary/synthetic.py) both ways:
+aregdf against areg (the original statsmodels version, kept in auxiliary_func),
+the jackknife and the ladder against aregdf refits, and probitspec, balance,
+zivot_andrews and two-way clustering against statsmodels and arch directly.
+The results store is off, so every fit is computed.
+"""
+import sys
+
+import numpy as np
+import pytest
+
+from auxiliary import auxiliary_func as af
+from auxiliary import synthetic
+
+sys.setrecursionlimit(100000)
+
+COLUMNS = ['coeff', 'stderror']
+
+
+@pytest.fixture(scope='module')
+def panel():
+    '''80 counties over 30 years with attacks in about 1% of the county-years'''
+
+    previous = af.RESULTS['on']
+    af.results_store(on=False)
+    df = synthetic.panel_chunk(0, 80, years=(1984, 2013), density=0.01)
+    # a 0/1 outcome that varies within counties, for the probits
+    df['high'] = (df['ln_emp_pop'] > df['ln_emp_pop'].median()).astype(float)
+    yield df
+    af.results_store(on=previous)
+
+
+def close(new, old, rtol, atol=0):
+    '''new equals old within rtol, a missing value on either side fails'''
+
+    np.testing.assert_allclose(np.asarray(new, dtype=float), np.asarray(old, dtype=float), rtol=rtol, atol=atol, equal_nan=False)
+
+
+def demeaned_ols(formula, data, absorb):
+    '''the OLS of areg on the data demeaned by absorb, before it is fitted'''
+
+    y, X = af.patsy.dmatrices(formula, data, return_type='dataframe')
+    y = y - y.groupby(data[absorb]).transform('mean') + y.mean()
+    X = X - X.groupby(data[absorb]).transform('mean') + X.mean()
+    return af.sm.OLS(y, X)
+
+
+def test_aregdf_matches_areg(panel):
+    formula = 'ln_emp_pop ~ successful + post + meventperyear + C(year)'
+    old = af.r2d(af.areg(formula, panel, absorb='fips', cluster='fips'))
+    new = af.aregdf(formula, panel, absorb='fips', cluster='fips')
+
+    close(new.loc[old.index, COLUMNS], old[COLUMNS], rtol=1e-12)
+
+
+def test_aregjackknife_matches_refits(panel):
+    formula = 'ln_emp_pop ~ successful + post + C(month)'
+    fits = af.aregjackknife(formula, panel, absorb='fips', cluster='fips', leaveout='year')
+
+    assert sorted(fits) == sorted(panel['year'].unique())
+    for year, new in fits.items():
+        old = af.aregdf(formula, panel[panel['year'] != year], absorb='fips', cluster='fips')
+        close(new.loc[old.index, COLUMNS], old[COLUMNS], rtol=1e-8)
+
+
+def test_aregladder_matches_refits(panel):
+    blocks = ['meventperyear', 'C(month)']
+    rungs = af.aregladder('ln_emp_pop ~ successful + post', blocks, panel, absorb='fips', cluster='fips')
+
+    assert len(rungs) == len(blocks) + 1
+    for step, new in enumerate(rungs):
+        formula = ' + '.join(['ln_emp_pop ~ successful + post'] + blocks[:step])
+        old = af.aregdf(formula, panel, absorb='fips', cluster='fips')
+        close(new.loc[old.index, COLUMNS], old[COLUMNS], rtol=1e-9)
+
+
+@pytest.mark.parametrize('controls', [[], ['month']])
+def test_probitspec_matches_get_margeff(panel, controls):
+    spec = af.Spec('high', ['successful', 'meventperyear'], controls)
+    formula = ' + '.join(['high ~ successful + meventperyear'] + ['C({})'.format(c) for c in controls])
+    new = af.probitspec(spec, panel)
+    fit = af.smf.probit(formula, panel).fit(disp=0, cov_type='cluster', cov_kwds={'groups': panel['fips'].values})
+    old = fit.get_margeff().summary_frame()
+    old.index = fit.params.index[1:]
+
+    regressors = ['successful', 'meventperyear']
+    close(new.loc[regressors, 'coeff'], old.loc[regressors, 'dy/dx'], rtol=1e-9)
+    close(new.loc[regressors, 'stderror'], old.loc[regressors, 'Std. Err.'], rtol=1e-9)
+    close(new['rsquared'].iloc[0], fit.prsquared, rtol=1e-9)
+
+
+def test_balance_matches_clustered_ols(panel):
+    covariates = ['ln_emp_pop', 'meventperyear', 'real_qp1']
+    new = af.balance(panel, covariates, 'successful', cluster='fips')
+
+    for covariate in covariates:
+        fit = af.smf.ols(covariate + ' ~ successful', panel).fit(cov_type='cluster', cov_kwds={'groups': panel['fips'].values})
+        close(new.loc[covariate, ['difference', 'stderror']],
+                                   [fit.params['successful'], fit.bse['successful']], rtol=1e-9)
+
+
+def test_zivot_andrews_matches_arch(panel):
+    series = panel.groupby(['year', 'fips'])['ln_emp_pop'].mean().unstack().iloc[:, :20].astype(float)
+    new = af.zivot_andrews(series)
+
+    tested = 0
+    for name, column in series.items():
+        row = new.loc[name]
+        old = af.unitroot.ZivotAndrews(column.values)
+        if isinstance(row['error'], str):
+            # the series arch cannot test either
+            with pytest.raises(Exception):
+                old.stat
+            continue
+        tested += 1
+        assert row['lags'] == old.lags
+        close(row['stat'], old.stat, rtol=1e-10)
+        close(row['pvalue'], old.pvalue, rtol=1e-8, atol=1e-12)
+        close(row[['1%', '5%', '10%']], list(old.critical_values.values()), rtol=1e-12)
+    assert tested
+
+
+def test_two_way_clustervcov_matches_statsmodels(panel):
+    # successful is constant within counties, so not in this formula
+    formula = 'ln_emp_pop ~ post + meventperyear'
+    new = af.aregdf(formula, panel, absorb='fips', cluster=['fips', 'year'])
+    fit = demeaned_ols(formula, panel, 'fips').fit(cov_type='cluster', cov_kwds={'groups': panel[['fips', 'year']].values})
+
+    close(new.loc[fit.params.index, 'coeff'], fit.params, rtol=1e-10)
+    close(new.loc[fit.params.index, 'stderror'], fit.bse, rtol=1e-10)
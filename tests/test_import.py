@@ -0,0 +1,28 @@
+"""This module checks that importing the auxiliary modules stays cheap.
+
+statsmodels, matplotlib.pyplot and arch take seconds to import and are bound
+lazily (auxiliary/lazy.py). Each test imports a module in a fresh interpreter
+and fails if one of them was imported with it.
+"""
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['statsmodels.api', 'statsmodels.formula.api', 'matplotlib.pyplot', 'arch', 'arch.unitroot']
+
+
+def imported_with(module):
+    '''the modules of HEAVY in sys.modules after importing module in a new interpreter'''
+
+    code = 'import sys, json, {}; print(json.dumps([m for m in {!r} if m in sys.modules]))'.format(module, HEAVY)
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', ['auxiliary.auxiliary_func', 'auxiliary.run_all', 'auxiliary.pipeline'])
+def test_import_is_lazy(module):
+    assert imported_with(module) == []
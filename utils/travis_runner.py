@@ -5,6 +5,8 @@ import glob
 
 if __name__ == '__main__':
 
+    # only the tables and figures whose data or code changed are rebuilt, the
+    # notebook is assembled from their outputs instead of being executed
     for notebook in glob.glob('*.ipynb'):
-        cmd = ' jupyter nbconvert --execute {}  --ExecutePreprocessor.timeout=-1'.format(notebook)
+        cmd = 'python -m auxiliary.pipeline --out results --notebook {}'.format(notebook)
         sp.check_call(cmd, shell=True)